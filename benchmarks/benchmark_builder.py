@@ -0,0 +1,63 @@
+"""
+Compares building an autocomplete object with the constructor and with build_autocomplete
+on a generated list of words.
+
+    python benchmarks/benchmark_builder.py [number of words]
+
+Every way runs on its own forked process, so their peak memory does not affect each other.
+"""
+import multiprocessing
+import os
+import random
+import resource
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fast_autocomplete import AutoComplete  # noqa
+from fast_autocomplete.builder import build_autocomplete  # noqa
+
+WORDS = 200000
+SYNONYMS = {'alfa romeo': ['alfa'], 'bmw': ['beemer', 'bimmer'], 'volkswagen': ['vw']}
+
+
+def get_rows(number_of_words, seed=0):
+    rand = random.Random(seed)
+    makes = ['alfa romeo', 'bmw', 'volkswagen'] + [''.join(rand.choices(string.ascii_lowercase, k=rand.randint(3, 10))) for _ in range(2000)]
+    for i in range(number_of_words):
+        model = ''.join(rand.choices(string.ascii_lowercase + string.digits, k=rand.randint(2, 8)))
+        yield f'{rand.choice(makes)} {model} {i}', {'count': rand.randint(0, 1000)}
+
+
+def constructor(number_of_words):
+    return AutoComplete(words=dict(get_rows(number_of_words)), synonyms=SYNONYMS)
+
+
+def streaming(number_of_words):
+    return build_autocomplete(get_rows(number_of_words), synonyms=SYNONYMS)
+
+
+def measure(func, number_of_words, results):
+    start = time.perf_counter()
+    func(number_of_words)
+    seconds = time.perf_counter() - start
+    results.put((seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main():
+    number_of_words = int(sys.argv[1]) if len(sys.argv) > 1 else WORDS
+    context = multiprocessing.get_context('fork')
+    print(f'{number_of_words} words')
+    for func in (constructor, streaming):
+        results = context.Queue()
+        process = context.Process(target=measure, args=(func, number_of_words, results))
+        process.start()
+        seconds, max_rss_kb = results.get()
+        process.join()
+        print(f'{func.__name__:>12}: {seconds:6.2f} s  peak memory {max_rss_kb / 1024:7.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
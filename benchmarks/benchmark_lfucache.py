@@ -0,0 +1,46 @@
+"""
+Compares LFUCache and FastLFUCache on a skewed stream of keys where most of the lookups are hits.
+
+    python benchmarks/benchmark_lfucache.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fast_autocomplete.lfucache import FastLFUCache, LFUCache  # noqa
+
+CAPACITY = 2048
+OPERATIONS = 200000
+REPEAT = 5
+
+
+def get_keys(seed=0):
+    rand = random.Random(seed)
+    return [f'word{int(rand.paretovariate(0.3))}' for _ in range(OPERATIONS)]
+
+
+def run(cache_class, keys):
+    cache = cache_class(CAPACITY)
+    get = cache.get
+    set_ = cache.set
+    for key in keys:
+        if get(key) == -1:
+            set_(key, key)
+    return cache
+
+
+def main():
+    keys = get_keys()
+    cache = run(LFUCache, keys)
+    stats = cache.get_stats()
+    print(f'{OPERATIONS} lookups of {len(set(keys))} keys, capacity {CAPACITY}, hit rate {stats["hits"] / OPERATIONS:.1%}')
+    for cache_class in (LFUCache, FastLFUCache):
+        seconds = min(timeit.repeat(lambda: run(cache_class, keys), number=1, repeat=REPEAT))
+        print(f'{cache_class.__name__:>14}: {seconds * 1000:8.1f} ms  {seconds / OPERATIONS * 1e9:6.0f} ns per lookup')
+
+
+if __name__ == '__main__':
+    main()
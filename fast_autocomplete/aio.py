@@ -0,0 +1,107 @@
+"""
+Searching from asyncio code without blocking the event loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:  # Python 3.6
+    _get_running_loop = asyncio.get_event_loop
+
+
+class AsyncAutoComplete:
+    """
+    Runs the searches of an Autocomplete object on a bounded pool of threads.
+
+    - The identical searches that are in flight at the same time are only run once and
+      all the callers get the same result. They are identified by the same key as the
+      LFU cache of the Autocomplete object, so the results that are already cached are
+      returned without going to the threads at all.
+    - Each search can belong to a session, such as the text box of one user. A newer search
+      of the same session cancels the older one: its caller gets asyncio.CancelledError and
+      the search itself is dropped if it has not started running and no one else waits for it.
+
+    The searches still run under the GIL, so this keeps the event loop responsive but does not
+    make them faster. Use search_many_parallel for throughput.
+    """
+
+    def __init__(self, autocomplete, max_workers=4, executor=None):
+        """
+        :param autocomplete: The Autocomplete object to search.
+        :param max_workers: The number of threads of the executor.
+        :param executor: (optional) An executor to run the searches on instead of creating one.
+        """
+        self.autocomplete = autocomplete
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        # key to [future, number of callers waiting for it]
+        self._in_flight = {}
+        # session to the waiter of the latest search of the session
+        self._sessions = {}
+
+    async def search(self, word, max_cost=2, size=5, session=None):
+        """
+        parameters:
+        - word: the word to return autocomplete results for
+        - max_cost: Maximum Levenshtein edit distance to be considered when calculating results
+        - size: The max number of results to return
+        - session: (optional) Any hashable id. A newer search with the same session cancels this one.
+        """
+        autocomplete = self.autocomplete
+        word = autocomplete.normalizer.normalize_node_name(word)
+        if not word:
+            return []
+        key = autocomplete._get_cache_key(word, max_cost, size)
+        result = autocomplete._lfu_cache.get(key)
+        if result != -1:
+            return result
+
+        loop = _get_running_loop()
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            future = loop.run_in_executor(self._executor, autocomplete.search, word, max_cost, size)
+            in_flight = self._in_flight[key] = [future, 0]
+            future.add_done_callback(lambda _: self._remove_in_flight(key, future))
+        future = in_flight[0]
+        in_flight[1] += 1
+
+        waiter = loop.create_future()
+        future.add_done_callback(lambda _: self._set_waiter(waiter, future))
+        if session is not None:
+            previous_waiter = self._sessions.get(session)
+            if previous_waiter is not None:
+                previous_waiter.cancel()
+            self._sessions[session] = waiter
+        try:
+            return await waiter
+        finally:
+            in_flight[1] -= 1
+            if not in_flight[1] and not future.done():
+                # Nobody waits for it anymore. It is only cancelled if it has not started yet.
+                future.cancel()
+            if session is not None and self._sessions.get(session) is waiter:
+                del self._sessions[session]
+
+    def _remove_in_flight(self, key, future):
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[0] is future:
+            del self._in_flight[key]
+
+    @staticmethod
+    def _set_waiter(waiter, future):
+        if waiter.done():
+            return
+        if future.cancelled():
+            waiter.cancel()
+        elif future.exception() is not None:
+            waiter.set_exception(future.exception())
+        else:
+            waiter.set_result(future.result())
+
+    def close(self):
+        """
+        Shuts down the executor if it was created by this object.
+        """
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
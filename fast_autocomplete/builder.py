@@ -0,0 +1,93 @@
+"""
+Building an autocomplete object from a stream of (word, value) rows.
+
+The constructor of AutoComplete needs the whole words dictionary up front and then makes
+another dictionary of the words that the partial synonyms produce before it inserts anything.
+build_autocomplete inserts the rows into the dwg one chunk at a time while they are read,
+for example straight from misc.read_csv_gen, so nothing but the words dictionary is kept.
+"""
+from itertools import islice
+
+from fast_autocomplete.dwg import AutoComplete, _DawgNode
+
+CHUNK_SIZE = 10000
+
+
+class BuildError(ValueError):
+    pass
+
+
+def _create_autocomplete(module, words=None, synonyms=None, full_stop_words=None, logger=None, **normalizer_kwargs):
+    autocomplete = module.__new__(module)
+    autocomplete._init_attributes(
+        words={} if words is None else words,
+        synonyms=synonyms,
+        full_stop_words=full_stop_words,
+        logger=logger,
+        **normalizer_kwargs,
+    )
+    autocomplete._dwg = _DawgNode()
+    return autocomplete
+
+
+def _get_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = dict(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert_rows(autocomplete, rows, chunk_size):
+    words = autocomplete.words
+    partial_synonym_words = {}
+    for chunk in _get_chunks(rows, chunk_size):
+        words.update(chunk)
+        autocomplete._insert_words(chunk)
+        if autocomplete._partial_synonyms:
+            for word, value in chunk.items():
+                partial_synonym_words.update(autocomplete._get_partial_synonym_words(word, value))
+    # Same as the constructor: the words of the partial synonyms go after all the other words.
+    words.update(partial_synonym_words)
+    autocomplete._insert_words(partial_synonym_words)
+
+
+def build_autocomplete(
+        rows,
+        module=AutoComplete,
+        words=None,
+        synonyms=None,
+        full_stop_words=None,
+        logger=None,
+        chunk_size=CHUNK_SIZE,
+        **normalizer_kwargs,
+):
+    """
+    Creates an autocomplete object of the module class from an iterable of (word, value) rows.
+    The result is the same as passing the rows as the words dictionary to the constructor.
+
+    :param rows: Any iterable of (word, value) pairs. It is read lazily one chunk at a time.
+                 If a word is repeated, its last value is used.
+    :param module: The AutoComplete class or a subclass of it.
+    :param words: (optional) The empty mapping that the words are added to, for example a
+                  loader.WordStore. Defaults to a new dictionary.
+    :param chunk_size: The number of rows that are read at a time.
+    :param normalizer_kwargs: valid_chars_for_string, valid_chars_for_integer and valid_chars_for_node_name.
+    """
+    if chunk_size < 1:
+        raise BuildError('The chunk_size needs to be at least 1.')
+    autocomplete = _create_autocomplete(
+        module,
+        words=words,
+        synonyms=synonyms,
+        full_stop_words=full_stop_words,
+        logger=logger,
+        **normalizer_kwargs,
+    )
+    with autocomplete._lock:
+        _insert_rows(autocomplete, rows, chunk_size)
+        autocomplete._populate_fuzzy_index()
+        if autocomplete.BEST_FIRST_DESCENDANTS:
+            autocomplete._populate_max_counts()
+    return autocomplete
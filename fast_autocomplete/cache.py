@@ -0,0 +1,308 @@
+"""
+Caches for the search results that can be used instead of the FastLFUCache.
+
+Set the CACHE_CLASS of the AutoComplete class to one of them. They all have the same methods
+as the FastLFUCache:
+
+- get(key) returns -1 if the key is not in the cache.
+- set(key, value), delete(key) and keys().
+- get_sorted_cache_keys() returns (key, score) pairs with the highest score first.
+- get_stats() returns the hits, the misses and the evictions so far.
+- on_evict is called with the key of every item that is evicted to make room for a new one.
+"""
+import sys
+from collections import OrderedDict
+from threading import Lock
+
+
+class CacheStatsMixin:
+
+    def _init_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.cache),
+        }
+
+
+class LRUCache(CacheStatsMixin):
+    """
+    Evicts the least recently used item.
+    """
+
+    def __init__(self, capacity, on_evict=None):
+        self.cache = OrderedDict()
+        self.capacity = capacity
+        self.lock = Lock()
+        self.on_evict = on_evict
+        self._init_stats()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                self.cache.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return -1
+            self.hits += 1
+            return self.cache[key]
+
+    def set(self, key, value):
+        with self.lock:
+            if self.capacity <= 0:
+                return -1
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            elif len(self.cache) >= self.capacity:
+                self._evict()
+            self.cache[key] = value
+
+    def _evict(self):
+        key, _ = self.cache.popitem(last=False)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def delete(self, key):
+        with self.lock:
+            return self.cache.pop(key, -1) != -1
+
+    def keys(self):
+        with self.lock:
+            return list(self.cache.keys())
+
+    def get_sorted_cache_keys(self):
+        """
+        Gets (key, recency) pairs, the most recently used first.
+        The recency goes up by one for every item that was used earlier.
+        """
+        with self.lock:
+            return [(key, i) for i, key in reversed(list(enumerate(self.cache)))]
+
+
+def get_result_size(value):
+    """
+    Estimates the bytes that a search result takes: a list of lists of strings.
+    The strings that are shared with the words dictionary are counted too.
+    """
+    size = sys.getsizeof(value)
+    for item in value:
+        size += sys.getsizeof(item)
+        if isinstance(item, list):
+            for word in item:
+                size += sys.getsizeof(word)
+    return size
+
+
+class ByteBudgetCache(LRUCache):
+    """
+    An LRU cache that is limited by the estimated bytes of its values instead of their number.
+    The capacity is the number of bytes. A value that is bigger than the capacity is not cached.
+    """
+
+    def __init__(self, capacity, on_evict=None, sizeof=get_result_size):
+        super().__init__(capacity, on_evict=on_evict)
+        self.sizeof = sizeof
+        self.total_size = 0
+        self._sizes = {}
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self.lock:
+            if size > self.capacity:
+                # The old value of the key is stale now, so it does not stay cached either.
+                if self.cache.pop(key, -1) != -1:
+                    self.total_size -= self._sizes.pop(key)
+                return -1
+            if key in self.cache:
+                self.total_size -= self._sizes[key]
+                self.cache.move_to_end(key)
+            self.cache[key] = value
+            self._sizes[key] = size
+            self.total_size += size
+            while self.total_size > self.capacity:
+                self._evict()
+
+    def _evict(self):
+        key = next(iter(self.cache))
+        self.total_size -= self._sizes.pop(key)
+        super()._evict()
+
+    def delete(self, key):
+        with self.lock:
+            if self.cache.pop(key, -1) == -1:
+                return False
+            self.total_size -= self._sizes.pop(key)
+            return True
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['bytes'] = self.total_size
+        return stats
+
+
+class FrequencySketch:
+    """
+    A count-min sketch of how often the keys were seen, with 4 bit counters.
+    All the counters are halved once the number of increments reaches the sample size,
+    so the keys that were popular a long time ago do not stay popular forever.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        # Enough counters per row that most of the keys that were seen recently do not share them.
+        width = 16
+        while width < 8 * capacity:
+            width *= 2
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(self.DEPTH)]
+        self.sample_size = 10 * max(capacity, 1)
+        self._increments = 0
+
+    def _indexes(self, key):
+        hashed = hash(key)
+        for i in range(self.DEPTH):
+            hashed = hash((hashed, i))
+            yield hashed & self._mask
+
+    def increment(self, key):
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self._increments += 1
+        if self._increments >= self.sample_size:
+            self._reset()
+
+    def frequency(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self):
+        for row in self._rows:
+            for index, count in enumerate(row):
+                row[index] = count >> 1
+        self._increments //= 2
+
+
+class TinyLFUCache(CacheStatsMixin):
+    """
+    W-TinyLFU: a new item first goes to a small LRU window. When it is pushed out of the window,
+    it only gets into the main cache if it was seen more often than the item that the main cache
+    would evict for it. How often the keys were seen is kept in a FrequencySketch, which also
+    counts the keys that are not in the cache anymore.
+
+    A pure LFU cache keeps the items that were popular in the past, so new popular items never
+    get in. Here they get in as soon as they are seen more often than the least popular item
+    of the main cache.
+
+    The main cache is a segmented LRU: the items start in the probation segment and move to
+    the protected segment when they are used again.
+    """
+
+    WINDOW_RATIO = 0.01
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, capacity, on_evict=None):
+        self.capacity = capacity
+        self.lock = Lock()
+        self.on_evict = on_evict
+        self.window_capacity = max(1, int(capacity * self.WINDOW_RATIO))
+        self.main_capacity = max(0, capacity - self.window_capacity)
+        self.protected_capacity = int(self.main_capacity * self.PROTECTED_RATIO)
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self.sketch = FrequencySketch(capacity)
+        # key to the segment it is in
+        self.cache = {}
+        self._init_stats()
+
+    def get(self, key):
+        with self.lock:
+            self.sketch.increment(key)
+            segment = self.cache.get(key)
+            if segment is None:
+                self.misses += 1
+                return -1
+            self.hits += 1
+            if segment is self._probation:
+                value = self._probation.pop(key)
+                self._add_to_protected(key, value)
+                return value
+            segment.move_to_end(key)
+            return segment[key]
+
+    def set(self, key, value):
+        with self.lock:
+            if self.capacity <= 0:
+                return -1
+            segment = self.cache.get(key)
+            if segment is not None:
+                segment[key] = value
+                segment.move_to_end(key)
+                return
+            self.sketch.increment(key)
+            self._window[key] = value
+            self.cache[key] = self._window
+            if len(self._window) > self.window_capacity:
+                candidate, candidate_value = self._window.popitem(last=False)
+                self._admit(candidate, candidate_value)
+
+    def _add_to_protected(self, key, value):
+        self._protected[key] = value
+        self.cache[key] = self._protected
+        if len(self._protected) > self.protected_capacity:
+            demoted_key, demoted_value = self._protected.popitem(last=False)
+            self._probation[demoted_key] = demoted_value
+            self.cache[demoted_key] = self._probation
+
+    def _admit(self, candidate, value):
+        """
+        Moves the candidate that was pushed out of the window into the main cache if it is
+        seen more often than the item that the main cache would evict for it.
+        """
+        if len(self._probation) + len(self._protected) < self.main_capacity:
+            self._probation[candidate] = value
+            self.cache[candidate] = self._probation
+            return
+        victims = self._probation or self._protected
+        victim = next(iter(victims)) if victims else None
+        if victim is not None and self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+            del victims[victim]
+            self._probation[candidate] = value
+            self.cache[candidate] = self._probation
+            evicted = victim
+        else:
+            evicted = candidate
+        del self.cache[evicted]
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def delete(self, key):
+        with self.lock:
+            segment = self.cache.pop(key, None)
+            if segment is None:
+                return False
+            del segment[key]
+            return True
+
+    def keys(self):
+        with self.lock:
+            return list(self.cache.keys())
+
+    def get_sorted_cache_keys(self):
+        """
+        Gets (key, frequency) pairs from the frequency sketch, the most frequent first.
+        """
+        with self.lock:
+            result = [(key, self.sketch.frequency(key)) for key in self.cache]
+        result.sort(key=lambda x: -x[1])
+        return result
@@ -1,13 +1,18 @@
 from collections import (
+    OrderedDict,
     defaultdict,
     deque
 )
-from itertools import islice
+from bisect import insort
+from heapq import heappush, heappop
+from itertools import count as itertools_count, islice
 from enum import Enum
-from threading import Lock
-from fast_autocomplete.lfucache import LFUCache
+from threading import Lock, RLock
+from fast_autocomplete.lfucache import FastLFUCache, ThreadLocalLFUCache
 from fast_autocomplete.misc import _extend_and_repeat
-from fast_autocomplete.normalize import Normalizer
+from fast_autocomplete.ngram import NgramIndex
+from fast_autocomplete.trie import TrieIndex
+from fast_autocomplete.normalize import NORMALIZED_CACHE_SIZE, Normalizer
 
 # Prefer the 'Levenshtein' library implementation
 try:
@@ -49,10 +54,111 @@ class FindStep(Enum):
     not_enough_results_add_some_descandants = 5
 
 
+class FuzzyEngine(Enum):
+    scan = 0
+    trie = 1
+    ngram = 2
+    best_first = 3
+
+
+def _copy_value(value, **fields):
+    """
+    Copies the value of a word in the words dictionary with the fields changed.
+    """
+    # data is mutable so we copy
+    try:
+        value = value.copy()
+    # data must be named tuple
+    except Exception:
+        new_value = value._asdict()
+        new_value.update(fields)
+        value = type(value)(**new_value)
+    else:
+        value.update(fields)
+    return value
+
+
+class _PrefixIndex:
+    """
+    Finds the keys that a word starts with by looking up the prefix of the word for every
+    length that the keys have, instead of calling startswith with every key.
+    """
+
+    __slots__ = ('_order', '_lengths')
+
+    def __init__(self, keys=()):
+        # key to the order it was added in
+        self._order = {}
+        # the sorted lengths of the keys
+        self._lengths = []
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        if key in self._order:
+            return
+        self._order[key] = len(self._order)
+        if len(key) not in self._lengths:
+            insort(self._lengths, len(key))
+
+    def get_prefixes(self, word):
+        """
+        Returns the keys that the word starts with in the order they were added.
+        """
+        order = self._order
+        word_length = len(word)
+        prefixes = []
+        for length in self._lengths:
+            if length > word_length:
+                break
+            prefix = word[:length]
+            if prefix in order:
+                prefixes.append(prefix)
+        if len(prefixes) > 1:
+            prefixes.sort(key=order.__getitem__)
+        return prefixes
+
+
 class AutoComplete:
 
     CACHE_SIZE = 2048
+    # The class of the cache of the search results. FastLFUCache, LFUCache or any class from
+    # fast_autocomplete.cache. For ByteBudgetCache, CACHE_SIZE is the number of bytes instead of
+    # the number of results.
+    CACHE_CLASS = FastLFUCache
+    # The number of normalized words that the normalizer of the object caches.
+    NORMALIZER_CACHE_SIZE = NORMALIZED_CACHE_SIZE
     SHOULD_INCLUDE_COUNT = True
+    # How the fuzzy step finds the candidate words.
+    # - scan: compare against every word in the words dictionary.
+    # - trie: walk a trie of the words with a Levenshtein row per node and prune the branches
+    #         that can not get under max_cost anymore. The trie is kept next to the dwg.
+    # - ngram: only compare against the words in the relevant length buckets that share
+    #          enough character n-grams with the word.
+    # - best_first: walk the dwg in the order of (distance, -count) and stop once the top
+    #               size matches are found. Unlike the other engines, the results do not depend
+    #               on the order of the words dictionary.
+    FUZZY_ENGINE = FuzzyEngine.scan
+    FUZZY_NGRAM_SIZE = 2
+    # When set, the top descendants of each node that is searched are sorted by count once and
+    # memoized up to this size. Searches with a size smaller than this then use the memoized
+    # list instead of traversing the whole subtree of the node.
+    TOP_DESCENDANTS_SIZE = 0
+    # The number of nodes whose top descendants are memoized. The least recently used are dropped first.
+    TOP_DESCENDANTS_MEMO_SIZE = 10000
+    # When True, every node keeps the max count of its subtree and the descendants are found
+    # best-first by count, so only the branches that can have the top counts are traversed.
+    # This is not used when there are full stop words or when the dwg is frozen.
+    BEST_FIRST_DESCENDANTS = False
+    # When True, every thread has its own LFU caches of the results and of the normalized words so
+    # the searches of different threads never wait for each other, and updating the count of a word
+    # copies the nodes that lead to it and swaps the root of the dwg instead of changing the nodes
+    # that the searches are reading.
+    LOCK_FREE_READS = False
+    # When True, every cached search result remembers the nodes whose descendants it was made of.
+    # Updating the count of a word then deletes exactly the cached results that depend on it.
+    # Otherwise the cached results keep the old ranking until they are evicted from the cache.
+    TRACK_CACHE_DEPENDENCIES = False
 
     def __init__(
             self,
@@ -71,11 +177,45 @@ class AutoComplete:
         :param synonyms: (optional) A dictionary of words to their synonyms.
                          The synonym words should only be here and not repeated in words parameter.
         """
+        self._init_attributes(
+            words=words,
+            synonyms=synonyms,
+            full_stop_words=full_stop_words,
+            logger=logger,
+            valid_chars_for_string=valid_chars_for_string,
+            valid_chars_for_integer=valid_chars_for_integer,
+            valid_chars_for_node_name=valid_chars_for_node_name,
+        )
+        new_words = self._get_partial_synonyms_to_words()
+        self.words.update(new_words)
+        self._populate_dwg()
+
+    def _init_attributes(
+            self,
+            words,
+            synonyms=None,
+            full_stop_words=None,
+            logger=None,
+            valid_chars_for_string=None,
+            valid_chars_for_integer=None,
+            valid_chars_for_node_name=None,
+    ):
+        """
+        Sets everything except the dwg itself.
+        """
         self._lock = Lock()
         self._dwg = None
+        self._trie_index = None
+        self._ngram_index = None
+        self._top_descendants = OrderedDict()
+        # The original keys of the words that were inserted. Only ever grows.
+        self._original_keys = set()
+        # Goes up every time words or synonyms are added or removed.
+        self._dwg_version = 0
         self._raw_synonyms = synonyms or {}
-        self._lfu_cache = LFUCache(self.CACHE_SIZE)
+        self._init_cache()
         self._clean_synonyms, self._partial_synonyms = self._get_clean_and_partial_synonyms()
+        self._partial_synonyms_index = _PrefixIndex(self._partial_synonyms)
         self._reverse_synonyms = self._get_reverse_synonyms(self._clean_synonyms)
         self._full_stop_words = set(full_stop_words) if full_stop_words else None
         self.logger = logger
@@ -84,10 +224,23 @@ class AutoComplete:
             valid_chars_for_string=valid_chars_for_string,
             valid_chars_for_integer=valid_chars_for_integer,
             valid_chars_for_node_name=valid_chars_for_node_name,
+            cache_size=self.NORMALIZER_CACHE_SIZE,
+            thread_local_cache=self.LOCK_FREE_READS,
         )
-        new_words = self._get_partial_synonyms_to_words()
-        self.words.update(new_words)
-        self._populate_dwg()
+
+    def _init_cache(self):
+        """
+        Creates an empty cache of the search results and the record of what its results depend on.
+        """
+        if self.TRACK_CACHE_DEPENDENCIES and self.CACHE_SIZE > 0:
+            self._cache_dependencies = _CacheDependencies()
+            on_evict = self._cache_dependencies.on_evict
+        else:
+            self._cache_dependencies = on_evict = None
+        if self.LOCK_FREE_READS:
+            self._lfu_cache = ThreadLocalLFUCache(self.CACHE_SIZE, on_evict=on_evict, cache_class=self.CACHE_CLASS)
+        else:
+            self._lfu_cache = self.CACHE_CLASS(self.CACHE_SIZE, on_evict=on_evict)
 
     def _get_clean_and_partial_synonyms(self):
         """
@@ -132,22 +285,28 @@ class AutoComplete:
 
     def _get_partial_synonyms_to_words(self):
         new_words = {}
-        for key, value in self.words.items():
-            # data is mutable so we copy
-            try:
-                value = value.copy()
-            # data must be named tuple
-            except Exception:
-                new_value = value._asdict()
-                new_value[ORIGINAL_KEY] = key
-                value = type(value)(**new_value)
-            else:
-                value[ORIGINAL_KEY] = key
-            for syn_key, syns in self._partial_synonyms.items():
-                if key.startswith(syn_key):
-                    for syn in syns:
-                        new_key = key.replace(syn_key, syn)
-                        new_words[new_key] = value
+        if self._partial_synonyms:
+            for key, value in self.words.items():
+                new_words.update(self._get_partial_synonym_words(key, value))
+        return new_words
+
+    def _get_partial_synonym_words(self, key, value, partial_synonyms=None):
+        """
+        Gets the words that the partial synonyms make out of the key, mapped to the value
+        with the key as the original key. All the words of one key share one copy of the value.
+        """
+        if partial_synonyms is None:
+            partial_synonyms = self._partial_synonyms
+            syn_keys = self._partial_synonyms_index.get_prefixes(key)
+        else:
+            syn_keys = [syn_key for syn_key in partial_synonyms if key.startswith(syn_key)]
+        new_words = {}
+        if syn_keys:
+            value = _copy_value(value, **{ORIGINAL_KEY: key})
+            for syn_key in syn_keys:
+                for syn in partial_synonyms[syn_key]:
+                    new_key = key.replace(syn_key, syn)
+                    new_words[new_key] = value
         return new_words
 
     def _populate_dwg(self):
@@ -155,23 +314,207 @@ class AutoComplete:
             with self._lock:
                 if not self._dwg:
                     self._dwg = _DawgNode()
-                    for word, value in self.words.items():
-                        original_key = value.get(ORIGINAL_KEY)
-                        # word = word.strip().lower()
-                        count = value.get('count', 0)
-                        leaf_node = self.insert_word_branch(
-                            word,
-                            original_key=original_key,
-                            count=count
-                        )
-                        if leaf_node and self._clean_synonyms:
-                            for synonym in self._clean_synonyms.get(word, []):
-                                self.insert_word_branch(
-                                    synonym,
-                                    leaf_node=leaf_node,
-                                    add_word=False,
-                                    count=count
-                                )
+                    self._insert_words(self.words)
+                    self._populate_fuzzy_index()
+                    if self.BEST_FIRST_DESCENDANTS:
+                        self._populate_max_counts()
+
+    def _insert_words(self, words, root=None):
+        normalized_words = self.normalizer.normalize_many(words)
+        for (word, value), normalized_word in zip(words.items(), normalized_words):
+            original_key = value.get(ORIGINAL_KEY)
+            if original_key:
+                self._original_keys.add(original_key)
+            # word = word.strip().lower()
+            count = value.get('count', 0)
+            leaf_node = self.insert_word_branch(
+                word,
+                original_key=original_key,
+                count=count,
+                root=root,
+                normalized_word=normalized_word,
+            )
+            if leaf_node and self._clean_synonyms:
+                for synonym in self._clean_synonyms.get(word, []):
+                    self.insert_word_branch(
+                        synonym,
+                        leaf_node=leaf_node,
+                        add_word=False,
+                        count=count,
+                        root=root
+                    )
+
+    def _populate_fuzzy_index(self):
+        if self.FUZZY_ENGINE is FuzzyEngine.trie:
+            self._trie_index = TrieIndex(self.words, copy_on_write=self.LOCK_FREE_READS)
+        elif self.FUZZY_ENGINE is FuzzyEngine.ngram:
+            self._ngram_index = NgramIndex(self.words, n=self.FUZZY_NGRAM_SIZE)
+
+    def _add_to_fuzzy_index(self, word):
+        if self.FUZZY_ENGINE is FuzzyEngine.trie:
+            self._trie_index.add(word)
+        elif self.FUZZY_ENGINE is FuzzyEngine.ngram:
+            self._ngram_index.add(word)
+
+    def _remove_from_fuzzy_index(self, word):
+        # If the word is added again, it gets a new id at the end, just like in the words dictionary.
+        if self.FUZZY_ENGINE is FuzzyEngine.trie:
+            self._trie_index.remove(word)
+        elif self.FUZZY_ENGINE is FuzzyEngine.ngram:
+            self._ngram_index.remove(word)
+
+    def _populate_max_counts(self, root=None):
+        nodes = (root or self._dwg).get_all_nodes()
+        for node in nodes:
+            node.max_count = node.count
+        # The children usually come after their parents in the list. The synonym branches that
+        # are merged into other branches are the exception, so repeat until nothing changes.
+        changed = True
+        while changed:
+            changed = False
+            for node in reversed(nodes):
+                for child_node in node.children.values():
+                    if child_node.max_count > node.max_count:
+                        node.max_count = child_node.max_count
+                        changed = True
+
+    def _update_max_counts(self, node, ancestors=None):
+        ancestors = ancestors or self._get_ancestor_nodes(node)
+        if ancestors is None:
+            self._populate_max_counts()
+            return
+        if node.count >= node.max_count:
+            for ancestor in ancestors:
+                ancestor.max_count = max(ancestor.max_count, node.count)
+            return
+        # The count went down. The max counts of the ancestors can only go down too.
+        self._recompute_max_counts(ancestors)
+
+    @staticmethod
+    def _recompute_max_counts(nodes):
+        """
+        Recomputes the max counts of the nodes. The max counts of their other descendants need to be correct.
+        """
+        for node in nodes:
+            node.max_count = node.count
+        # Starting from the count of each node, the loop also ends with the right max count in the cycles.
+        for _ in range(len(nodes) + 1):
+            changed = False
+            for node in nodes:
+                for child_node in node.children.values():
+                    if child_node.max_count > node.max_count:
+                        node.max_count = child_node.max_count
+                        changed = True
+            if not changed:
+                break
+
+    def _get_ancestor_nodes(self, node):
+        """
+        Gets the nodes that the node with a word is a descendant of, including the node itself.
+
+        These are the nodes on the branch of the node's word and the nodes on the synonym branches
+        that are merged into that branch. Returns None if the node is not at the end of the branch
+        of its word.
+        """
+        if not node.word:
+            return None
+        return self._get_branch_ancestor_nodes(self.normalizer.normalize_node_name(node.word), node=node)
+
+    def _get_branch_ancestor_nodes(self, branch, node=None, root=None):
+        """
+        Gets the nodes that the last node of the branch is a descendant of, including the node itself.
+        If only the beginning of the branch exists, it is the last node that exists.
+
+        :param node: (optional) Returns None if the branch does not end at this node.
+        :param root: (optional) The root node. Defaults to the root of the dwg.
+        """
+        root = root or self._dwg
+        ancestors = {}
+        branches = deque([(branch, node)])
+        seen_branches = {branch}
+        while branches:
+            branch, expected_node = branches.popleft()
+            branch_nodes = [root]
+            for char in branch:
+                child_node = branch_nodes[-1].children.get(char)
+                if child_node is None:
+                    break
+                branch_nodes.append(child_node)
+            if expected_node is not None and (len(branch_nodes) != len(branch) + 1 or branch_nodes[-1] != expected_node):
+                # The synonym has its own branch and was not merged.
+                if expected_node == node:
+                    return None
+                continue
+            for branch_node in branch_nodes:
+                ancestors[branch_node] = branch_node
+                for synonym in self._clean_synonyms.get(branch_node.word, []) if branch_node.word else []:
+                    synonym_branch = self.normalizer.normalize_node_name(synonym)
+                    if synonym_branch not in seen_branches:
+                        seen_branches.add(synonym_branch)
+                        branches.append((synonym_branch, branch_node))
+        return list(ancestors)
+
+    def freeze(self, minimize=False):
+        """
+        Converts the populated dwg into a read-only dwg that is stored in flat arrays.
+        This uses much less memory than the one object per node of the original dwg.
+        Searching and updating the counts of words keep working but no more words
+        can be inserted into the dwg.
+
+        :param minimize: (Boolean, default: False) Also merge the branches that have the same
+                         words below them. This takes longer to freeze but uses even less memory
+                         when many words end the same way.
+        """
+        from fast_autocomplete.frozen import FrozenDawg
+        with self._lock:
+            if not isinstance(self._dwg, _DawgNode):
+                return
+            self._dwg = FrozenDawg.from_node(self._dwg, minimize=minimize).root
+            if self._cache_dependencies is not None:
+                # The cached results depend on the nodes that were just replaced.
+                for key in self._cache_dependencies.pop_all_keys():
+                    self._lfu_cache.delete(key)
+
+    def save_index(self, path, minimize=False):
+        """
+        Saves the dwg, the words, the synonyms and the stop words into a binary index file.
+        Loading the index file with load_index is much faster than populating the dwg again.
+
+        :param minimize: (Boolean, default: False) Minimize the dwg before saving it. See freeze.
+        """
+        from fast_autocomplete.storage import save_index
+        save_index(self, path, minimize=minimize)
+
+    @classmethod
+    def load_index(cls, path, mmap=True, logger=None, verify=None):
+        """
+        Creates an Autocomplete object from an index file that was saved with save_index.
+        The dwg of the object is frozen.
+
+        :param mmap: (Boolean, default: True) Memory map the index file instead of reading it.
+                     All the processes that map the same file share one copy of the dwg in memory.
+        :param verify: (Boolean, default: not mmap) Verify the checksum of the whole index file.
+                       It reads every page of the file, so it is opt-in with mmap.
+        """
+        from fast_autocomplete.storage import load_index
+        return load_index(path, module=cls, mmap=mmap, logger=logger, verify=verify)
+
+    @classmethod
+    def from_rows(cls, rows, synonyms=None, full_stop_words=None, logger=None, **kwargs):
+        """
+        Creates an Autocomplete object from an iterable of (word, value) rows, for example
+        straight from misc.read_csv_gen, without making the words dictionary first.
+        See builder.build_autocomplete.
+        """
+        from fast_autocomplete.builder import build_autocomplete
+        return build_autocomplete(
+            rows,
+            module=cls,
+            synonyms=synonyms,
+            full_stop_words=full_stop_words,
+            logger=logger,
+            **kwargs,
+        )
 
     def insert_word_callback(self, word):
         """
@@ -179,7 +522,7 @@ class AutoComplete:
         """
         pass
 
-    def insert_word_branch(self, word, leaf_node=None, add_word=True, original_key=None, count=0):
+    def insert_word_branch(self, word, leaf_node=None, add_word=True, original_key=None, count=0, root=None, normalized_word=None):
         """
         Inserts a word into the Dawg.
 
@@ -191,18 +534,22 @@ class AutoComplete:
         :param original_key: If the word that is being added was originally another word.
                              For example with synonyms, you might be inserting the word `beemer` but the
                              original key is `bmw`. This parameter might be removed in the future.
+        :param root: (optional) The root node to insert into. Defaults to the root of the dwg.
+        :param normalized_word: (optional) The word after it is normalized, if it is already known.
 
         """
         # if word == 'u (2 off)':
         #     import pytest; pytest.set_trace()
-        normalized_word = self.normalizer.normalize_node_name(word)
+        if normalized_word is None:
+            normalized_word = self.normalizer.normalize_node_name(word)
         # sometimes if the word does not have any valid characters, the normalized_word will be empty
         if not normalized_word:
             return
         last_char = normalized_word[-1]
+        root = root or self._dwg
 
         if leaf_node:
-            temp_leaf_node = self._dwg.insert(
+            temp_leaf_node = root.insert(
                 word=word,
                 normalized_word=normalized_word[:-1],
                 add_word=add_word,
@@ -217,7 +564,7 @@ class AutoComplete:
             else:
                 temp_leaf_node.children[last_char] = leaf_node
         else:
-            leaf_node = self._dwg.insert(
+            leaf_node = root.insert(
                 word=word,
                 normalized_word=normalized_word,
                 original_key=original_key,
@@ -227,9 +574,9 @@ class AutoComplete:
         self.insert_word_callback(word)
         return leaf_node
 
-    def _find_and_sort(self, word, max_cost, size):
+    def _find_and_sort(self, word, max_cost, size, batch=None):
         output_keys_set = set()
-        results, find_steps = self._find(word, max_cost, size)
+        results, find_steps = self._find(word, max_cost, size, batch=batch)
         results_keys = list(results.keys())
         results_keys.sort()
         for key in results_keys:
@@ -273,13 +620,105 @@ class AutoComplete:
         word = self.normalizer.normalize_node_name(word)
         if not word:
             return []
-        key = f'{word}-{max_cost}-{size}'
+        key = self._get_cache_key(word, max_cost, size)
         result = self._lfu_cache.get(key)
         if result == -1:
-            result = list(self._find_and_sort(word, max_cost, size))
+            result = self._find_and_cache(word, max_cost, size, key)
+        return result
+
+    def get_cache_stats(self):
+        """
+        Returns the hits, the misses and the evictions of the cache of the search results.
+        """
+        return self._lfu_cache.get_stats()
+
+    @staticmethod
+    def _get_cache_key(word, max_cost, size):
+        return f'{word}-{max_cost}-{size}'
+
+    def _find_and_cache(self, word, max_cost, size, key, batch=None):
+        """
+        Finds the results of the word and caches them under the key.
+        With TRACK_CACHE_DEPENDENCIES, the nodes that the results depend on are recorded too.
+        """
+        dependencies = self._cache_dependencies
+        if dependencies is None:
+            result = list(self._find_and_sort(word, max_cost, size, batch=batch))
             self._lfu_cache.set(key, result)
+            return result
+        version = dependencies.version
+        batch = batch or _SearchBatch(self)
+        batch.start_tracking()
+        result = list(self._find_and_sort(word, max_cost, size, batch=batch))
+        dependencies.set(self._lfu_cache, key, result, version, batch.dependency_nodes, batch.fuzzy_words)
         return result
 
+    def search_many(self, words, max_cost=2, size=5):
+        """
+        Searches several words at once and returns the results in the same order as the words.
+        It returns the same results as calling search for each word.
+
+        The duplicate words are only searched once and the words are searched in sorted order.
+        The prefix walks, the fuzzy matches and the descendants of nodes are shared between
+        the searches, and the fuzzy matches of all the words are found in one pass.
+
+        parameters:
+        - words: the words to return autocomplete results for
+        - max_cost: Maximum Levenshtein edit distance to be considered when calculating results
+        - size: The max number of results to return for each word
+        """
+        normalized_words = {word: self.normalizer.normalize_node_name(word) for word in words}
+        results = {'': []}
+        words_to_find = []
+        for word in sorted(set(normalized_words.values())):
+            if word in results:
+                continue
+            result = self._lfu_cache.get(self._get_cache_key(word, max_cost, size))
+            if result == -1:
+                words_to_find.append(word)
+            else:
+                results[word] = result
+
+        batch = _SearchBatch(self)
+        new_words = set()
+        for word in words_to_find:
+            matched_prefix_of_last_word, rest_of_word, _, _ = batch.prefix_autofill(word)
+            if len(rest_of_word) >= 3:
+                new_words.add(self._split_fuzzy_word(matched_prefix_of_last_word + rest_of_word)[0])
+        batch.add_fuzzy_matches(self._get_many_fuzzy_matches(sorted(new_words), max_cost, size), max_cost, size)
+
+        for word in words_to_find:
+            results[word] = self._find_and_cache(word, max_cost, size, self._get_cache_key(word, max_cost, size), batch=batch)
+        return [results[normalized_words[word]] for word in words]
+
+    def search_many_parallel(self, words, max_cost=2, size=5, workers=None, chunk_size=200, index_path=None):
+        """
+        Searches the words on several worker processes and yields the results in the same order
+        as the words. The workers are forked from this process and share the pages of the dwg
+        with it, unless the index_path of an index that was saved with save_index is passed.
+
+        parameters:
+        - words: the words to return autocomplete results for
+        - max_cost: Maximum Levenshtein edit distance to be considered when calculating results
+        - size: The max number of results to return for each word
+        - workers: The number of worker processes. Defaults to the number of CPUs.
+        - chunk_size: The number of words that are sent to a worker at a time
+        - index_path: The path to an index file that the workers load instead of being forked
+        """
+        from fast_autocomplete.parallel import search_many_parallel
+        return search_many_parallel(self, words, max_cost=max_cost, size=size, workers=workers, chunk_size=chunk_size, index_path=index_path)
+
+    def session(self, max_cost=2, size=5):
+        """
+        Creates a session for searching as the user types one character at a time.
+        Each keystroke continues the prefix walk of the previous one instead of starting over.
+
+        :param max_cost: The default max_cost of the results of the session.
+        :param size: The default size of the results of the session.
+        """
+        from fast_autocomplete.session import AutoCompleteSession
+        return AutoCompleteSession(self, max_cost=max_cost, size=size)
+
     @staticmethod
     def _len_results(results):
         return sum(map(len, results.values()))
@@ -291,18 +730,20 @@ class AutoComplete:
     def _is_stop_word_condition(self, matched_words, matched_prefix_of_last_word):
         return (self._full_stop_words and matched_words and matched_words[-1] in self._full_stop_words and not matched_prefix_of_last_word)
 
-    def _find(self, word, max_cost, size, call_count=0):
+    def _find(self, word, max_cost, size, call_count=0, batch=None):
         """
         The search function returns a list of all words that are less than the given
         maximum distance from the target word
+
+        :param batch: The _SearchBatch of search_many that shares the work between the searches.
         """
         results = defaultdict(list)
-        fuzzy_matches = defaultdict(list)
         rest_of_results = {}
-        fuzzy_matches_len = 0
+        prefix_autofill = batch.prefix_autofill if batch else self._prefix_autofill
+        get_fuzzy_matches = batch.get_fuzzy_matches if batch else self._get_fuzzy_matches
 
         fuzzy_min_distance = min_distance = INF
-        matched_prefix_of_last_word, rest_of_word, new_node, matched_words = self._prefix_autofill(word=word)
+        matched_prefix_of_last_word, rest_of_word, new_node, matched_words = prefix_autofill(word=word)
 
         last_word = matched_prefix_of_last_word + rest_of_word
 
@@ -315,36 +756,18 @@ class AutoComplete:
                 return results, find_steps
         if len(rest_of_word) < 3:
             find_steps = [FindStep.descendants_only]
-            self._add_descendants_words_to_results(node=new_node, size=size, matched_words=matched_words, results=results, distance=1)
+            self._add_descendants_words_to_results(node=new_node, size=size, matched_words=matched_words, results=results, distance=1, batch=batch)
         else:
             find_steps = [FindStep.fuzzy_try]
-            word_chunks = deque(filter(lambda x: x, last_word.split(' ')))
-            new_word = word_chunks.popleft()
-
-            # TODO: experiment with the number here
-            # 'in los angeles' gets cut into `in los` so it becomes a closer match to `in lodi`
-            # but if the number was bigger, we could have matched with `in los angeles`
-            while len(new_word) < 5 and word_chunks:
-                new_word = f'{new_word} {word_chunks.popleft()}'
-            fuzzy_rest_of_word = ' '.join(word_chunks)
-
-            for _word in self.words:
-                if abs(len(_word) - len(new_word)) > max_cost:
-                    continue
-                dist = levenshtein_distance(new_word, _word)
-                if dist < max_cost:
-                    fuzzy_matches_len += 1
-                    _value = self.words[_word].get(ORIGINAL_KEY, _word)
-                    fuzzy_matches[dist].append(_value)
-                    fuzzy_min_distance = min(fuzzy_min_distance, dist)
-                    if fuzzy_matches_len >= size or dist < 2:
-                        break
+            new_word, fuzzy_rest_of_word = self._split_fuzzy_word(last_word)
+
+            fuzzy_matches, fuzzy_matches_len, fuzzy_min_distance = get_fuzzy_matches(new_word, max_cost, size)
             if fuzzy_matches_len:
                 find_steps.append(FindStep.fuzzy_found)
                 if fuzzy_rest_of_word:
                     call_count += 1
                     if call_count < 2:
-                        rest_of_results, rest_find_steps = self._find(word=fuzzy_rest_of_word, max_cost=max_cost, size=size, call_count=call_count)
+                        rest_of_results, rest_find_steps = self._find(word=fuzzy_rest_of_word, max_cost=max_cost, size=size, call_count=call_count, batch=batch)
                         find_steps.append({FindStep.rest_of_fuzzy_round2: rest_find_steps})
                 for _word in fuzzy_matches[fuzzy_min_distance]:
                     if rest_of_results:
@@ -353,19 +776,143 @@ class AutoComplete:
                             results[fuzzy_min_distance].append(matched_words + [_word] + _rest_of_matched_word)
                     else:
                         results[fuzzy_min_distance].append(matched_words + [_word])
-                        _matched_prefix_of_last_word_b, not_used_rest_of_word, fuzzy_new_node, _matched_words_b = self._prefix_autofill(word=_word)
+                        _matched_prefix_of_last_word_b, not_used_rest_of_word, fuzzy_new_node, _matched_words_b = prefix_autofill(word=_word)
                         if self._is_stop_word_condition(matched_words=_matched_words_b, matched_prefix_of_last_word=_matched_prefix_of_last_word_b):
                             break
-                        self._add_descendants_words_to_results(node=fuzzy_new_node, size=size, matched_words=matched_words, results=results, distance=fuzzy_min_distance)
+                        self._add_descendants_words_to_results(node=fuzzy_new_node, size=size, matched_words=matched_words, results=results, distance=fuzzy_min_distance, batch=batch)
 
             if matched_words and not self._is_enough_results(results, size):
                 find_steps.append(FindStep.not_enough_results_add_some_descandants)
                 total_min_distance = min(min_distance, fuzzy_min_distance)
-                self._add_descendants_words_to_results(node=new_node, size=size, matched_words=matched_words, results=results, distance=total_min_distance+1)
+                self._add_descendants_words_to_results(node=new_node, size=size, matched_words=matched_words, results=results, distance=total_min_distance+1, batch=batch)
 
         return results, find_steps
 
-    def _prefix_autofill(self, word, node=None):
+    @staticmethod
+    def _split_fuzzy_word(last_word):
+        """
+        Splits the last word into the part that is matched fuzzily and the rest of it.
+        """
+        word_chunks = deque(filter(lambda x: x, last_word.split(' ')))
+        new_word = word_chunks.popleft()
+
+        # TODO: experiment with the number here
+        # 'in los angeles' gets cut into `in los` so it becomes a closer match to `in lodi`
+        # but if the number was bigger, we could have matched with `in los angeles`
+        while len(new_word) < 5 and word_chunks:
+            new_word = f'{new_word} {word_chunks.popleft()}'
+        return new_word, ' '.join(word_chunks)
+
+    def _get_fuzzy_matches(self, new_word, max_cost, size):
+        if self.FUZZY_ENGINE is FuzzyEngine.best_first:
+            return self._get_best_fuzzy_matches(new_word, max_cost, size)
+        fuzzy_matches = defaultdict(list)
+        fuzzy_matches_len = 0
+        fuzzy_min_distance = INF
+        # With LOCK_FREE_READS, the words dictionary might be replaced while this runs.
+        words = self.words
+        for _word, dist in self._iter_fuzzy_candidates(new_word, max_cost):
+            if _word not in words:
+                continue
+            fuzzy_matches_len += 1
+            _value = words[_word].get(ORIGINAL_KEY, _word)
+            fuzzy_matches[dist].append(_value)
+            fuzzy_min_distance = min(fuzzy_min_distance, dist)
+            if fuzzy_matches_len >= size or dist < 2:
+                break
+        return fuzzy_matches, fuzzy_matches_len, fuzzy_min_distance
+
+    def _get_many_fuzzy_matches(self, new_words, max_cost, size):
+        """
+        Gets the fuzzy matches of several words at once. Returns a dictionary of each word
+        to the same result as _get_fuzzy_matches.
+
+        With the scan engine, the words dictionary is only scanned once and each word of it is
+        compared to all the new words that have a close enough length. The other engines already
+        only look at a few candidates per word, so they are called once per word.
+        """
+        if self.FUZZY_ENGINE is not FuzzyEngine.scan:
+            return {new_word: self._get_fuzzy_matches(new_word, max_cost, size) for new_word in new_words}
+        matches = {new_word: [defaultdict(list), 0, INF] for new_word in new_words}
+        new_words_by_length = defaultdict(list)
+        for new_word in matches:
+            new_words_by_length[len(new_word)].append(new_word)
+        remaining = len(matches)
+        for _word in self.words:
+            if not remaining:
+                break
+            length = len(_word)
+            for new_word_length in range(length - max_cost, length + max_cost + 1):
+                new_words_of_length = new_words_by_length.get(new_word_length)
+                if not new_words_of_length:
+                    continue
+                for new_word in new_words_of_length.copy():
+                    dist = levenshtein_distance(new_word, _word)
+                    if dist < max_cost:
+                        match = matches[new_word]
+                        match[0][dist].append(self.words[_word].get(ORIGINAL_KEY, _word))
+                        match[1] += 1
+                        match[2] = min(match[2], dist)
+                        # The same condition that _get_fuzzy_matches stops at
+                        if match[1] >= size or dist < 2:
+                            new_words_of_length.remove(new_word)
+                            remaining -= 1
+        return {new_word: tuple(match) for new_word, match in matches.items()}
+
+    def _get_best_fuzzy_matches(self, new_word, max_cost, size):
+        fuzzy_matches = defaultdict(list)
+        fuzzy_matches_len = 0
+        fuzzy_min_distance = INF
+        found_words = set()
+        for node, path, dist in self._dwg.get_best_fuzzy_nodes(new_word, max_cost):
+            _word = node.word
+            if _word in found_words or _word not in self.words:
+                continue
+            # The node was reached via a synonym branch. It will be reached via its own branch too.
+            if path != _word and path != self.normalizer.normalize_node_name(_word):
+                continue
+            found_words.add(_word)
+            fuzzy_matches_len += 1
+            _value = self.words[_word].get(ORIGINAL_KEY, _word)
+            fuzzy_matches[dist].append(_value)
+            fuzzy_min_distance = min(fuzzy_min_distance, dist)
+            if fuzzy_matches_len >= size:
+                break
+        return fuzzy_matches, fuzzy_matches_len, fuzzy_min_distance
+
+    def _iter_fuzzy_candidates(self, new_word, max_cost):
+        """
+        Yields the words that are less than max_cost edit distance away from the new_word
+        and their distance. The words are yielded in the same order as the words dictionary
+        no matter which fuzzy engine is used, so the results do not depend on the engine.
+        """
+        if self.FUZZY_ENGINE is FuzzyEngine.trie:
+            return self._iter_fuzzy_candidates_via_trie(new_word, max_cost)
+        if self.FUZZY_ENGINE is FuzzyEngine.ngram:
+            return self._iter_fuzzy_candidates_via_ngram(new_word, max_cost)
+        return self._iter_fuzzy_candidates_via_scan(new_word, max_cost)
+
+    def _iter_fuzzy_candidates_via_scan(self, new_word, max_cost):
+        for _word in self.words:
+            if abs(len(_word) - len(new_word)) > max_cost:
+                continue
+            dist = levenshtein_distance(new_word, _word)
+            if dist < max_cost:
+                yield _word, dist
+
+    def _iter_fuzzy_candidates_via_ngram(self, new_word, max_cost):
+        for _word in self._ngram_index.get_candidates(new_word, max_distance=max_cost - 1):
+            dist = levenshtein_distance(new_word, _word)
+            if dist < max_cost:
+                yield _word, dist
+
+    def _iter_fuzzy_candidates_via_trie(self, new_word, max_cost):
+        return self._trie_index.get_candidates(new_word, max_distance=max_cost - 1)
+
+    def _prefix_autofill(self, word, node=None, first_part=None):
+        """
+        :param first_part: (optional) The result of _prefix_autofill_part for the word if it is already known.
+        """
         len_prev_rest_of_last_word = INF
         matched_words = []
         matched_words_set = set()
@@ -379,7 +926,9 @@ class AutoComplete:
                     is_added = True
             return is_added
 
-        matched_prefix_of_last_word, rest_of_word, node, matched_words_part, matched_condition_ever, matched_condition_in_branch = self._prefix_autofill_part(word, node)
+        if first_part is None:
+            first_part = self._prefix_autofill_part(word, node)
+        matched_prefix_of_last_word, rest_of_word, node, matched_words_part, matched_condition_ever, matched_condition_in_branch = first_part
         _add_words(matched_words_part)
         result = (matched_prefix_of_last_word, rest_of_word, node, matched_words)
         len_rest_of_last_word = len(rest_of_word)
@@ -417,61 +966,148 @@ class AutoComplete:
         return matched_words, matched_condition_in_branch
 
     def _prefix_autofill_part(self, word, node=None, matched_condition_ever=False, matched_condition_in_branch=False):
-        node = node or self._dwg
-        que = deque(word)
-
-        matched_prefix_of_last_word = ''
-        matched_words = []
-        nodes_that_words_were_extracted = set()
-
-        while que:
-            char = que.popleft()
+        state = _PrefixWalkState(node or self._dwg, matched_condition_ever, matched_condition_in_branch)
+        for i, char in enumerate(word):
+            self._advance_prefix_walk(state, char)
+            if state.rest_of_word:
+                state.rest_of_word = word[i:]
+                break
+        return self._end_prefix_walk(state)
 
-            if node.children:
-                if char not in node.children:
-                    space_child = node.children.get(' ')
-                    if space_child and char in space_child.children:
-                        node = space_child
-                    else:
-                        que.appendleft(char)
-                        break
-                node = node.children[char]
-                if char != ' ' or matched_prefix_of_last_word:
-                    matched_prefix_of_last_word += char
-                if node.word:
-                    if que:
-                        next_char = que[0]
-                        if next_char != ' ':
-                            continue
-                    matched_words, matched_condition_in_branch = self._add_to_matched_words(node, matched_words, matched_condition_in_branch, matched_condition_ever, matched_prefix_of_last_word)
-                    nodes_that_words_were_extracted.add(node)
-                    matched_prefix_of_last_word = ''
-            else:
-                if char == ' ':
-                    node = self._dwg
-                    if matched_condition_in_branch:
-                        matched_condition_ever = True
+    def _advance_prefix_walk(self, state, char):
+        """
+        Walks the state of _prefix_autofill_part one character forward.
+        Once the walk can not go any further, the characters are added to the rest_of_word.
+        """
+        if state.rest_of_word:
+            state.rest_of_word += char
+            return
+        node = state.node
+        # The word of the node is only matched if the word is followed by a space or nothing at all.
+        if state.is_word_pending:
+            state.is_word_pending = False
+            if char == ' ':
+                self._add_to_walk_matched_words(state)
+
+        if node.children:
+            if char not in node.children:
+                space_child = node.children.get(' ')
+                if space_child and char in space_child.children:
+                    node = space_child
                 else:
-                    que.appendleft(char)
-                    break
-
-        if not que and node.word and node not in nodes_that_words_were_extracted:
-            matched_words, matched_condition_in_branch = self._add_to_matched_words(node, matched_words, matched_condition_in_branch, matched_condition_ever, matched_prefix_of_last_word)
-            matched_prefix_of_last_word = ''
-
-        rest_of_word = "".join(que)
-        if matched_condition_in_branch:
-            matched_condition_ever = True
-
-        return matched_prefix_of_last_word, rest_of_word, node, matched_words, matched_condition_ever, matched_condition_in_branch
+                    state.rest_of_word = char
+                    return
+            node = state.node = node.children[char]
+            if char != ' ' or state.matched_prefix_of_last_word:
+                state.matched_prefix_of_last_word += char
+            if node.word:
+                state.is_word_pending = True
+        else:
+            if char == ' ':
+                state.node = self._dwg
+                if state.matched_condition_in_branch:
+                    state.matched_condition_ever = True
+            else:
+                state.rest_of_word = char
 
-    def _add_descendants_words_to_results(self, node, size, matched_words, results, distance, should_traverse=True):
-        descendant_words = list(node.get_descendants_words(size, should_traverse, full_stop_words=self._full_stop_words))
+    def _end_prefix_walk(self, state):
+        """
+        Ends the walk of _prefix_autofill_part and returns its results.
+        It changes the state, so pass a copy of it if the walk needs to go on later.
+        """
+        node = state.node
+        if state.is_word_pending or (not state.rest_of_word and node.word and node not in state.nodes_that_words_were_extracted):
+            self._add_to_walk_matched_words(state)
+        if state.matched_condition_in_branch:
+            state.matched_condition_ever = True
+        return state.matched_prefix_of_last_word, state.rest_of_word, node, state.matched_words, state.matched_condition_ever, state.matched_condition_in_branch
+
+    def _add_to_walk_matched_words(self, state):
+        state.matched_words, state.matched_condition_in_branch = self._add_to_matched_words(
+            state.node, state.matched_words, state.matched_condition_in_branch, state.matched_condition_ever, state.matched_prefix_of_last_word)
+        state.nodes_that_words_were_extracted.add(state.node)
+        state.matched_prefix_of_last_word = ''
+
+    def _add_descendants_words_to_results(self, node, size, matched_words, results, distance, should_traverse=True, batch=None):
+        get_descendant_words = batch.get_descendant_words if batch else self._get_descendant_words
+        descendant_words = get_descendant_words(node, size, should_traverse)
         extended = _extend_and_repeat(matched_words, descendant_words)
         if extended:
             results[distance].extend(extended)
         return distance
 
+    def _get_descendant_words(self, node, size, should_traverse=True):
+        if size < self.TOP_DESCENDANTS_SIZE:
+            top_nodes = self._get_top_descendant_nodes(node, should_traverse)
+            return [_node.value for _node in top_nodes[:size + 1]]
+        if self.BEST_FIRST_DESCENDANTS and not self._full_stop_words and should_traverse and isinstance(node, _DawgNode):
+            nodes = list(islice(node.get_descendants_nodes_by_count(), size + 1))
+            # The best-first order keeps a value at its highest count but get_descendants_words keeps it
+            # at the first node in the breadth first order. That only differs for the values that can be
+            # on several nodes, so if any of them are in the top nodes the breadth first order is used.
+            if not any(map(self._can_be_on_several_nodes, nodes)):
+                return [_node.value for _node in nodes]
+        return list(node.get_descendants_words(size, should_traverse, full_stop_words=self._full_stop_words))
+
+    def _can_be_on_several_nodes(self, node):
+        """
+        Whether the value of the node can also be on other nodes: the words of the partial synonyms
+        have the original key as their value and the branches of the clean synonyms have the word.
+        """
+        return bool(node.original_key) or node.word in self._clean_synonyms or node.word in self._original_keys
+
+    def _get_top_descendant_nodes(self, node, should_traverse=True):
+        """
+        Gets the descendant nodes of the node with the highest counts, up to TOP_DESCENDANTS_SIZE.
+        They are in the same order as get_descendants_words would return them.
+        """
+        key = (node, should_traverse)
+        top_descendants = self._top_descendants
+        memoized = top_descendants.get(key)
+        if memoized is None:
+            found_nodes = sorted(
+                node.get_descendants_nodes(INF, should_traverse, full_stop_words=self._full_stop_words),
+                key=lambda node: node.count,
+                reverse=True
+            )
+            top_nodes = found_nodes[:self.TOP_DESCENDANTS_SIZE]
+            # Any node that is not in the top nodes needs at least this count to get into them.
+            min_count = top_nodes[-1].count if len(found_nodes) > len(top_nodes) else INF
+            memoized = (top_nodes, set(top_nodes), min_count)
+            top_descendants[key] = memoized
+            while len(top_descendants) > self.TOP_DESCENDANTS_MEMO_SIZE:
+                try:
+                    top_descendants.popitem(last=False)
+                except KeyError:
+                    break
+        else:
+            try:
+                top_descendants.move_to_end(key)
+            except KeyError:
+                # It was just invalidated by another thread.
+                pass
+        return memoized[0]
+
+    def _invalidate_top_descendants(self, node, ancestors):
+        """
+        Removes the memoized top descendants that might change now that the count of the node has changed.
+
+        :param ancestors: The ancestor nodes of the node from _get_ancestor_nodes. Only their memoized
+                          top descendants can have the node in them. With None, the whole memo is cleared.
+        """
+        top_descendants = self._top_descendants
+        if not top_descendants:
+            return
+        if ancestors is None:
+            top_descendants.clear()
+            return
+        count = node.count
+        for ancestor in ancestors:
+            for key in ((ancestor, True), (ancestor, False)):
+                memoized = top_descendants.get(key)
+                if memoized is not None and (node in memoized[1] or count >= memoized[2]):
+                    top_descendants.pop(key, None)
+
     def _node_word_info_matches_condition(self, node, condition):
         _word = node.word
         word_info = self.words.get(_word)
@@ -499,21 +1135,535 @@ class AutoComplete:
         Update the count attribute of a node in the dwg. This only affects the autocomplete
         object and not the original count of the node in the data that was fed into fast_autocomplete.
         """
+        if self.LOCK_FREE_READS and (offset or count) and isinstance(self._dwg, _DawgNode):
+            with self._lock:
+                return self._update_count_of_word_copy_on_write(word, count=count, offset=offset)
         matched_prefix_of_last_word, rest_of_word, node, matched_words_part, matched_condition_ever, matched_condition_in_branch = self._prefix_autofill_part(word=word)
         if node:
             if offset:
                 with self._lock:
                     node.count += offset
+                    self._after_count_update(node)
             elif count:
                 with self._lock:
                     node.count = count
+                    self._after_count_update(node)
         else:
             raise NodeNotFound(f'Unable to find a node for word {word}')
         return node.count
 
+    def _update_count_of_word_copy_on_write(self, word, count=None, offset=None):
+        """
+        Updates the count of the word in a copy of the nodes that lead to it and then swaps the
+        root of the dwg with the copy of the root. The searches that are already running keep
+        reading the old nodes which do not change. This needs to be called with the lock.
+        """
+        node = self._prefix_autofill_part(word=word)[2]
+        ancestors = self._get_ancestor_nodes(node)
+        is_partial_copy = ancestors is not None
+        if not is_partial_copy:
+            ancestors = self._dwg.get_all_nodes()
+        copies = {ancestor: ancestor.copy() for ancestor in ancestors}
+        for node_copy in copies.values():
+            for char, child_node in node_copy.children.items():
+                if child_node in copies:
+                    node_copy.children[char] = copies[child_node]
+        new_node = copies[node]
+        if offset:
+            new_node.count += offset
+        else:
+            new_node.count = count
+        if self.BEST_FIRST_DESCENDANTS:
+            if is_partial_copy:
+                self._update_max_counts(new_node, ancestors=list(copies.values()))
+            else:
+                self._populate_max_counts(copies[self._dwg])
+        for ancestor in ancestors:
+            self._top_descendants.pop((ancestor, True), None)
+            self._top_descendants.pop((ancestor, False), None)
+        self._dwg = copies[self._dwg]
+        if self._cache_dependencies is not None:
+            self._invalidate_cache_for_count(new_node, ancestors if is_partial_copy else None)
+        return new_node.count
+
+    def _after_count_update(self, node):
+        ancestors = self._get_ancestor_nodes(node) if self._top_descendants or self._cache_dependencies is not None else None
+        self._invalidate_top_descendants(node, ancestors)
+        if self.BEST_FIRST_DESCENDANTS and isinstance(node, _DawgNode):
+            self._update_max_counts(node)
+        if self._cache_dependencies is not None:
+            self._invalidate_cache_for_count(node, ancestors)
+
+    def _invalidate_cache_for_count(self, node, ancestors):
+        """
+        Deletes the cached results that depend on the count of the node.
+
+        :param ancestors: The nodes that the node is a descendant of. If None, all the cached
+                          results that have dependencies are deleted.
+        """
+        dependencies = self._cache_dependencies
+        if ancestors is None:
+            keys = dependencies.pop_all_keys()
+        else:
+            is_fuzzy_dependency = None
+            if self.FUZZY_ENGINE is FuzzyEngine.best_first:
+                branch = self.normalizer.normalize_node_name(node.word)
+
+                def is_fuzzy_dependency(new_word, max_cost):
+                    return levenshtein_distance(new_word, branch) < max_cost
+
+            keys = dependencies.pop_keys(ancestors, is_fuzzy_dependency)
+        for key in keys:
+            self._lfu_cache.delete(key)
+
     def get_count_of_word(self, word):
         return self.update_count_of_word(word)
 
+    def add_word(self, word, context=None, count=None):
+        """
+        Adds a word, or updates the context and the count of a word that is already added,
+        without populating the dwg again. The synonyms of the word are added too.
+
+        :param word: The word to add.
+        :param context: (optional) The context of the word, the same as the values of the words dictionary.
+        :param count: (optional) The count of the word. Defaults to the count in the context.
+        """
+        value = {} if context is None else context
+        if count is not None:
+            value = _copy_value(value, count=count)
+        with self._lock:
+            self._check_dwg_is_not_frozen()
+            new_words = {word: value}
+            new_words.update(self._get_partial_synonym_words(word, value))
+            self._add_words(new_words)
+
+    def remove_word(self, word):
+        """
+        Removes a word, the synonym branches that lead to it and the words that its partial
+        synonyms made, without populating the dwg again.
+        """
+        with self._lock:
+            self._check_dwg_is_not_frozen()
+            value = self.words.get(word)
+            if value is None:
+                raise NodeNotFound(f'Unable to find a node for word {word}')
+            removed_words = [word] + [
+                new_word for new_word in self._get_partial_synonym_words(word, value)
+                if new_word in self.words and self.words[new_word].get(ORIGINAL_KEY) == word
+            ]
+            branches = self._get_words_branches(removed_words)
+
+            def _remove_words(root):
+                for removed_word in removed_words:
+                    branch = self.normalizer.normalize_node_name(removed_word)
+                    node = self._get_branch_node(root, branch)
+                    for synonym in self._clean_synonyms.get(removed_word, []):
+                        synonym_branch = self.normalizer.normalize_node_name(synonym)
+                        if synonym_branch != branch:
+                            self._remove_word_from_branch(root, synonym_branch, removed_word, merged_node=node)
+                    self._remove_word_from_branch(root, branch, removed_word)
+
+            ancestors = self._change_dwg(branches, _remove_words)
+            words = self.words if not self.LOCK_FREE_READS else self.words.copy()
+            for removed_word in removed_words:
+                words.pop(removed_word, None)
+                self._remove_from_fuzzy_index(removed_word)
+            self.words = words
+        self._invalidate_cache_for_branches(branches, ancestors)
+
+    def add_synonym(self, key, synonym):
+        """
+        Adds a synonym of the key without populating the dwg again.
+        Just like the synonyms that are passed to the constructor, if the key starts with the synonym,
+        it is a partial synonym. Otherwise it is a clean synonym.
+        """
+        key = key.strip().lower()
+        synonym = synonym.strip().lower()
+        with self._lock:
+            self._check_dwg_is_not_frozen()
+            raw_synonyms = self._raw_synonyms.setdefault(key, [])
+            if synonym in raw_synonyms:
+                return
+            raw_synonyms.append(synonym)
+            if key.startswith(synonym):
+                self._partial_synonyms.setdefault(key, []).append(synonym)
+                self._partial_synonyms_index.add(key)
+                new_words = {}
+                for word, value in self.words.items():
+                    if word.startswith(key) and not value.get(ORIGINAL_KEY):
+                        new_words.update(self._get_partial_synonym_words(word, value, partial_synonyms={key: [synonym]}))
+                self._add_words(new_words)
+                return
+            self._clean_synonyms.setdefault(key, []).append(synonym)
+            self._reverse_synonyms[synonym] = key
+            if key not in self.words:
+                return
+            branches = [self.normalizer.normalize_node_name(synonym)]
+
+            def _add_synonym(root):
+                leaf_node = self._get_branch_node(root, self.normalizer.normalize_node_name(key))
+                if leaf_node:
+                    self.insert_word_branch(synonym, leaf_node=leaf_node, add_word=False, root=root)
+
+            ancestors = self._change_dwg(branches, _add_synonym)
+        self._invalidate_cache_for_branches(branches, ancestors)
+
+    def _check_dwg_is_not_frozen(self):
+        if not isinstance(self._dwg, _DawgNode):
+            from fast_autocomplete.frozen import FrozenDawgError
+            raise FrozenDawgError('The dwg is frozen. Words and synonyms can not be added or removed anymore.')
+
+    def _add_words(self, new_words):
+        """
+        Adds the words and their clean synonyms to the dwg and the words dictionary. Needs the lock.
+        """
+        branches = self._get_words_branches(new_words)
+        ancestors = self._change_dwg(branches, lambda root: self._insert_words(new_words, root=root))
+        for new_word in new_words:
+            if new_word not in self.words:
+                self._add_to_fuzzy_index(new_word)
+        if self.LOCK_FREE_READS:
+            words = self.words.copy()
+            words.update(new_words)
+            self.words = words
+        else:
+            self.words.update(new_words)
+        self._invalidate_cache_for_branches(branches, ancestors)
+
+    def _get_words_branches(self, words):
+        branches = []
+        for word in words:
+            branches.append(self.normalizer.normalize_node_name(word))
+            branches.extend(self.normalizer.normalize_node_name(synonym) for synonym in self._clean_synonyms.get(word, []))
+        return [branch for branch in branches if branch]
+
+    @staticmethod
+    def _get_branch_node(root, branch):
+        node = root
+        for char in branch:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def _remove_word_from_branch(root, branch, word, merged_node=None):
+        """
+        Removes the word from the end of the branch and then removes the nodes of the branch
+        that are left with no word and no children.
+
+        :param merged_node: (optional) The node of the word if the branch is a synonym branch.
+                            If the synonym branch is merged into it, the merge is removed.
+        """
+        if not branch:
+            return
+        branch_nodes = [root]
+        for char in branch:
+            child_node = branch_nodes[-1].children.get(char)
+            if child_node is None:
+                return
+            branch_nodes.append(child_node)
+        node = branch_nodes.pop()
+        if node.word != word:
+            return
+        if merged_node is not None and node is merged_node:
+            del branch_nodes[-1].children[branch[-1]]
+        else:
+            node.word = node.original_key = None
+            node.count = 0
+            branch_nodes.append(node)
+        for i in range(len(branch_nodes) - 1, 0, -1):
+            if branch_nodes[i].word or branch_nodes[i].children:
+                break
+            del branch_nodes[i - 1].children[branch[i - 1]]
+
+    def _change_dwg(self, branches, change):
+        """
+        Calls change(root) to change the nodes of the dwg on the branches. Needs the lock.
+        Returns the nodes that led to the branches before the change.
+
+        With LOCK_FREE_READS, the nodes that lead to the branches are copied first, the change
+        is made to the copies and then the root of the dwg is swapped with the copy of the root.
+        """
+        # The root is an ancestor of every branch. It is also copied when there are no branches,
+        # for example for a word that has no valid characters.
+        ancestors = {self._dwg: self._dwg}
+        for branch in branches:
+            for ancestor in self._get_branch_ancestor_nodes(branch):
+                ancestors[ancestor] = ancestor
+        if self.LOCK_FREE_READS:
+            copies = {ancestor: ancestor.copy() for ancestor in ancestors}
+            for node_copy in copies.values():
+                for char, child_node in node_copy.children.items():
+                    if child_node in copies:
+                        node_copy.children[char] = copies[child_node]
+            root = copies[self._dwg]
+        else:
+            root = self._dwg
+        change(root)
+        if self.BEST_FIRST_DESCENDANTS:
+            changed_nodes = {}
+            for branch in branches:
+                for node in self._get_branch_ancestor_nodes(branch, root=root):
+                    changed_nodes[node] = node
+            self._recompute_max_counts(list(changed_nodes))
+        for ancestor in ancestors:
+            self._top_descendants.pop((ancestor, True), None)
+            self._top_descendants.pop((ancestor, False), None)
+        self._dwg = root
+        self._dwg_version += 1
+        return list(ancestors)
+
+    def _invalidate_cache_for_branches(self, branches, ancestors=()):
+        """
+        Deletes the cached results of the searches that might reach any of the branches.
+
+        :param ancestors: The nodes that led to the branches. With TRACK_CACHE_DEPENDENCIES, the
+                          cached results that depend on them are deleted too.
+        """
+        dependencies = self._cache_dependencies
+        keys = dependencies.pop_keys(ancestors) if dependencies is not None else set()
+        branches = branches + [synonym_branch for branch in branches for synonym_branch in self._get_synonym_branches(branch)]
+        changed_nodes = None
+        if dependencies is None:
+            # A search whose prefix walk ends on one of these nodes lists the descendants of that
+            # node, so its results can change even if the search itself does not reach the branch.
+            # For example a word that matches nothing ends on the root.
+            changed_nodes = {}
+            for branch in branches:
+                for node in self._get_branch_ancestor_nodes(branch):
+                    changed_nodes[node] = node
+        for key in self._lfu_cache.keys():
+            if key in keys:
+                continue
+            word, max_cost, size = key.rsplit('-', 2)
+            max_cost = int(max_cost)
+            if any(self._might_reach_branch(word, max_cost, branch) for branch in branches):
+                keys.add(key)
+            elif changed_nodes is not None and self._prefix_autofill(word=word)[2] in changed_nodes:
+                keys.add(key)
+        if dependencies is not None:
+            dependencies.forget(keys)
+        for key in keys:
+            self._lfu_cache.delete(key)
+
+    def _get_synonym_branches(self, branch):
+        """
+        Gets the branches that start with a clean synonym of a word that the branch starts with.
+        The synonym branch is merged into the node of the word, so walking it leads to the same nodes.
+        """
+        synonym_branches = []
+        node = self._dwg
+        for i, char in enumerate(branch, 1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            synonyms = self._clean_synonyms.get(node.word) if node.word else None
+            if synonyms and i < len(branch) and self.normalizer.normalize_node_name(node.word) == branch[:i]:
+                synonym_branches.extend(self.normalizer.normalize_node_name(synonym) + branch[i:] for synonym in synonyms)
+        return synonym_branches
+
+    @staticmethod
+    def _might_reach_branch(word, max_cost, branch):
+        """
+        Checks if the search of the word might reach the branch. It can give false positives.
+
+        Every word of the search can start a new walk from the root. The walk either ends up on
+        the branch or the branch under it, or a few words of the search are fuzzy matched with
+        a word that the branch starts with.
+        """
+        starts = [0] + [i + 1 for i, char in enumerate(word) if char == ' ']
+        compact_branch = branch.replace(' ', '')
+        for start in starts:
+            rest_of_word = word[start:]
+            if branch.startswith(rest_of_word) or rest_of_word.startswith(branch):
+                return True
+            # The walk jumps over the spaces of the branch.
+            compact_rest_of_word = rest_of_word.replace(' ', '')
+            if compact_branch.startswith(compact_rest_of_word) or compact_rest_of_word.startswith(compact_branch):
+                return True
+            ends = [i for i, char in enumerate(rest_of_word) if char == ' '] + [len(rest_of_word)]
+            for end in ends:
+                chunk = rest_of_word[:end]
+                # The fuzzy step only runs on the rest of the word when it is at least 3 characters.
+                if len(chunk) < 3:
+                    continue
+                for length in range(max(len(chunk) - max_cost, 1), min(len(chunk) + max_cost, len(branch)) + 1):
+                    if levenshtein_distance(chunk, branch[:length]) < max_cost:
+                        return True
+        return False
+
+
+class _PrefixWalkState:
+    """
+    The state of the walk of _prefix_autofill_part after some characters of the word.
+    """
+
+    __slots__ = ("node", "matched_prefix_of_last_word", "rest_of_word", "matched_words", "nodes_that_words_were_extracted",
+                 "matched_condition_ever", "matched_condition_in_branch", "is_word_pending")
+
+    def __init__(self, node, matched_condition_ever=False, matched_condition_in_branch=False):
+        self.node = node
+        self.matched_prefix_of_last_word = ''
+        self.rest_of_word = ''
+        self.matched_words = []
+        self.nodes_that_words_were_extracted = set()
+        self.matched_condition_ever = matched_condition_ever
+        self.matched_condition_in_branch = matched_condition_in_branch
+        self.is_word_pending = False
+
+    def copy(self):
+        state = _PrefixWalkState(self.node, self.matched_condition_ever, self.matched_condition_in_branch)
+        state.matched_prefix_of_last_word = self.matched_prefix_of_last_word
+        state.rest_of_word = self.rest_of_word
+        state.matched_words = self.matched_words.copy()
+        state.nodes_that_words_were_extracted = self.nodes_that_words_were_extracted.copy()
+        state.is_word_pending = self.is_word_pending
+        return state
+
+
+class _SearchBatch:
+    """
+    Memoizes the work that the searches of one search_many call share.
+    The results are only valid while the dwg and the counts do not change.
+
+    After start_tracking, it also records the nodes whose descendants were used and the
+    fuzzy words that were matched, which is what the results of the search depend on.
+    """
+
+    __slots__ = ("_autocomplete", "_prefix_autofill_results", "_fuzzy_matches", "_descendant_words",
+                 "dependency_nodes", "fuzzy_words")
+
+    def __init__(self, autocomplete):
+        self._autocomplete = autocomplete
+        self._prefix_autofill_results = {}
+        self._fuzzy_matches = {}
+        self._descendant_words = {}
+        self.dependency_nodes = None
+        self.fuzzy_words = None
+
+    def start_tracking(self):
+        self.dependency_nodes = set()
+        self.fuzzy_words = set()
+
+    def prefix_autofill(self, word):
+        result = self._prefix_autofill_results.get(word)
+        if result is None:
+            result = self._prefix_autofill_results[word] = self._autocomplete._prefix_autofill(word=word)
+        return result
+
+    def get_fuzzy_matches(self, new_word, max_cost, size):
+        if self.fuzzy_words is not None:
+            self.fuzzy_words.add((new_word, max_cost))
+        key = (new_word, max_cost, size)
+        result = self._fuzzy_matches.get(key)
+        if result is None:
+            result = self._fuzzy_matches[key] = self._autocomplete._get_fuzzy_matches(new_word, max_cost, size)
+        return result
+
+    def add_prefix_autofill(self, word, result):
+        self._prefix_autofill_results[word] = result
+
+    def add_fuzzy_matches(self, fuzzy_matches, max_cost, size):
+        for new_word, result in fuzzy_matches.items():
+            self._fuzzy_matches[(new_word, max_cost, size)] = result
+
+    def get_descendant_words(self, node, size, should_traverse=True):
+        if self.dependency_nodes is not None:
+            self.dependency_nodes.add(node)
+        key = (node, size, should_traverse)
+        result = self._descendant_words.get(key)
+        if result is None:
+            result = self._descendant_words[key] = self._autocomplete._get_descendant_words(node, size, should_traverse)
+        return result
+
+
+class _CacheDependencies:
+    """
+    Records which nodes the cached search results depend on, so a count update only deletes
+    the cached results that it can change.
+
+    A result depends on every node whose descendants it was made of, since the descendants are
+    sorted by count. With the best_first fuzzy engine, it also depends on the counts of the words
+    that are close to its fuzzy words.
+    """
+
+    def __init__(self):
+        # It is taken before the lock of the cache. Evicting a key from the cache takes it again.
+        self.lock = RLock()
+        # Goes up every time keys are invalidated. The results that were found before that are not cached.
+        self.version = 0
+        self._keys_by_node = defaultdict(set)
+        # key to (nodes, fuzzy words)
+        self._dependencies = {}
+
+    def set(self, cache, key, result, version, nodes, fuzzy_words):
+        """
+        Caches the result under the key unless keys were invalidated since the version.
+        """
+        with self.lock:
+            if version != self.version:
+                return
+            cache.set(key, result)
+            dependencies = self._dependencies.get(key)
+            if dependencies is None:
+                dependencies = self._dependencies[key] = (set(), set())
+            for node in nodes:
+                if node not in dependencies[0]:
+                    dependencies[0].add(node)
+                    self._keys_by_node[node].add(key)
+            dependencies[1].update(fuzzy_words)
+
+    def on_evict(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def pop_keys(self, nodes, is_fuzzy_dependency=None):
+        """
+        Returns the keys that depend on any of the nodes, or on a fuzzy word that
+        is_fuzzy_dependency(fuzzy word, max_cost) is True for, and forgets them.
+        """
+        with self.lock:
+            self.version += 1
+            keys = set()
+            for node in nodes:
+                keys.update(self._keys_by_node.get(node, ()))
+            if is_fuzzy_dependency is not None:
+                for key, (_, fuzzy_words) in self._dependencies.items():
+                    if any(is_fuzzy_dependency(new_word, max_cost) for new_word, max_cost in fuzzy_words):
+                        keys.add(key)
+            for key in keys:
+                self._remove(key)
+        return keys
+
+    def pop_all_keys(self):
+        with self.lock:
+            self.version += 1
+            keys = set(self._dependencies)
+            self._dependencies.clear()
+            self._keys_by_node.clear()
+        return keys
+
+    def forget(self, keys):
+        with self.lock:
+            self.version += 1
+            for key in keys:
+                self._remove(key)
+
+    def _remove(self, key):
+        dependencies = self._dependencies.pop(key, None)
+        if dependencies is None:
+            return
+        for node in dependencies[0]:
+            keys = self._keys_by_node.get(node)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_node[node]
+
+    def __len__(self):
+        return len(self._dependencies)
+
 
 class _DawgNode:
     """
@@ -522,17 +1672,44 @@ class _DawgNode:
     set of words.
     """
 
-    __slots__ = ("word", "original_key", "children", "count")
+    __slots__ = ("word", "original_key", "children", "count", "max_count")
 
     def __init__(self):
         self.word = None
         self.original_key = None
         self.children = {}
         self.count = 0
+        # The max count in the subtree of this node. Only used with BEST_FIRST_DESCENDANTS.
+        self.max_count = 0
 
     def __getitem__(self, key):
         return self.children[key]
 
+    def get_all_nodes(self):
+        """
+        Returns this node and all the nodes under it in the breadth first order.
+        """
+        nodes = [self]
+        unique_nodes = {self}
+        for node in nodes:
+            for child_node in node.children.values():
+                if child_node not in unique_nodes:
+                    unique_nodes.add(child_node)
+                    nodes.append(child_node)
+        return nodes
+
+    def copy(self):
+        """
+        Returns a copy of the node that has the same children.
+        """
+        node = _DawgNode()
+        node.word = self.word
+        node.original_key = self.original_key
+        node.children = self.children.copy()
+        node.count = self.count
+        node.max_count = self.max_count
+        return node
+
     def __repr__(self):
         return f'<DawgNode children={list(self.children.keys())}, {self.word}>'
 
@@ -606,3 +1783,76 @@ class _DawgNode:
             found_nodes = islice(found_nodes_gen, size)
 
         return map(lambda word: word.value, found_nodes)
+
+    def get_descendants_nodes_by_count(self):
+        """
+        Yields the descendant nodes with unique values from the highest count to the lowest.
+        The nodes with the same count are yielded in the breadth first order, the same as
+        get_descendants_words sorts them. A value that is on several nodes is yielded at its
+        highest count while get_descendants_words keeps it at its first node in the breadth
+        first order.
+
+        The branches are kept in a heap keyed on the max count of their subtree. Since no node
+        in a branch can have a higher count than that, a node is yielded as soon as it has
+        a higher count than all the branches in the heap. The max_count of the nodes needs
+        to be populated first.
+        """
+        # Branches are (-max_count, depth, path, 0, node) and found nodes are (-count, depth, path, 1, node).
+        # The path is the index of each child on the way to the node which is the breadth first order.
+        heap = []
+        expanded_nodes = {self}
+        found_values = set()
+        for index, child_node in enumerate(self.children.values()):
+            heappush(heap, (-child_node.max_count, 1, (index,), 0, child_node))
+        while heap:
+            _, depth, path, is_found, node = heappop(heap)
+            if is_found:
+                if node.value not in found_values:
+                    found_values.add(node.value)
+                    yield node
+                continue
+            if node in expanded_nodes:
+                continue
+            expanded_nodes.add(node)
+            if node.value:
+                heappush(heap, (-node.count, depth, path, 1, node))
+            for index, child_node in enumerate(node.children.values()):
+                if child_node not in expanded_nodes:
+                    heappush(heap, (-child_node.max_count, depth + 1, path + (index,), 0, child_node))
+
+    def get_best_fuzzy_nodes(self, word, max_cost):
+        """
+        Yields the (node, path, distance) of the descendant nodes with words that are less than
+        max_cost edit distance away from the word, ordered by (distance, -count, path).
+
+        The branches are kept in a heap keyed on the minimum of their Levenshtein row, which is
+        the lowest distance that any node in that branch can have. A node is only yielded once
+        no branch in the heap can produce a better node, so the caller can stop consuming the
+        generator as soon as it has enough nodes.
+        """
+        columns = len(word) + 1
+        sequence = itertools_count()
+        # Branches are (min distance, -INF, sequence, node, path, row) and found nodes are
+        # (distance, -count, path, node). Branches sort before the found nodes of the same distance.
+        heap = [(0, -INF, next(sequence), self, '', list(range(columns)))]
+        while heap:
+            entry = heappop(heap)
+            if len(entry) == 4:
+                dist, _, path, node = entry
+                yield node, path, dist
+                continue
+            _, _, _, node, path, previous_row = entry
+            for letter, child_node in node.children.items():
+                current_row = [previous_row[0] + 1]
+                for column in range(1, columns):
+                    current_row.append(min(
+                        current_row[column - 1] + 1,
+                        previous_row[column] + 1,
+                        previous_row[column - 1] + (word[column - 1] != letter),
+                    ))
+                child_path = path + letter
+                if current_row[-1] < max_cost and child_node.word:
+                    heappush(heap, (current_row[-1], -child_node.count, child_path, child_node))
+                min_distance = min(current_row)
+                if min_distance < max_cost:
+                    heappush(heap, (min_distance, -INF, next(sequence), child_node, child_path, current_row))
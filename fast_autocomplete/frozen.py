@@ -0,0 +1,422 @@
+"""
+Read-only version of the dwg that is stored in flat arrays instead of one Python object
+and one children dictionary per node.
+"""
+from array import array
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+from fast_autocomplete.dwg import INF, _DawgNode
+
+NO_ID = -1
+
+
+class FrozenDawgError(ValueError):
+    pass
+
+
+class FrozenDawg:
+    """
+    The frozen dwg is made of states and edges.
+
+    - The edges of state i are edges first_edges[i] to first_edges[i + 1].
+      The edges of each state keep the order that the children were inserted in the dwg
+      so the traversals return the same results as the original dwg.
+    - labels[edge] is the letter of the edge and targets[edge] is the state it goes to.
+    - finals[state] is 1 if the state has a word.
+
+    The word, original_key and count of the nodes are not stored on the states. Instead every
+    node that has a word gets a number which is its index in the word_ids, original_key_ids
+    and counts arrays. The word and the original_key are ids into the strings table.
+
+    The numbers are a perfect hash of the paths to the nodes: The number of a node is the
+    number of words that come before it in the depth first order of the dwg. It is calculated
+    while walking down the edges: edge_offsets[edge] is added to the number of the parent node.
+    The edges that merge a branch into a node that already has its own branch, such as the
+    synonym branches, store the number of that node instead as -(number + 1).
+
+    Since the payload of the nodes is not on the states, the states with the same words below
+    them can be merged into one state (minimize=True). For example the `sedan`, `coupe` and
+    `wagon` sub-branches that are repeated under many makes and models are only stored once.
+
+    The nodes are served as light weight views that are created on the fly and have the same
+    interface as _DawgNode, so the rest of Autocomplete does not need to know about the arrays.
+    The traversal of the descendants, which is where most of the search time goes, walks
+    the arrays directly and only creates the views of the nodes that it returns.
+    """
+
+    def __init__(self, strings, first_edges, labels, targets, edge_offsets, finals, word_ids, original_key_ids, counts):
+        self.strings = strings
+        self.first_edges = first_edges
+        self.labels = labels
+        self.targets = targets
+        self.edge_offsets = edge_offsets
+        self.finals = finals
+        self.word_ids = word_ids
+        self.original_key_ids = original_key_ids
+        self.counts = counts
+
+    @classmethod
+    def from_node(cls, root, minimize=False):
+        """
+        Builds the frozen dwg from the root _DawgNode of a populated dwg.
+
+        :param minimize: (Boolean, default: False) Merge the states that have the same words below them.
+        """
+        # The first edge that reaches a node is its own branch. Any other edge into it is a merge.
+        node_ids = {id(root): 0}
+        nodes = [root]
+        nodes_edges = []
+        i = 0
+        while i < len(nodes):
+            edges = []
+            for letter, child_node in nodes[i].children.items():
+                child_id = node_ids.get(id(child_node))
+                is_own_branch = child_id is None
+                if is_own_branch:
+                    child_id = node_ids[id(child_node)] = len(nodes)
+                    nodes.append(child_node)
+                edges.append((letter, child_id, is_own_branch))
+            nodes_edges.append(edges)
+            i += 1
+
+        finals = bytearray(1 if node.word else 0 for node in nodes)
+        words_below = [0] * len(nodes)
+        for i in reversed(range(len(nodes))):
+            words_below[i] = finals[i] + sum(words_below[child_id] for _, child_id, is_own_branch in nodes_edges[i] if is_own_branch)
+
+        numbers = [0] * len(nodes)
+        for i, edges in enumerate(nodes_edges):
+            number = numbers[i] + finals[i]
+            for _, child_id, is_own_branch in edges:
+                if is_own_branch:
+                    numbers[child_id] = number
+                    number += words_below[child_id]
+
+        string_ids = {}
+        strings = []
+
+        def _get_string_id(item):
+            if item is None:
+                return NO_ID
+            if item not in string_ids:
+                string_ids[item] = len(strings)
+                strings.append(item)
+            return string_ids[item]
+
+        words_count = words_below[0]
+        word_ids = array('q', [NO_ID]) * words_count
+        original_key_ids = array('q', [NO_ID]) * words_count
+        counts = array('q', [0]) * words_count
+        for i, node in enumerate(nodes):
+            if finals[i]:
+                number = numbers[i]
+                word_ids[number] = _get_string_id(node.word)
+                original_key_ids[number] = _get_string_id(node.original_key)
+                counts[number] = node.count
+
+        if minimize:
+            signatures = {}
+            node_classes = [0] * len(nodes)
+            for i in reversed(range(len(nodes))):
+                signature = (finals[i], tuple(
+                    (letter, True, node_classes[child_id]) if is_own_branch else (letter, False, numbers[child_id])
+                    for letter, child_id, is_own_branch in nodes_edges[i]
+                ))
+                node_classes[i] = signatures.setdefault(signature, len(signatures))
+            del signatures
+        else:
+            node_classes = range(len(nodes))
+
+        # The states are numbered in the order they are first seen so the root is state 0.
+        class_states = {}
+        representatives = []
+        for i in range(len(nodes)):
+            if node_classes[i] not in class_states:
+                class_states[node_classes[i]] = len(representatives)
+                representatives.append(i)
+
+        first_edges = array('q')
+        labels = []
+        targets = array('q')
+        edge_offsets = array('q')
+        state_finals = bytearray()
+        for i in representatives:
+            first_edges.append(len(labels))
+            state_finals.append(finals[i])
+            offset = finals[i]
+            for letter, child_id, is_own_branch in nodes_edges[i]:
+                labels.append(letter)
+                targets.append(class_states[node_classes[child_id]])
+                if is_own_branch:
+                    edge_offsets.append(offset)
+                    offset += words_below[child_id]
+                else:
+                    edge_offsets.append(-numbers[child_id] - 1)
+        first_edges.append(len(labels))
+
+        return cls(
+            strings=strings,
+            first_edges=first_edges,
+            labels=''.join(labels),
+            targets=targets,
+            edge_offsets=edge_offsets,
+            finals=state_finals,
+            word_ids=word_ids,
+            original_key_ids=original_key_ids,
+            counts=counts,
+        )
+
+    def to_sections(self):
+        """
+        Returns the arrays of the frozen dwg as a dictionary of names to bytes.
+        """
+        strings = [item.encode('utf-8') for item in self.strings]
+        string_offsets = array('q', [0])
+        for item in strings:
+            string_offsets.append(string_offsets[-1] + len(item))
+        return {
+            'strings': b''.join(strings),
+            'string_offsets': string_offsets.tobytes(),
+            'labels': self.labels.encode('utf-8'),
+            'first_edges': array('q', self.first_edges).tobytes(),
+            'targets': array('q', self.targets).tobytes(),
+            'edge_offsets': array('q', self.edge_offsets).tobytes(),
+            'finals': bytes(self.finals),
+            'word_ids': array('q', self.word_ids).tobytes(),
+            'original_key_ids': array('q', self.original_key_ids).tobytes(),
+            'counts': array('q', self.counts).tobytes(),
+        }
+
+    @classmethod
+    def from_sections(cls, sections):
+        """
+        Builds the frozen dwg from the sections that to_sections returned.
+        The sections can be memoryviews of a memory mapped file. In that case the arrays
+        are used in place without being copied, except the labels that need to be a string.
+        """
+        return cls(
+            strings=_StringTable(sections['strings'], memoryview(sections['string_offsets']).cast('q')),
+            first_edges=memoryview(sections['first_edges']).cast('q'),
+            labels=bytes(sections['labels']).decode('utf-8'),
+            targets=memoryview(sections['targets']).cast('q'),
+            edge_offsets=memoryview(sections['edge_offsets']).cast('q'),
+            finals=memoryview(sections['finals']),
+            word_ids=memoryview(sections['word_ids']).cast('q'),
+            original_key_ids=memoryview(sections['original_key_ids']).cast('q'),
+            counts=memoryview(sections['counts']).cast('q'),
+        )
+
+    @property
+    def root(self):
+        return _FrozenNode(self, 0, 0)
+
+    def __len__(self):
+        return len(self.finals)
+
+
+class _StringTable:
+    """
+    The utf-8 encoded strings one after another and the offsets of where each one starts.
+    The strings are only decoded when they are accessed.
+    """
+
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+
+class _FrozenChildren:
+    """
+    The children of a frozen node. It behaves like the children dictionary of _DawgNode.
+    """
+
+    __slots__ = ("_dawg", "_number", "_start", "_end")
+
+    def __init__(self, dawg, state, number):
+        self._dawg = dawg
+        self._number = number
+        self._start = dawg.first_edges[state]
+        self._end = dawg.first_edges[state + 1]
+
+    def _find_edge(self, letter):
+        # States have a few edges at most so a search in the C implementation of str.find
+        # is faster than a binary search in Python and it keeps the insertion order of edges.
+        if len(letter) != 1:
+            return NO_ID
+        return self._dawg.labels.find(letter, self._start, self._end)
+
+    def _get_child(self, edge):
+        offset = self._dawg.edge_offsets[edge]
+        number = self._number + offset if offset >= 0 else -offset - 1
+        return _FrozenNode(self._dawg, self._dawg.targets[edge], number)
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __contains__(self, letter):
+        return self._find_edge(letter) != NO_ID
+
+    def __getitem__(self, letter):
+        edge = self._find_edge(letter)
+        if edge == NO_ID:
+            raise KeyError(letter)
+        return self._get_child(edge)
+
+    def get(self, letter, default=None):
+        edge = self._find_edge(letter)
+        if edge == NO_ID:
+            return default
+        return self._get_child(edge)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self._dawg.labels[self._start:self._end]
+
+    def values(self):
+        return [self._get_child(edge) for edge in range(self._start, self._end)]
+
+    def items(self):
+        labels = self._dawg.labels
+        return [(labels[edge], self._get_child(edge)) for edge in range(self._start, self._end)]
+
+
+class _FrozenNode:
+    """
+    A view of one node of the frozen dwg: the state and the number of the path to it.
+    """
+
+    __slots__ = ("_dawg", "_state", "_number", "_children")
+
+    def __init__(self, dawg, state, number):
+        self._dawg = dawg
+        self._state = state
+        self._number = number
+        self._children = None
+
+    def __eq__(self, other):
+        return (isinstance(other, _FrozenNode) and self._state == other._state
+                and self._number == other._number and self._dawg is other._dawg)
+
+    def __hash__(self):
+        return hash((self._state, self._number))
+
+    def __repr__(self):
+        return f'<FrozenDawgNode children={list(self.children.keys())}, {self.word}>'
+
+    @property
+    def children(self):
+        # The search looks at the children of the same node several times in a row.
+        if self._children is None:
+            self._children = _FrozenChildren(self._dawg, self._state, self._number)
+        return self._children
+
+    @property
+    def word(self):
+        if not self._dawg.finals[self._state]:
+            return None
+        word_id = self._dawg.word_ids[self._number]
+        return None if word_id == NO_ID else self._dawg.strings[word_id]
+
+    @property
+    def original_key(self):
+        if not self._dawg.finals[self._state]:
+            return None
+        original_key_id = self._dawg.original_key_ids[self._number]
+        return None if original_key_id == NO_ID else self._dawg.strings[original_key_id]
+
+    @property
+    def count(self):
+        if not self._dawg.finals[self._state]:
+            return 0
+        return self._dawg.counts[self._number]
+
+    @count.setter
+    def count(self, value):
+        # Only the nodes with words have a count. The count of other nodes is not used in the results.
+        if self._dawg.finals[self._state]:
+            self._dawg.counts[self._number] = value
+
+    def insert(self, *args, **kwargs):
+        raise FrozenDawgError('The dwg is frozen. Words can not be inserted into it anymore.')
+
+    def _iter_descendants(self, size, should_traverse=True, full_stop_words=None):
+        """
+        The same breadth first walk as _DawgNode.get_descendants_nodes but on the state and number
+        of the nodes, so no views are created for the nodes that the walk only passes through.
+        Yields the state, number and value of the nodes with unique values.
+        """
+        dawg = self._dawg
+        first_edges, targets, edge_offsets, finals = dawg.first_edges, dawg.targets, dawg.edge_offsets, dawg.finals
+        word_ids, original_key_ids, strings = dawg.word_ids, dawg.original_key_ids, dawg.strings
+        # A node is identified by its state and number which are packed into one integer.
+        states_count = len(finals)
+        state, number = self._state, self._number
+        que = deque()
+        unique_nodes = {number * states_count + state}
+        found_values = set()
+        full_stop_words = full_stop_words if full_stop_words else ()
+        should_add_children = True
+        while True:
+            if should_add_children:
+                for edge in range(first_edges[state], first_edges[state + 1]):
+                    offset = edge_offsets[edge]
+                    child_number = number + offset if offset >= 0 else -offset - 1
+                    child_state = targets[edge]
+                    node_id = child_number * states_count + child_state
+                    if node_id not in unique_nodes:
+                        unique_nodes.add(node_id)
+                        que.append((child_state, child_number))
+            if not que:
+                return
+            state, number = que.popleft()
+            value = None
+            if finals[state]:
+                string_id = original_key_ids[number]
+                if string_id != NO_ID:
+                    value = strings[string_id]
+                if not value:
+                    string_id = word_ids[number]
+                    value = None if string_id == NO_ID else strings[string_id]
+            if value:
+                if value in full_stop_words:
+                    should_traverse = False
+                if value not in found_values:
+                    found_values.add(value)
+                    yield state, number, value
+                    if len(found_values) > size:
+                        return
+            should_add_children = should_traverse
+
+    def get_descendants_nodes(self, size, should_traverse=True, full_stop_words=None, insert_count=True):
+        if insert_count is True:
+            size = INF
+        dawg = self._dawg
+        for state, number, _ in self._iter_descendants(size, should_traverse, full_stop_words):
+            yield _FrozenNode(dawg, state, number)
+
+    def get_descendants_words(self, size, should_traverse=True, full_stop_words=None, insert_count=True):
+        if insert_count is True:
+            counts = self._dawg.counts
+            found_nodes = sorted(
+                self._iter_descendants(INF, should_traverse, full_stop_words),
+                key=lambda found_node: counts[found_node[1]],
+                reverse=True
+            )[:size + 1]
+        else:
+            found_nodes = islice(self._iter_descendants(size, should_traverse, full_stop_words), size)
+        return map(itemgetter(2), found_nodes)
+
+    value = _DawgNode.value
+    __getitem__ = _DawgNode.__getitem__
+    get_best_fuzzy_nodes = _DawgNode.get_best_fuzzy_nodes
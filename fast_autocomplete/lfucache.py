@@ -4,10 +4,15 @@ https://medium.com/@epicshane/a-python-implementation-of-lfu-least-frequently-us
 https://github.com/luxigner/lfu_cache
 Modified by Sep Dehpour
 """
-from threading import Lock
+from threading import Lock, local
+from weakref import WeakSet
+
+from fast_autocomplete.cache import CacheStatsMixin
 
 
 class CacheNode:
+    __slots__ = ('key', 'value', 'freq_node', 'pre', 'nxt')
+
     def __init__(self, key, value, freq_node, pre, nxt):
         self.key = key
         self.value = value
@@ -34,6 +39,8 @@ class CacheNode:
 
 
 class FreqNode:
+    __slots__ = ('freq', 'pre', 'nxt', 'cache_head', 'cache_tail')
+
     def __init__(self, freq, pre, nxt):
         self.freq = freq
         self.pre = pre  # previous FreqNode
@@ -103,13 +110,19 @@ class FreqNode:
         self.pre = freq_node
 
 
-class LFUCache:
+class LFUCache(CacheStatsMixin):
 
-    def __init__(self, capacity):
+    def __init__(self, capacity, on_evict=None):
+        """
+        :param on_evict: (optional) Called with the key of every item that is evicted to make
+                         room for a new one. It is called while the lock is held.
+        """
         self.cache = {}  # {key: cache_node}
         self.capacity = capacity
         self.freq_link_head = None
         self.lock = Lock()
+        self.on_evict = on_evict
+        self._init_stats()
 
     def get(self, key):
         with self.lock:
@@ -120,8 +133,10 @@ class LFUCache:
 
                 self.move_forward(cache_node, freq_node)
 
+                self.hits += 1
                 return value
             else:
+                self.misses += 1
                 return -1
 
     def set(self, key, value):
@@ -141,6 +156,26 @@ class LFUCache:
 
                 self.move_forward(cache_node, freq_node)
 
+    def delete(self, key):
+        """
+        Deletes the key from the cache. Returns True if the key was in the cache.
+        """
+        with self.lock:
+            cache_node = self.cache.pop(key, None)
+            if cache_node is None:
+                return False
+            freq_node = cache_node.freq_node
+            cache_node.free_myself()
+            if freq_node.count_caches() == 0:
+                if self.freq_link_head == freq_node:
+                    self.freq_link_head = freq_node.nxt
+                freq_node.remove()
+            return True
+
+    def keys(self):
+        with self.lock:
+            return list(self.cache.keys())
+
     def move_forward(self, cache_node, freq_node):
         if freq_node.nxt is None or freq_node.nxt.freq != freq_node.freq + 1:
             target_freq_node = FreqNode(freq_node.freq + 1, None, None)
@@ -163,13 +198,18 @@ class LFUCache:
 
     def dump_cache(self):
         head_freq_node = self.freq_link_head
-        self.cache.pop(head_freq_node.cache_head.key)
+        key = head_freq_node.cache_head.key
+        self.cache.pop(key)
         head_freq_node.pop_head_cache()
 
         if head_freq_node.count_caches() == 0:
             self.freq_link_head = head_freq_node.nxt
             head_freq_node.remove()
 
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
+
     def create_cache_node(self, key, value):
         cache_node = CacheNode(key, value, None, None, None)
         self.cache[key] = cache_node
@@ -189,3 +229,209 @@ class LFUCache:
         result = [(i, freq.freq_node.freq) for i, freq in self.cache.items()]
         result.sort(key=lambda x: -x[1])
         return result
+
+
+class _Entry:
+    __slots__ = ('key', 'value', 'freq')
+
+
+class FastLFUCache(CacheStatsMixin):
+    """
+    Evicts the same items as LFUCache: the oldest of the items with the lowest frequency.
+
+    Instead of linked lists of nodes, every frequency has a dict of the entries that have it,
+    in the order they got it. A hit moves the entry from one dict to the next and never creates
+    any objects: the entries of the evicted items and the dicts of the frequencies that no entry
+    has anymore are reused.
+    """
+
+    def __init__(self, capacity, on_evict=None):
+        self.cache = {}  # {key: entry}
+        self.capacity = capacity
+        self.lock = Lock()
+        self.on_evict = on_evict
+        self._buckets = {}  # {freq: {key: entry}}
+        self._min_freq = 0
+        self._free_entries = []
+        self._free_buckets = []
+        self._init_stats()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return -1
+            self.hits += 1
+            self._move_forward(entry)
+            return entry.value
+
+    def set(self, key, value):
+        with self.lock:
+            if self.capacity <= 0:
+                return -1
+            entry = self.cache.get(key)
+            if entry is not None:
+                entry.value = value
+                self._move_forward(entry)
+                return
+            if len(self.cache) >= self.capacity:
+                self.dump_cache()
+            entry = self._free_entries.pop() if self._free_entries else _Entry()
+            entry.key = key
+            entry.value = value
+            entry.freq = 0
+            self.cache[key] = entry
+            self._get_bucket(0)[key] = entry
+            self._min_freq = 0
+
+    def _get_bucket(self, freq):
+        bucket = self._buckets.get(freq)
+        if bucket is None:
+            bucket = self._buckets[freq] = self._free_buckets.pop() if self._free_buckets else {}
+        return bucket
+
+    def _remove_from_bucket(self, entry):
+        bucket = self._buckets[entry.freq]
+        del bucket[entry.key]
+        if not bucket:
+            del self._buckets[entry.freq]
+            self._free_buckets.append(bucket)
+
+    def _move_forward(self, entry):
+        # This runs on every hit, so it is inlined instead of calling the other methods.
+        key = entry.key
+        freq = entry.freq
+        buckets = self._buckets
+        bucket = buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del buckets[freq]
+            self._free_buckets.append(bucket)
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        freq += 1
+        entry.freq = freq
+        bucket = buckets.get(freq)
+        if bucket is None:
+            bucket = buckets[freq] = self._free_buckets.pop() if self._free_buckets else {}
+        bucket[key] = entry
+
+    def delete(self, key):
+        """
+        Deletes the key from the cache. Returns True if the key was in the cache.
+        """
+        with self.lock:
+            entry = self.cache.pop(key, None)
+            if entry is None:
+                return False
+            self._remove_from_bucket(entry)
+            entry.value = None
+            self._free_entries.append(entry)
+            return True
+
+    def keys(self):
+        with self.lock:
+            return list(self.cache.keys())
+
+    def dump_cache(self):
+        bucket = self._buckets.get(self._min_freq)
+        # Deleting keys can leave the min frequency behind.
+        if bucket is None:
+            self._min_freq = min(self._buckets)
+            bucket = self._buckets[self._min_freq]
+        key = next(iter(bucket))
+        entry = self.cache.pop(key)
+        self._remove_from_bucket(entry)
+        entry.value = None
+        self._free_entries.append(entry)
+
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def get_sorted_cache_keys(self):
+        result = [(key, entry.freq) for key, entry in self.cache.items()]
+        result.sort(key=lambda x: -x[1])
+        return result
+
+
+class ThreadLocalLFUCache:
+    """
+    One LFU cache per thread. Even a cache hit changes the frequency lists of an LFU cache,
+    so it takes the lock. With one cache per thread, the threads never wait for each other.
+    Each thread caches up to capacity items. The cache of a thread goes away with the thread.
+    """
+
+    def __init__(self, capacity, on_evict=None, cache_class=FastLFUCache):
+        """
+        :param on_evict: (optional) Called with the key of an evicted item once no thread has it anymore.
+        :param cache_class: (optional) The class of the cache of each thread. LFUCache or any class
+                            from fast_autocomplete.cache can be used instead of FastLFUCache.
+        """
+        self.capacity = capacity
+        self._local = local()
+        self.lock = Lock()
+        self.caches = WeakSet()
+        self.on_evict = on_evict
+        self.cache_class = cache_class
+
+    def _get_cache(self):
+        cache = getattr(self._local, 'cache', None)
+        if cache is None:
+            cache = self._local.cache = self.cache_class(self.capacity, on_evict=self._on_evict if self.on_evict else None)
+            with self.lock:
+                self.caches.add(cache)
+        return cache
+
+    def _on_evict(self, key):
+        with self.lock:
+            caches = list(self.caches)
+        if not any(key in cache.cache for cache in caches):
+            self.on_evict(key)
+
+    def get(self, key):
+        return self._get_cache().get(key)
+
+    def set(self, key, value):
+        return self._get_cache().set(key, value)
+
+    def delete(self, key):
+        """
+        Deletes the key from the caches of all the threads.
+        """
+        with self.lock:
+            caches = list(self.caches)
+        is_deleted = False
+        for cache in caches:
+            is_deleted = cache.delete(key) or is_deleted
+        return is_deleted
+
+    def keys(self):
+        """
+        Gets the keys of the caches of all the threads.
+        """
+        with self.lock:
+            caches = list(self.caches)
+        keys = {}
+        for cache in caches:
+            keys.update(dict.fromkeys(cache.keys()))
+        return list(keys)
+
+    def get_sorted_cache_keys(self):
+        """
+        Gets the keys of the cache of the current thread.
+        """
+        return self._get_cache().get_sorted_cache_keys()
+
+    def get_stats(self):
+        """
+        Gets the sum of the stats of the caches of all the threads.
+        """
+        with self.lock:
+            caches = list(self.caches)
+        stats = {}
+        for cache in caches:
+            for name, value in cache.get_stats().items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
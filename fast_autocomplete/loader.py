@@ -1,7 +1,17 @@
+import io
 import os
+import csv
 import gzip
+import hashlib
+import hmac
 import json
 import logging
+import uuid
+from array import array
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy as shallow_copy
 try:
     from redis import StrictRedis
 except ImportError:
@@ -9,6 +19,21 @@ except ImportError:
 
 from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
 from fast_autocomplete import AutoComplete
+from fast_autocomplete.builder import build_autocomplete
+from fast_autocomplete.misc import _check_file_exists, read_csv_gen
+from fast_autocomplete.storage import FORMAT_VERSION, dumps_index, loads_index
+
+# The key of the prebuilt index in Redis is the Redis key prefix formatted with this name.
+REDIS_INDEX_NAME = 'autocomplete.index'
+# The version of how the prebuilt index is stored in Redis. The index itself has its own format version.
+REDIS_INDEX_VERSION = 2
+# Redis values can be at most 512MB, so a bigger index is stored in several keys.
+REDIS_CHUNK_SIZE = 64 * 1024 * 1024
+# A gzipped file from Redis of at least this many bytes is decompressed and parsed on its own thread
+# while the other files are parsed, since zlib releases the GIL while it decompresses.
+THREADED_GZIPPED_CONTENT_SIZE = 4 * 1024 * 1024
+# The types whose equal values are always the same, so the WordStore only stores one copy of them.
+_INTERNED_TYPES = (int, bool, type(None))
 
 
 def read_local_dump(filepath: str):
@@ -16,15 +41,6 @@ def read_local_dump(filepath: str):
         return the_file.read()
 
 
-def _simple_compress(item: str, hash_to_val: Dict[int, str]) -> str:
-    item_hash = hash(item)
-    if item_hash in hash_to_val:
-        item = hash_to_val[item_hash]
-    else:
-        hash_to_val[item_hash] = item
-    return item
-
-
 class WordValue(NamedTuple):
     context: Any
     display: Any
@@ -38,76 +54,433 @@ class WordValue(NamedTuple):
         return result
 
 
+class WordStore(MutableMapping):
+    """
+    The words dictionary of get_data with compress, stored by columns instead of as one
+    WordValue and one context dictionary per word.
+
+    Every word gets an integer id. The display, the count and the context of the word are kept
+    in lists and arrays by that id. The keys of a context are its schema, which is stored once
+    and shared by all the contexts with the same keys. The values of the contexts of one schema
+    are kept in one flat list, so a context only takes a pointer per value. Equal strings, ints,
+    bools and displays are only stored once. They are compared by their exact type and equality,
+    so different values never get merged. Floats and containers are stored as they are, since
+    equal ones can still differ, for example -0.0 and 0.0 or (True, 2) and (1, 2).
+
+    Reading a word makes its WordValue on the fly, so words[word].display, words[word].get('count')
+    and the rest work the same as with a dictionary of WordValues. The context of the WordValue
+    is a new dictionary every time, so changing it does not change the store. Values that are
+    not WordValues or that can not be stored by columns, for example with a count that is not
+    an int, are kept as they are.
+    """
+
+    def __init__(self, items=()):
+        # word to its id
+        self._ids = {}
+        self._displays = []
+        self._counts = array('q')
+        # The schema of the context of every word, -1 for a None context.
+        self._schema_ids = array('i')
+        # The index of the first value of the context of every word in the values of its schema.
+        self._value_indexes = array('q')
+        # ((key, type of the value), ...) of every schema
+        self._schemas = []
+        self._schema_index = {}
+        # the keys of every schema without the types
+        self._schema_keys = []
+        # the flat list of the values of the contexts of every schema
+        self._schema_values = []
+        # The one copy of every string and of every int, bool and None by (type, value) that is stored.
+        # sys.intern is not used since the interned strings are never freed on newer Pythons.
+        self._strings = {}
+        self._interned = {}
+        # id to the original key of the words that have one
+        self._original_keys = {}
+        # id to the value of the words that are not stored by columns
+        self._other_values = {}
+        self.update(items)
+
+    def _intern(self, value):
+        if type(value) is str:
+            return self._strings.setdefault(value, value)
+        if type(value) in _INTERNED_TYPES:
+            return self._interned.setdefault((type(value), value), value)
+        return value
+
+    def _get_schema_id(self, context):
+        if context is None:
+            return -1
+        if type(context) is not dict:
+            raise TypeError('Only dictionary contexts are stored by columns.')
+        # The types are part of the schema so that for example 1 and True are not merged.
+        schema = tuple((key, type(value)) for key, value in context.items())
+        schema_id = self._schema_index.get(schema)
+        if schema_id is None:
+            schema_id = self._schema_index[schema] = len(self._schemas)
+            self._schemas.append(schema)
+            self._schema_keys.append(tuple(context))
+            self._schema_values.append([])
+        return schema_id
+
+    def _set_columns(self, word_id, value):
+        if type(value.count) is not int or not -2 ** 63 <= value.count < 2 ** 63:
+            return False
+        try:
+            schema_id = self._get_schema_id(value.context)
+            display = self._intern(value.display)
+            context_values = [] if schema_id < 0 else [self._intern(item) for item in value.context.values()]
+        except TypeError:
+            return False
+        self._displays[word_id] = display
+        self._counts[word_id] = value.count
+        self._schema_ids[word_id] = schema_id
+        if schema_id >= 0:
+            # The values of the words that are changed or deleted are not reused.
+            schema_values = self._schema_values[schema_id]
+            self._value_indexes[word_id] = len(schema_values)
+            schema_values.extend(context_values)
+        if value.original_key is not None:
+            self._original_keys[word_id] = value.original_key
+        return True
+
+    def __setitem__(self, word, value):
+        word_id = self._ids.get(word)
+        if word_id is None:
+            # The ids of the words that are deleted are not reused.
+            word_id = self._ids[word] = len(self._displays)
+            self._displays.append(None)
+            self._counts.append(0)
+            self._schema_ids.append(-1)
+            self._value_indexes.append(0)
+        else:
+            self._original_keys.pop(word_id, None)
+            self._other_values.pop(word_id, None)
+        if not isinstance(value, WordValue) or not self._set_columns(word_id, value):
+            self._other_values[word_id] = value
+
+    def __getitem__(self, word):
+        word_id = self._ids[word]
+        if self._other_values and word_id in self._other_values:
+            return self._other_values[word_id]
+        schema_id = self._schema_ids[word_id]
+        if schema_id < 0:
+            context = None
+        else:
+            keys = self._schema_keys[schema_id]
+            index = self._value_indexes[word_id]
+            context = dict(zip(keys, self._schema_values[schema_id][index:index + len(keys)]))
+        return WordValue(context, self._displays[word_id], self._counts[word_id], self._original_keys.get(word_id))
+
+    def __delitem__(self, word):
+        word_id = self._ids.pop(word)
+        self._original_keys.pop(word_id, None)
+        self._other_values.pop(word_id, None)
+
+    def __contains__(self, word):
+        return word in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f'<WordStore of {len(self)} words>'
+
+    def copy(self):
+        new = WordStore.__new__(WordStore)
+        for name, value in self.__dict__.items():
+            setattr(new, name, shallow_copy(value))
+        new._schema_values = [values.copy() for values in self._schema_values]
+        return new
+
+
 def get_all_content(content_files, redis_client=None, redis_key_prefix=None, logger=None):
     """
     Get all content that is needed to initialize Autocomplete.
 
+    The files are fetched from Redis with one MGET and then decompressed and parsed on
+    a thread per file at the same time.
+
     :param: redis_client (optional) If passed, it tries to load from Redis if there is already cached data
     """
-    kwargs = {}
-    for key, info in content_files.items():
-        kwargs[key] = get_data(
-            filepath=info['filepath'],
-            compress=info['compress'],
-            redis_client=redis_client,
-            redis_key_prefix=redis_key_prefix,
-            logger=logger
-        )
+    gzipped_contents = _get_many_from_redis(
+        [info['filepath'] for info in content_files.values()], redis_client, redis_key_prefix, logger)
+    kwargs = _parse_all_content(content_files, dict(zip(content_files, gzipped_contents)), logger)
     if logger:
         kwargs['logger'] = logger
     return kwargs
 
 
+def _parse_all_content(content_files, gzipped_contents, logger):
+    def _get_data(key):
+        info = content_files[key]
+        # An empty value is used for a missing one so that get_data does not fetch it from Redis again.
+        return get_data(filepath=info['filepath'], compress=info['compress'], logger=logger, gzipped_content=gzipped_contents.get(key) or b'')
+
+    # json.loads holds the GIL, so more threads do not parse the files any faster.
+    threaded_keys = [key for key in content_files if len(gzipped_contents.get(key) or b'') >= THREADED_GZIPPED_CONTENT_SIZE]
+    if len(content_files) < 2 or not threaded_keys:
+        return {key: _get_data(key) for key in content_files}
+    with ThreadPoolExecutor(max_workers=len(threaded_keys)) as executor:
+        futures = {key: executor.submit(_get_data, key) for key in threaded_keys}
+        data = {key: _get_data(key) for key in content_files if key not in futures}
+        data.update((key, future.result()) for key, future in futures.items())
+    return {key: data[key] for key in content_files}
+
+
+class ContentFileError(ValueError):
+    pass
+
+
+class RedisIndexError(ValueError):
+    pass
+
+
+# The formats of the words files that are read one line at a time. Either can also be gzipped.
+STREAMING_FORMATS = ('.jsonl', '.csv')
+
+
+def _get_format(filepath):
+    if filepath.endswith('.gz'):
+        filepath = filepath[:-3]
+    return os.path.splitext(filepath)[1].lower()
+
+
+def is_streaming_file(filepath: str) -> bool:
+    return _get_format(filepath) in STREAMING_FORMATS
+
+
+def _get_many_from_redis(filepaths, redis_client, redis_key_prefix, logger):
+    """
+    Returns the gzipped content of every file from Redis, or None for each file that is not
+    there, in one round trip.
+    """
+    if not (redis_client and redis_key_prefix and filepaths):
+        return [None] * len(filepaths)
+    keys = [redis_key_prefix.format(os.path.basename(filepath)) for filepath in filepaths]
+    try:
+        return redis_client.mget(keys)
+    except Exception:
+        if logger:
+            logger.exception('Unable to get the search graph words from Redis.')
+        else:
+            print('Unable to get the search graph words from Redis.')
+    return [None] * len(filepaths)
+
+
+@contextmanager
+def _open_text(filepath, gzipped_content=None):
+    if gzipped_content:
+        file_obj = io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(gzipped_content)), encoding='utf-8-sig')
+    elif filepath.endswith('.gz'):
+        file_obj = gzip.open(filepath, 'rt', encoding='utf-8-sig')
+    else:
+        file_obj = open(filepath, 'r', encoding='utf-8-sig')
+    with file_obj:
+        yield file_obj
+
+
+def _get_value(context, display, count, compress):
+    if compress:
+        return WordValue(context=context, display=display, count=count)
+    return [context, display, count]
+
+
+def read_words_gen(filepath: str, compress: bool = False, gzipped_content: Optional[bytes] = None):
+    """
+    Yields the (word, value) pairs of a JSON lines or CSV words file one line at a time,
+    so the whole file is never in memory. The file can be gzipped.
+
+    - JSON lines: every line is a JSON object of words to [context, display, count],
+      the same as in the JSON words files.
+    - CSV: the header has the word, display and count columns. The rest of the columns
+      are the context.
+
+    :param compress: Yield WordValues instead of [context, display, count] lists.
+    :param gzipped_content: (optional) The gzipped content of the file, for example from Redis,
+                            to read instead of the file.
+    """
+    if not gzipped_content:
+        _check_file_exists(filepath)
+    file_format = _get_format(filepath)
+    with _open_text(filepath, gzipped_content) as file_obj:
+        if file_format == '.csv':
+            for row in read_csv_gen(file_obj, csv_func=csv.DictReader):
+                try:
+                    word = row.pop('word')
+                except KeyError:
+                    raise ContentFileError(f'{filepath} does not have a word column.') from None
+                display = row.pop('display', None)
+                count = row.pop('count', None)
+                yield word, _get_value(row, display, int(count) if count else 0, compress)
+        elif file_format == '.jsonl':
+            for line in file_obj:
+                if line.strip():
+                    for word, (context, display, count) in json.loads(line).items():
+                        yield word, _get_value(context, display, count, compress)
+        else:
+            raise ContentFileError(f'{filepath} is not a {" or ".join(STREAMING_FORMATS)} file.')
+
+
 def get_data(filepath: str, compress: bool = False,
              redis_client: Optional[StrictRedis] = None,
              redis_key_prefix: Optional[str] = None,
-             logger: Optional[logging.RootLogger] = None) -> Dict[str, List[str]]:
-    data_json = None
-    filename = os.path.basename(filepath)
-    if redis_client and redis_key_prefix:
-        key = redis_key_prefix.format(filename)
-        try:
-            data_json = redis_client.get(key)
-        except Exception:
-            if logger:
-                logger.exception('Unable to get the search graph words from Redis.')
-            else:
-                print('Unable to get the search graph words from Redis.')
-        if data_json:
-            data_json = gzip.decompress(data_json).decode('utf-8')
-    if not data_json:
+             logger: Optional[logging.RootLogger] = None,
+             gzipped_content: Optional[bytes] = None) -> Dict[str, List[str]]:
+    """
+    :param: gzipped_content (optional) The gzipped content of the file that was already fetched from Redis.
+                            Then Redis is not used. Pass b'' if the file was not in Redis.
+    """
+    if gzipped_content is None:
+        gzipped_content = _get_many_from_redis([filepath], redis_client, redis_key_prefix, logger)[0]
+    if is_streaming_file(filepath):
+        data = WordStore() if compress else {}
+        data.update(read_words_gen(filepath, compress=compress, gzipped_content=gzipped_content))
+        return data
+
+    if gzipped_content:
+        # json.loads takes the bytes, so they are not decoded into another copy first.
+        data_json = gzip.decompress(gzipped_content)
+        del gzipped_content
+    else:
         data_json = read_local_dump(filepath)
     data = json.loads(data_json)
+    del data_json
 
     if compress:
-        hash_to_val = {}
-
-        for word, value in data.items():
-            context, display, count = value
-            display = _simple_compress(item=display, hash_to_val=hash_to_val)
-            for key, val in context.items():
-                context[key] = _simple_compress(
-                    item=context[key], hash_to_val=hash_to_val
-                )
-            data[word] = WordValue(context=context, display=display, count=count)
+        words = WordStore()
+        for word, (context, display, count) in data.items():
+            words[word] = WordValue(context=context, display=display, count=count)
+        data = words
 
     return data
 
 
-def populate_redis(content_files, redis_client, redis_cache_prefix):
+def populate_redis(
+    content_files, redis_client, redis_cache_prefix, module=None, minimize=False, chunk_size=REDIS_CHUNK_SIZE, hmac_key=None
+):
     """
     Populate Redis with data based on the local files
+
+    :param: module: (optional) If passed, an Autocomplete object of this module is also built from
+                    the local files and its prebuilt index is stored in Redis. See populate_redis_index.
+    :param: hmac_key: The secret key that the prebuilt index is signed with. It is needed with a module.
     """
+    if module is not None and not hmac_key:
+        raise RedisIndexError('The prebuilt index can only be stored in Redis with an hmac_key to sign it.')
     for key, info in content_files.items():
         filename = os.path.basename(info['filepath'])
         redis_key = redis_cache_prefix.format(filename)
-        data = read_local_dump(info['filepath'])
-        compressed = gzip.compress(data.encode('utf-8'))
+        with open(info['filepath'], 'rb') as the_file:
+            data = the_file.read()
+        # The gzipped files are stored as they are.
+        compressed = data if info['filepath'].endswith('.gz') else gzip.compress(data)
         redis_client.set(redis_key, compressed)
+    if module is not None:
+        autocomplete = autocomplete_factory(content_files, module=module)
+        populate_redis_index(autocomplete, redis_client, redis_cache_prefix, hmac_key, minimize=minimize, chunk_size=chunk_size)
+
+
+def _sign_index(index, hmac_key):
+    if isinstance(hmac_key, str):
+        hmac_key = hmac_key.encode('utf-8')
+    return hmac.new(hmac_key, index, hashlib.sha256).hexdigest()
+
+
+def _get_redis_index_manifest(redis_client, key):
+    manifest = redis_client.get(key)
+    return json.loads(manifest) if manifest else None
+
+
+def populate_redis_index(autocomplete, redis_client, redis_cache_prefix, hmac_key, minimize=False, chunk_size=REDIS_CHUNK_SIZE):
+    """
+    Stores the prebuilt index of the autocomplete object in Redis, so autocomplete_factory can
+    load it instead of parsing the files and populating the dwg again.
+
+    The words of the index are pickled, so loading an index can run any code that was put into it.
+    The index is signed with HMAC-SHA256 and the hmac_key, and load_redis_index only loads it if
+    the signature matches. Keep the hmac_key secret from anyone who can write to Redis.
+
+    The index is split into chunks of chunk_size bytes. Every chunk is stored under its own key
+    and the key of the index only has a small JSON manifest: the versions, the length, the
+    signature and the keys of the chunks. The chunks of every new index get new keys and the manifest
+    is written last, so the loaders never mix the chunks of 2 indexes. The chunks of the previous
+    index are deleted after that.
+    """
+    index = dumps_index(autocomplete, minimize=minimize)
+    key = redis_cache_prefix.format(REDIS_INDEX_NAME)
+    chunks_key = f'{key}:{uuid.uuid4().hex}'
+    chunks = max(1, -(-len(index) // chunk_size))
+    for i in range(chunks):
+        redis_client.set(f'{chunks_key}:{i}', index[i * chunk_size:(i + 1) * chunk_size])
+    try:
+        old_manifest = _get_redis_index_manifest(redis_client, key)
+    except ValueError:
+        old_manifest = None
+    manifest = {
+        'version': REDIS_INDEX_VERSION,
+        'format_version': FORMAT_VERSION,
+        'length': len(index),
+        'hmac': _sign_index(index, hmac_key),
+        'chunks_key': chunks_key,
+        'chunks': chunks,
+    }
+    redis_client.set(key, json.dumps(manifest).encode('utf-8'))
+    if old_manifest and 'chunks_key' in old_manifest:
+        for i in range(old_manifest.get('chunks', 0)):
+            redis_client.delete(f"{old_manifest['chunks_key']}:{i}")
+
+
+def load_redis_index(redis_client, redis_key_prefix, hmac_key, module=AutoComplete, logger=None):
+    """
+    Creates an Autocomplete object of the module from the prebuilt index that populate_redis_index
+    stored in Redis. Just like with load_index, its dwg is frozen.
+
+    Returns None if there is no index in Redis, if it was stored with other versions, if it is not
+    signed with the hmac_key or if it can not be read. The reason is logged. Nothing of the index
+    is unpickled before its signature is verified.
+    """
+    key = redis_key_prefix.format(REDIS_INDEX_NAME)
+    try:
+        manifest = _get_redis_index_manifest(redis_client, key)
+        if not manifest:
+            return None
+        if manifest.get('version') != REDIS_INDEX_VERSION or manifest.get('format_version') != FORMAT_VERSION:
+            message = (f"The prebuilt index in Redis has the version {manifest.get('version')} and the format version "
+                       f"{manifest.get('format_version')} but the version {REDIS_INDEX_VERSION} and the format version "
+                       f"{FORMAT_VERSION} are expected. Loading the content files instead.")
+            if logger:
+                logger.warning(message)
+            else:
+                print(message)
+            return None
+        # A writable buffer, so the counts of the words can be updated.
+        index = bytearray(manifest['length'])
+        offset = 0
+        for i in range(manifest['chunks']):
+            chunk = redis_client.get(f"{manifest['chunks_key']}:{i}")
+            if chunk is None or offset + len(chunk) > len(index):
+                raise RedisIndexError(f'The chunk {i} of the prebuilt index in Redis is missing or too long.')
+            index[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+            del chunk
+        signature = manifest.get('hmac')
+        if not isinstance(signature, str) or offset != len(index) or not hmac.compare_digest(_sign_index(index, hmac_key), signature):
+            raise RedisIndexError('The signature of the prebuilt index in Redis does not match.')
+        # The signature of the whole index is already verified.
+        return loads_index(index, module=module, logger=logger, verify=False)
+    except Exception:
+        if logger:
+            logger.exception('Unable to load the prebuilt index from Redis.')
+        else:
+            print('Unable to load the prebuilt index from Redis.')
+    return None
 
 
 def autocomplete_factory(
-    content_files, redis_client=None, module=AutoComplete, logger=None
+    content_files, redis_client=None, module=AutoComplete, logger=None, redis_key_prefix=None, hmac_key=None
 ):
     """
     Factory function to initialize the proper Vehicle Autocomplete object
@@ -134,6 +507,29 @@ def autocomplete_factory(
     :param: redis_client: (optional) If passed, the factor function tries to load the data from Redis
                                      and if that fails, it will load the local data.
     :param: module: (optional) The AutoComplete module to initialize
+    :param: redis_key_prefix: (optional) The prefix of the Redis keys that populate_redis used,
+                              for example 'autocomplete:{}'. The data is only loaded from Redis if it is passed.
+    :param: hmac_key: (optional) The secret key that populate_redis_index signed the prebuilt index with.
+                      Only if it is passed and there is a prebuilt index in Redis with a matching
+                      signature, the Autocomplete object is loaded from it, with a frozen dwg.
+                      Otherwise the content files are loaded.
+
+    If the words file is a JSON lines or CSV file, optionally gzipped, its words are inserted
+    into the dwg one line at a time while the file is read. See read_words_gen for the formats.
     """
-    kwargs = get_all_content(content_files, redis_client=redis_client, logger=logger)
+    if redis_client and redis_key_prefix and hmac_key:
+        autocomplete = load_redis_index(redis_client, redis_key_prefix, hmac_key, module=module, logger=logger)
+        if autocomplete is not None:
+            return autocomplete
+    words_info = content_files.get('words')
+    if words_info and is_streaming_file(words_info['filepath']):
+        gzipped_contents = dict(zip(content_files, _get_many_from_redis(
+            [info['filepath'] for info in content_files.values()], redis_client, redis_key_prefix, logger)))
+        # The words can not be inserted before the synonyms are loaded, since the synonyms
+        # are inserted together with their words. The synonyms and stop words are small though.
+        other_content_files = {key: info for key, info in content_files.items() if key != 'words'}
+        kwargs = _parse_all_content(other_content_files, gzipped_contents, logger)
+        rows = read_words_gen(words_info['filepath'], compress=words_info['compress'], gzipped_content=gzipped_contents['words'])
+        return build_autocomplete(rows, module=module, words=WordStore() if words_info['compress'] else {}, logger=logger, **kwargs)
+    kwargs = get_all_content(content_files, redis_client=redis_client, redis_key_prefix=redis_key_prefix, logger=logger)
     return module(**kwargs)
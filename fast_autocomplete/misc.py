@@ -20,7 +20,7 @@ def _check_file_exists(path):
 
 def read_csv_gen(path_or_stringio, csv_func=csv.reader, **kwargs):
     """
-    Takes a path_or_stringio to a file or a StringIO object and creates a CSV generator
+    Takes a path_or_stringio to a file or a StringIO or any other text file object and creates a CSV generator
     """
     if isinstance(path_or_stringio, (str, bytes)):
         _check_file_exists(path_or_stringio)
@@ -28,11 +28,11 @@ def read_csv_gen(path_or_stringio, csv_func=csv.reader, **kwargs):
         with open(path_or_stringio, 'r', encoding=encoding) as csvfile:
             for i in csv_func(csvfile, **kwargs):
                 yield i
-    elif isinstance(path_or_stringio, io.StringIO):
+    elif isinstance(path_or_stringio, io.TextIOBase):
         for i in csv_func(path_or_stringio, **kwargs):
             yield i
     else:
-        raise TypeError('Either a path to the file or StringIO object needs to be passed.')
+        raise TypeError('Either a path to the file or a StringIO or text file object needs to be passed.')
 
 
 def _extend_and_repeat(list1, list2):
@@ -0,0 +1,78 @@
+from array import array
+from collections import Counter, defaultdict
+
+
+class NgramIndex:
+    """
+    Groups the words by their length and by their character n-grams so the fuzzy step
+    only needs to calculate the edit distance for a handful of candidate words.
+
+    Every edit operation can destroy at most n of the n-grams of a word. So if 2 words are
+    within max_distance edits of each other, they share at least
+    max(grams of word1, grams of word2) - max_distance * n distinct n-grams.
+    Any word that shares fewer n-grams than that or has a length that is too different
+    can not be a match and is skipped.
+    """
+
+    def __init__(self, words, n=2):
+        self.n = n
+        self.words = []
+        self._ids = {}
+        self._gram_counts = array('l')
+        self._ids_by_length = defaultdict(lambda: array('l'))
+        self._ids_by_length_and_gram = defaultdict(lambda: array('l'))
+        for word in words:
+            self.add(word)
+
+    def get_grams(self, word):
+        return {word[i:i + self.n] for i in range(len(word) - self.n + 1)}
+
+    def add(self, word):
+        word_id = len(self.words)
+        grams = self.get_grams(word)
+        length = len(word)
+        self.words.append(word)
+        self._ids[word] = word_id
+        self._gram_counts.append(len(grams))
+        self._ids_by_length[length].append(word_id)
+        for gram in grams:
+            self._ids_by_length_and_gram[(length, gram)].append(word_id)
+
+    def remove(self, word):
+        """
+        Removes the word. Its id is not reused, so the ids stay in the order that the words were added.
+        """
+        word_id = self._ids.pop(word, None)
+        if word_id is not None:
+            self.words[word_id] = None
+
+    def get_candidates(self, word, max_distance):
+        """
+        Returns the words that might be within max_distance edits of the word.
+        The words are returned in the same order that they were added to the index.
+        """
+        grams = self.get_grams(word)
+        query_gram_count = len(grams)
+        max_lost_grams = max_distance * self.n
+        gram_counts = self._gram_counts
+        length = len(word)
+        candidate_ids = []
+        for candidate_length in range(max(length - max_distance, 0), length + max_distance + 1):
+            if candidate_length not in self._ids_by_length:
+                continue
+            common_grams = Counter()
+            for gram in grams:
+                ids = self._ids_by_length_and_gram.get((candidate_length, gram))
+                if ids:
+                    common_grams.update(ids)
+            # Words that share no n-grams with the query can still be a match when both are short.
+            if query_gram_count <= max_lost_grams and candidate_length - self.n + 1 <= max_lost_grams:
+                ids = self._ids_by_length[candidate_length]
+            else:
+                ids = common_grams.keys()
+            for word_id in ids:
+                if common_grams[word_id] >= max(query_gram_count, gram_counts[word_id]) - max_lost_grams:
+                    candidate_ids.append(word_id)
+        candidate_ids.sort()
+        words = self.words
+        return [words[i] for i in candidate_ids if words[i] is not None]
@@ -1,11 +1,49 @@
+import re
 import string
-from fast_autocomplete.lfucache import LFUCache
+from fast_autocomplete.lfucache import FastLFUCache, ThreadLocalLFUCache
 
 
 NORMALIZED_CACHE_SIZE = 2048
 MAX_WORD_LENGTH = 40
+# The ASCII names up to this length are normalized without the cache.
+# Normalizing them again is faster than taking the lock of the cache.
+UNCACHED_ASCII_LENGTH = 5
 
-_normalized_lfu_cache = LFUCache(NORMALIZED_CACHE_SIZE)
+try:
+    _is_ascii = str.isascii
+except AttributeError:  # Python 3.6
+    def _is_ascii(name):
+        return all(ord(char) < 128 for char in name)
+
+
+_REPEATED_SPACES = re.compile(' {2,}')
+
+
+class _TranslateTable(dict):
+    """
+    The str.translate table of the valid characters of node names. It keeps the valid characters,
+    maps '-' to a space and drops everything else. It is filled in as the characters are seen,
+    so it works for any unicode character without listing them all up front.
+    """
+
+    def __init__(self, valid_chars):
+        super().__init__()
+        self.valid_chars = valid_chars
+
+    def __missing__(self, code):
+        char = chr(code)
+        if char not in self.valid_chars:
+            result = None
+        elif char == '-':
+            result = ' '
+        else:
+            result = char
+        self[code] = result
+        return result
+
+
+def _get_chars_class(chars):
+    return '[' + ''.join(re.escape(char) for char in sorted(chars)) + ']'
 
 
 class Normalizer:
@@ -14,8 +52,15 @@ class Normalizer:
         self,
         valid_chars_for_string=None,
         valid_chars_for_integer=None,
-        valid_chars_for_node_name=None
+        valid_chars_for_node_name=None,
+        cache_size=NORMALIZED_CACHE_SIZE,
+        thread_local_cache=False,
     ):
+        """
+        :param cache_size: The number of normalized names that are cached. Every normalizer has its own cache.
+        :param thread_local_cache: (Boolean, default: False) Give every thread its own cache of cache_size
+                                   names, so the threads never wait for each other's lock of the cache.
+        """
         if valid_chars_for_string:
             self.valid_chars_for_string = frozenset(valid_chars_for_string)
         else:
@@ -28,6 +73,26 @@ class Normalizer:
             self.valid_chars_for_node_name = valid_chars_for_node_name
         else:
             self.valid_chars_for_node_name = self._get_valid_chars_for_node_name()
+        self._cache = ThreadLocalLFUCache(cache_size) if thread_local_cache else FastLFUCache(cache_size)
+        self._init_translation()
+
+    def _init_translation(self):
+        """
+        Prepares the str.translate table and the regex that adds the spaces between letters and digits.
+        If a space or '-' is a letter or a digit, the spaces can not be handled separately from the
+        letters and digits, so the names are normalized one character at a time instead.
+        """
+        letters_and_digits = self.valid_chars_for_string | self.valid_chars_for_integer
+        if ' ' in letters_and_digits or '-' in letters_and_digits:
+            self._translate_table = self._letter_digit_boundary = None
+            return
+        self._translate_table = _TranslateTable(self.valid_chars_for_node_name)
+        if self.valid_chars_for_string and self.valid_chars_for_integer:
+            letters = _get_chars_class(self.valid_chars_for_string)
+            digits = _get_chars_class(self.valid_chars_for_integer)
+            self._letter_digit_boundary = re.compile(f'(?<={letters})(?={digits})|(?<={digits})(?={letters})')
+        else:
+            self._letter_digit_boundary = None
 
     def _get_valid_chars_for_node_name(self):
         return {' ', '-', ':', '_'} | self.valid_chars_for_string | self.valid_chars_for_integer
@@ -36,13 +101,30 @@ class Normalizer:
         if name is None:
             return ''
         name = name[:MAX_WORD_LENGTH]
+        if len(name) <= UNCACHED_ASCII_LENGTH and _is_ascii(name):
+            return self._get_normalized_node_name(name, extra_chars=extra_chars)
         key = name if extra_chars is None else f"{name}{extra_chars}"
-        result = _normalized_lfu_cache.get(key)
+        result = self._cache.get(key)
         if result == -1:
             result = self._get_normalized_node_name(name, extra_chars=extra_chars)
-            _normalized_lfu_cache.set(key, result)
+            self._cache.set(key, result)
         return result
 
+    def normalize_many(self, names):
+        """
+        Normalizes many names at once, for example all the words when populating the dwg.
+        The names do not go through the cache, since most of them are only normalized once.
+        """
+        get_normalized_node_name = self._get_normalized_node_name
+        return [get_normalized_node_name(name[:MAX_WORD_LENGTH]) if name is not None else '' for name in names]
+
+    def get_cache_stats(self):
+        """
+        Returns the hits, the misses and the evictions of the cache of the normalized names.
+        The short ASCII names that skip the cache are not counted.
+        """
+        return self._cache.get_stats()
+
     def _remove_invalid_chars(self, x):
         result = x in self.valid_chars_for_node_name
         if x == '-' == self.prev_x:
@@ -62,6 +144,17 @@ class Normalizer:
         return ''.join(filter(self._remove_invalid_chars, name)).strip()
 
     def _get_normalized_node_name(self, name, extra_chars=None):
+        if extra_chars or self._translate_table is None:
+            return self._get_normalized_node_name_per_char(name, extra_chars=extra_chars)
+        name = name.lower().translate(self._translate_table)
+        if '  ' in name:
+            name = _REPEATED_SPACES.sub(' ', name)
+        # The regex is much slower than checking that the name has both letters and digits first.
+        if self._letter_digit_boundary is not None and not self.valid_chars_for_integer.isdisjoint(name) and not self.valid_chars_for_string.isdisjoint(name):
+            name = self._letter_digit_boundary.sub(' ', name)
+        return name.strip()
+
+    def _get_normalized_node_name_per_char(self, name, extra_chars=None):
         name = name.lower()
         result = []
         last_i = None
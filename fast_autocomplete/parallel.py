@@ -0,0 +1,99 @@
+"""
+Searching many words on several processes at once.
+
+The searches are pure Python, so they do not run in parallel on threads. Instead the words
+are split into chunks and every chunk is searched with search_many on one of the worker
+processes. The workers get the autocomplete object in one of 2 ways:
+
+- Forking the process that already has the populated dwg. The pages of the dwg are shared
+  with the workers until either side writes to them.
+- Loading an index file that was saved with save_index. The file is memory mapped, so all
+  the workers share one copy of the dwg.
+"""
+import gc
+import multiprocessing
+import os
+from collections import deque
+from itertools import islice
+from threading import Lock
+
+# The autocomplete object of the current worker process.
+_worker_autocomplete = None
+# The number of chunks per worker that are sent to the pool before the first of them is waited for.
+CHUNKS_AHEAD_PER_WORKER = 2
+
+
+class ParallelSearchError(ValueError):
+    pass
+
+
+def _init_forked_worker(autocomplete):
+    global _worker_autocomplete
+    _worker_autocomplete = autocomplete
+    # Another thread might have held the locks of the parent at the time of the fork.
+    _worker_autocomplete._lock = Lock()
+    _worker_autocomplete.normalizer._cache.lock = Lock()
+    _worker_autocomplete._init_cache()
+
+
+def _init_index_worker(module, index_path):
+    global _worker_autocomplete
+    _worker_autocomplete = module.load_index(index_path)
+
+
+def _search_chunk(args):
+    words, max_cost, size = args
+    return _worker_autocomplete.search_many(words, max_cost=max_cost, size=size)
+
+
+def _get_chunks(words, chunk_size, max_cost, size):
+    words = iter(words)
+    while True:
+        chunk = list(islice(words, chunk_size))
+        if not chunk:
+            return
+        yield chunk, max_cost, size
+
+
+def _create_pool(autocomplete, workers, index_path):
+    if index_path:
+        return multiprocessing.Pool(workers, initializer=_init_index_worker, initargs=(type(autocomplete), index_path))
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        raise ParallelSearchError('Forking processes is not supported on this platform. Pass the index_path of an index that was saved with save_index instead.') from None
+    # Keep the garbage collector of the workers from writing to the pages of the dwg.
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    try:
+        # The forked workers inherit the initargs without pickling them. The pool keeps them,
+        # so the workers that replace the ones that exited get the autocomplete object too.
+        return context.Pool(workers, initializer=_init_forked_worker, initargs=(autocomplete,))
+    finally:
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+
+
+def search_many_parallel(autocomplete, words, max_cost=2, size=5, workers=None, chunk_size=200, index_path=None):
+    """
+    Yields the search results of each word in the same order as the words.
+
+    :param words: Any iterable of words. It is read one chunk at a time, and only up to
+                  CHUNKS_AHEAD_PER_WORKER chunks per worker ahead of the results that were yielded.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param chunk_size: The number of words that are sent to a worker at a time.
+    :param index_path: The path to an index file of the autocomplete object. If it is passed,
+                       the workers load the index instead of being forked from this process.
+    """
+    if chunk_size < 1:
+        raise ParallelSearchError('The chunk_size needs to be at least 1.')
+    # Pool.imap would read all the words up front, so the chunks are sent one by one instead.
+    max_pending_chunks = CHUNKS_AHEAD_PER_WORKER * (workers or os.cpu_count() or 1)
+    with _create_pool(autocomplete, workers, index_path) as pool:
+        pending_chunks = deque()
+        for chunk in _get_chunks(words, chunk_size, max_cost, size):
+            pending_chunks.append(pool.apply_async(_search_chunk, (chunk,)))
+            if len(pending_chunks) >= max_pending_chunks:
+                yield from pending_chunks.popleft().get()
+        while pending_chunks:
+            yield from pending_chunks.popleft().get()
@@ -0,0 +1,99 @@
+"""
+Searching as the user types, one keystroke at a time.
+"""
+from fast_autocomplete.dwg import _PrefixWalkState, _SearchBatch
+
+
+class AutoCompleteSession:
+    """
+    Keeps the state of the prefix walk of the dwg after every character of the normalized text,
+    so typing a character only walks that character and backspace only drops the last state.
+
+    The whole text is normalized again on every change, since the normalized text is not always
+    the previous one plus the new character. For example the trailing spaces are stripped and
+    a space is added between letters and digits. The walk only continues from where the old and
+    the new normalized texts stop being the same.
+
+    The results are the same as AutoComplete.search and they go to the same LFU cache.
+    """
+
+    def __init__(self, autocomplete, max_cost=2, size=5):
+        self.autocomplete = autocomplete
+        self.max_cost = max_cost
+        self.size = size
+        self._text = ''
+        self._normalized_text = ''
+        self._states = [_PrefixWalkState(autocomplete._dwg)]
+        self._dwg_version = autocomplete._dwg_version
+
+    @property
+    def text(self):
+        return self._text
+
+    def type(self, chars):
+        """
+        Adds the characters to the end of the text.
+        """
+        self.set_text(self._text + chars)
+        return self
+
+    def backspace(self, count=1):
+        """
+        Removes the last count characters of the text.
+        """
+        if count > 0:
+            self.set_text(self._text[:-count])
+        return self
+
+    def clear(self):
+        self.set_text('')
+        return self
+
+    def set_text(self, text):
+        """
+        Replaces the text. Only the part of the normalized text that changed is walked again.
+        """
+        autocomplete = self.autocomplete
+        normalized_text = autocomplete.normalizer.normalize_node_name(text)
+        # The dwg was replaced, for example by freezing it, or words were added or removed.
+        if self._states[0].node is not autocomplete._dwg or self._dwg_version != autocomplete._dwg_version:
+            self._states = [_PrefixWalkState(autocomplete._dwg)]
+            self._dwg_version = autocomplete._dwg_version
+            self._normalized_text = ''
+        common_length = 0
+        for old_char, new_char in zip(self._normalized_text, normalized_text):
+            if old_char != new_char:
+                break
+            common_length += 1
+        del self._states[common_length + 1:]
+        for char in normalized_text[common_length:]:
+            state = self._states[-1].copy()
+            autocomplete._advance_prefix_walk(state, char)
+            self._states.append(state)
+        self._text = text
+        self._normalized_text = normalized_text
+        return self
+
+    def results(self, size=None, max_cost=None):
+        """
+        Returns the autocomplete results of the current text.
+
+        :param size: The max number of results to return. Defaults to the size of the session.
+        :param max_cost: Maximum Levenshtein edit distance. Defaults to the max_cost of the session.
+        """
+        size = self.size if size is None else size
+        max_cost = self.max_cost if max_cost is None else max_cost
+        autocomplete = self.autocomplete
+        word = self._normalized_text
+        if not word:
+            return []
+        # Walk the text again if the dwg has changed since the last keystroke.
+        self.set_text(self._text)
+        key = autocomplete._get_cache_key(word, max_cost, size)
+        result = autocomplete._lfu_cache.get(key)
+        if result == -1:
+            first_part = autocomplete._end_prefix_walk(self._states[-1].copy())
+            batch = _SearchBatch(autocomplete)
+            batch.add_prefix_autofill(word, autocomplete._prefix_autofill(word, first_part=first_part))
+            result = autocomplete._find_and_cache(word, max_cost, size, key, batch=batch)
+        return result
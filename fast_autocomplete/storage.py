@@ -0,0 +1,168 @@
+"""
+Saving and loading of prebuilt Autocomplete indexes.
+
+The index file is:
+
+- The header: the magic bytes, the format version, the number of sections and the crc32
+  checksum of everything that comes after the header.
+- The table of sections: the name, the offset and the length of each section.
+- The sections themselves. Each section starts at a multiple of 8 bytes so the arrays of
+  the frozen dwg can be used in place from a memory mapped file.
+
+Since the file can be memory mapped, several worker processes on the same host that load
+the same file share one copy of the dwg in memory.
+
+The words dictionary is stored with pickle, so only load index files that you have created.
+"""
+import io
+import json
+import mmap as _mmap
+import pickle
+import struct
+import zlib
+
+from fast_autocomplete.dwg import _DawgNode
+from fast_autocomplete.frozen import FrozenDawg
+
+MAGIC = b'FACIDX'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<6sHII')
+_SECTION = struct.Struct('<16sQQ')
+_ALIGNMENT = 8
+
+
+class IndexFormatError(ValueError):
+    pass
+
+
+def _get_meta(autocomplete):
+    normalizer = autocomplete.normalizer
+    return {
+        'synonyms': autocomplete._raw_synonyms,
+        'full_stop_words': sorted(autocomplete._full_stop_words) if autocomplete._full_stop_words else None,
+        'valid_chars_for_string': ''.join(sorted(normalizer.valid_chars_for_string)),
+        'valid_chars_for_integer': ''.join(sorted(normalizer.valid_chars_for_integer)),
+        'valid_chars_for_node_name': ''.join(sorted(normalizer.valid_chars_for_node_name)),
+    }
+
+
+def write_index(autocomplete, file_obj, minimize=False):
+    """
+    Writes the index of the autocomplete object into a binary file object.
+
+    :param minimize: (Boolean, default: False) Minimize the dwg before writing it.
+                     This has no effect if the dwg of the autocomplete object is already frozen.
+    """
+    if isinstance(autocomplete._dwg, _DawgNode):
+        frozen = FrozenDawg.from_node(autocomplete._dwg, minimize=minimize)
+    # The dwg is already frozen
+    else:
+        frozen = autocomplete._dwg._dawg
+    sections = {
+        'meta': json.dumps(_get_meta(autocomplete)).encode('utf-8'),
+        'words': pickle.dumps(autocomplete.words, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+    sections.update(frozen.to_sections())
+
+    table = []
+    body = []
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    for name, data in sections.items():
+        padding = -offset % _ALIGNMENT
+        body.append(b'\0' * padding)
+        offset += padding
+        table.append(_SECTION.pack(name.encode('ascii'), offset, len(data)))
+        body.append(data)
+        offset += len(data)
+
+    checksum = 0
+    for chunk in table + body:
+        checksum = zlib.crc32(chunk, checksum)
+
+    file_obj.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), checksum))
+    for chunk in table + body:
+        file_obj.write(chunk)
+
+
+def dumps_index(autocomplete, minimize=False):
+    """
+    Returns the index of the autocomplete object as bytes.
+    """
+    file_obj = io.BytesIO()
+    write_index(autocomplete, file_obj, minimize=minimize)
+    return file_obj.getvalue()
+
+
+def save_index(autocomplete, path, minimize=False):
+    with open(path, 'wb') as the_file:
+        write_index(autocomplete, the_file, minimize=minimize)
+
+
+def _read_sections(buffer, verify=True):
+    buffer = memoryview(buffer)
+    if len(buffer) < _HEADER.size:
+        raise IndexFormatError('The index is too short to be an Autocomplete index.')
+    magic, version, sections_count, checksum = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise IndexFormatError('The data is not an Autocomplete index.')
+    if version != FORMAT_VERSION:
+        raise IndexFormatError(f'The index format version is {version} but version {FORMAT_VERSION} is expected.')
+    if verify and zlib.crc32(buffer[_HEADER.size:]) != checksum:
+        raise IndexFormatError('The checksum of the index does not match. The index is corrupted.')
+    sections = {}
+    for i in range(sections_count):
+        name, offset, length = _SECTION.unpack_from(buffer, _HEADER.size + _SECTION.size * i)
+        if offset + length > len(buffer):
+            raise IndexFormatError('The index is truncated.')
+        sections[name.rstrip(b'\0').decode('ascii')] = buffer[offset:offset + length]
+    return sections
+
+
+def loads_index(buffer, module, logger=None, verify=True):
+    """
+    Creates an autocomplete object of the module class from an index.
+
+    :param buffer: The bytes of the index or any other object that supports the buffer protocol.
+                   The arrays of the dwg are used in place, so pass a writable buffer such as
+                   a bytearray if you want to update the counts of words.
+    :param verify: (Boolean, default: True) Verify the checksum of the index.
+    """
+    sections = _read_sections(buffer, verify=verify)
+    meta = json.loads(bytes(sections['meta']).decode('utf-8'))
+    autocomplete = module.__new__(module)
+    autocomplete._init_attributes(
+        words=pickle.loads(sections['words']),
+        synonyms=meta['synonyms'],
+        full_stop_words=meta['full_stop_words'],
+        logger=logger,
+        valid_chars_for_string=meta['valid_chars_for_string'],
+        valid_chars_for_integer=meta['valid_chars_for_integer'],
+        valid_chars_for_node_name=set(meta['valid_chars_for_node_name']),
+    )
+    autocomplete._dwg = FrozenDawg.from_sections(sections).root
+    autocomplete._populate_fuzzy_index()
+    return autocomplete
+
+
+def load_index(path, module, mmap=True, logger=None, verify=None):
+    """
+    Creates an autocomplete object of the module class from an index file.
+
+    :param mmap: (Boolean, default: True) Memory map the file instead of reading it.
+                 The pages of the file are shared between all the processes that map it.
+                 Updating the counts of words only changes the copy of the process that made
+                 the change and not the file.
+    :param verify: (Boolean, default: not mmap) Verify the checksum of the whole index.
+                   That reads every page of the file, so with mmap it is off by default and
+                   the pages of the dwg are only read when the searches need them. The header
+                   and the table of sections are always checked.
+    """
+    if verify is None:
+        verify = not mmap
+    with open(path, 'rb') as the_file:
+        if mmap:
+            buffer = _mmap.mmap(the_file.fileno(), 0, access=_mmap.ACCESS_COPY)
+        else:
+            buffer = bytearray(the_file.read())
+    return loads_index(buffer, module=module, logger=logger, verify=verify)
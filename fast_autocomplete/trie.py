@@ -0,0 +1,96 @@
+class TrieIndex:
+    """
+    A trie of the words exactly as they are in the words dictionary, for the trie fuzzy engine.
+
+    The dwg can not be used for this: its branches are the normalized words, for example
+    `bmw i 3` for `bmw i3`, and a node can only have one word, so the edit distances on the dwg
+    are not the edit distances to the words themselves.
+
+    Every node is a dictionary of its characters to its children. The node of a word also has
+    the id of the word under the None key. The ids are given in the order the words are added.
+    """
+
+    def __init__(self, words=(), copy_on_write=False):
+        """
+        :param copy_on_write: Copy the nodes on the path of a word that is added or removed and
+                              then swap the root, so the walks that are running are not affected.
+        """
+        self.words = []
+        self._ids = {}
+        self._root = {}
+        self.copy_on_write = copy_on_write
+        for word in words:
+            self.add(word)
+
+    def _get_path_nodes(self, word, create):
+        root = self._root.copy() if self.copy_on_write else self._root
+        nodes = [root]
+        for char in word:
+            child_node = nodes[-1].get(char)
+            if child_node is None:
+                if not create:
+                    return None
+                child_node = {}
+            elif self.copy_on_write:
+                child_node = child_node.copy()
+            nodes[-1][char] = child_node
+            nodes.append(child_node)
+        return nodes
+
+    def add(self, word):
+        if word in self._ids:
+            return
+        word_id = len(self.words)
+        nodes = self._get_path_nodes(word, create=True)
+        nodes[-1][None] = word_id
+        self.words.append(word)
+        self._ids[word] = word_id
+        self._root = nodes[0]
+
+    def remove(self, word):
+        """
+        Removes the word. Its id is not reused, so the ids stay in the order that the words were added.
+        """
+        word_id = self._ids.pop(word, None)
+        if word_id is None:
+            return
+        self.words[word_id] = None
+        nodes = self._get_path_nodes(word, create=False)
+        del nodes[-1][None]
+        for i in range(len(word), 0, -1):
+            if nodes[i]:
+                break
+            del nodes[i - 1][word[i - 1]]
+        self._root = nodes[0]
+
+    def get_candidates(self, word, max_distance):
+        """
+        Returns the (word, distance) of the words that are within max_distance edits of the word,
+        in the order that they were added. The trie is walked with one row of the Levenshtein
+        matrix per node and the branches whose row can not get under max_distance are skipped.
+        """
+        root = self._root
+        columns = len(word) + 1
+        found = []
+        if None in root and len(word) <= max_distance:
+            found.append((root[None], len(word)))
+        stack = [(root, list(range(columns)))]
+        while stack:
+            node, previous_row = stack.pop()
+            for letter, child_node in node.items():
+                if letter is None:
+                    continue
+                current_row = [previous_row[0] + 1]
+                for column in range(1, columns):
+                    current_row.append(min(
+                        current_row[column - 1] + 1,
+                        previous_row[column] + 1,
+                        previous_row[column - 1] + (word[column - 1] != letter),
+                    ))
+                if current_row[-1] <= max_distance and None in child_node:
+                    found.append((child_node[None], current_row[-1]))
+                if min(current_row) <= max_distance:
+                    stack.append((child_node, current_row))
+        found.sort()
+        words = self.words
+        return [(words[word_id], distance) for word_id, distance in found]
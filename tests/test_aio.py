@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.aio import AsyncAutoComplete
+from test_autocomplete import SEARCH_MANY_WORDS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+
+class BlockingAutoComplete(AutoComplete):
+    """
+    Records the searches and does not finish them until it is released.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.searched_words = []
+        self.release = threading.Event()
+
+    def search(self, word, max_cost=2, size=5):
+        self.searched_words.append(word)
+        self.release.wait(5)
+        return super().search(word, max_cost=max_cost, size=size)
+
+
+def run(coroutine):
+    # asyncio.run is not in Python 3.6.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def wait_for_searches(auto_complete, count):
+    while len(auto_complete.searched_words) < count:
+        await asyncio.sleep(0.001)
+
+
+class TestAsyncAutoComplete:
+
+    def test_search(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        async_auto_complete = AsyncAutoComplete(AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS))
+
+        async def search_all():
+            return await asyncio.gather(*[async_auto_complete.search(word, max_cost=3, size=3) for word in SEARCH_MANY_WORDS])
+
+        results = run(search_all())
+        async_auto_complete.close()
+        expected_results = [auto_complete.search(word, max_cost=3, size=3) for word in SEARCH_MANY_WORDS]
+        print_results(locals())
+        assert expected_results == results
+
+    def test_identical_searches_are_coalesced(self):
+        auto_complete = BlockingAutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        async_auto_complete = AsyncAutoComplete(auto_complete)
+
+        async def search_all():
+            tasks = [asyncio.ensure_future(async_auto_complete.search(word, max_cost=3, size=3)) for word in ('Doyota', 'doyota', 'doyota ')]
+            await wait_for_searches(auto_complete, 1)
+            auto_complete.release.set()
+            return await asyncio.gather(*tasks)
+
+        results = run(search_all())
+        async_auto_complete.close()
+        assert ['doyota'] == auto_complete.searched_words
+        assert results[0] is results[1] is results[2]
+        assert not async_auto_complete._in_flight
+
+    def test_newer_search_of_session_cancels_the_older_one(self):
+        auto_complete = BlockingAutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        # Only one thread, so the search for `toyo` is still waiting for its turn when it gets cancelled.
+        async_auto_complete = AsyncAutoComplete(auto_complete, max_workers=1)
+
+        async def type_words():
+            other_session = asyncio.ensure_future(async_auto_complete.search('bmw', session='other user'))
+            await wait_for_searches(auto_complete, 1)
+            toy = asyncio.ensure_future(async_auto_complete.search('toy', session='user'))
+            await asyncio.sleep(0.01)
+            toyot = asyncio.ensure_future(async_auto_complete.search('toyot', session='user'))
+            await asyncio.sleep(0.01)
+            auto_complete.release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await toy
+            return await other_session, await toyot
+
+        other_session_results, toyot_results = run(type_words())
+        async_auto_complete.close()
+        assert ['bmw', 'toyot'] == auto_complete.searched_words
+        assert auto_complete.search('bmw') == other_session_results
+        assert toyot_results == auto_complete.search('toyot')
+        assert not async_auto_complete._sessions
+
+    def test_cached_results_skip_the_executor(self):
+        auto_complete = BlockingAutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete.release.set()
+        async_auto_complete = AsyncAutoComplete(auto_complete)
+        first = run(async_auto_complete.search('toyota a'))
+        second = run(async_auto_complete.search('toyota a'))
+        async_auto_complete.close()
+        assert first is second
+        assert ['toyota a'] == auto_complete.searched_words
@@ -2,13 +2,17 @@ import csv
 import json
 import os
 import pytest
+import random
 import string
+import threading
+from itertools import islice
 from pprint import pprint
 from typing import NamedTuple
 
 from fast_autocomplete.misc import read_csv_gen
 from fast_autocomplete import AutoComplete, DrawGraphMixin
-from fast_autocomplete.dwg import FindStep
+from fast_autocomplete.dwg import FindStep, FuzzyEngine, NodeNotFound, _PrefixIndex
+from fast_autocomplete.frozen import FrozenDawgError
 
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -365,6 +369,95 @@ class TestAutocompleteWithSynonyms:
         assert search_results_immutable == search_results
 
 
+class AutoCompleteTrieFuzzy(AutoComplete):
+    FUZZY_ENGINE = FuzzyEngine.trie
+
+
+class AutoCompleteNgramFuzzy(AutoComplete):
+    FUZZY_ENGINE = FuzzyEngine.ngram
+
+
+class AutoCompleteBestFirstFuzzy(AutoComplete):
+    FUZZY_ENGINE = FuzzyEngine.best_first
+
+
+class TestFuzzyEngines:
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results", SEARCH_CASES_PARAMS)
+    @pytest.mark.parametrize("module", [AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy])
+    def test_find_fuzzy_engine(self, module, word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results):
+        auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results, find_steps = auto_complete._find(word, max_cost, size)
+        results = dict(results)
+        print_results(locals())
+        assert expected_find_results == results
+        assert expected_steps == find_steps
+
+    @pytest.mark.parametrize("module", [AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy])
+    def test_fuzzy_engine_candidates_match_scan(self, module):
+        auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        rand = random.Random(0)
+        for word in auto_complete.words:
+            typo = list(word)
+            for _ in range(rand.randint(0, 2)):
+                typo.insert(rand.randint(0, len(typo)), rand.choice('abcdeimrxz 1234'))
+                del typo[rand.randint(0, len(typo) - 1)]
+            typo = ''.join(typo)
+            for max_cost in (2, 3):
+                expected_results = list(auto_complete._iter_fuzzy_candidates_via_scan(typo, max_cost))
+                results = list(auto_complete._iter_fuzzy_candidates(typo, max_cost))
+                assert expected_results == results, typo
+
+    @pytest.mark.parametrize("word, max_cost, size", [
+        # The words with digits are not normalized: bmw i3 is on the bmw i 3 branch of the dwg.
+        ('bmx i3', 3, 5),
+        ('rav5', 2, 3),
+        ('e31', 2, 3),
+        # 1a is made by a partial synonym and normalized to 1 a, the same branch as the word 1 a.
+        ('1 b', 2, 3),
+        ('doyota', 3, 3),
+        ('in los', 3, 3),
+    ])
+    @pytest.mark.parametrize("module", [AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy])
+    def test_fuzzy_engine_search_matches_scan(self, module, word, max_cost, size):
+        expected_results = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS).search(word, max_cost=max_cost, size=size)
+        results = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS).search(word, max_cost=max_cost, size=size)
+        print_results(locals())
+        assert expected_results == results
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_results", [
+        ('doyota', 3, 3, {1: ['toyota']}),
+        ('alpha', 3, 3, {2: ['alfa romeo']}),
+        # The scan stops at `etios` before reaching the exact match.
+        ('vios', 3, 3, {0: ['vios'], 2: ['etios', 'is']}),
+        ('aurix', 3, 3, {1: ['auris'], 2: ['aurion', 'audi']}),
+    ])
+    def test_best_first_fuzzy_matches(self, word, max_cost, size, expected_results):
+        auto_complete = AutoCompleteBestFirstFuzzy(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results, results_len, min_distance = auto_complete._get_fuzzy_matches(word, max_cost, size)
+        results = dict(results)
+        print_results(locals())
+        assert expected_results == results
+        assert min(expected_results) == min_distance
+
+    @pytest.mark.parametrize("word, max_cost, size", [
+        ('doyota', 3, 3),
+        ('alpha', 3, 5),
+        ('merc', 3, 10),
+        ('serie', 3, 4),
+    ])
+    def test_best_first_fuzzy_matches_are_the_top_ones(self, word, max_cost, size):
+        auto_complete = AutoCompleteBestFirstFuzzy(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        all_matches = [
+            (dist, -auto_complete.get_count_of_word(_word), _word)
+            for _word, dist in auto_complete._iter_fuzzy_candidates_via_scan(word, max_cost)
+        ]
+        expected_results = [_word for dist, count, _word in sorted(all_matches)[:size]]
+        results = [node.word for node, path, dist in islice(auto_complete._dwg.get_best_fuzzy_nodes(word, max_cost), size)]
+        print_results(locals())
+        assert expected_results == results
+
+
 class AutoCompleteWithSynonymsShort(DrawGraphMixin, AutoComplete):
     pass
 
@@ -456,6 +549,615 @@ class TestPrefixAndDescendants:
         # assert expected_results == results[:size + 1]
 
 
+class AutoCompleteTopDescendants(AutoComplete):
+    TOP_DESCENDANTS_SIZE = 10
+
+
+class TestTopDescendants:
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results", SEARCH_CASES_PARAMS)
+    def test_find(self, word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results):
+        auto_complete = AutoCompleteTopDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results, find_steps = auto_complete._find(word, max_cost, size)
+        results = dict(results)
+        print_results(locals())
+        assert expected_find_results == results
+        assert expected_steps == find_steps
+        assert auto_complete._top_descendants
+
+    @pytest.mark.parametrize("updates, expected_results", [
+        ([], [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+        ([{'word': 'toyota aygo', 'count': 10000}], [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']]),
+        ([{'word': 'toyota aurion', 'offset': -6000}], [['toyota'], ['toyota avalon'], ['toyota auris'], ['toyota aygo']]),
+        ([{'word': 'toyota aygo', 'count': 10000}, {'word': 'toyota aygo', 'count': 1}],
+         [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+    ])
+    def test_update_count_of_word(self, updates, expected_results):
+        auto_complete = AutoCompleteTopDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        # memoize the top descendants before the counts change
+        auto_complete._find('toyota a', max_cost=2, size=4)
+        for update in updates:
+            auto_complete.update_count_of_word(**update)
+        results = list(auto_complete._find_and_sort('toyota a', max_cost=2, size=4))
+        print_results(locals())
+        assert expected_results == results
+
+    def test_update_count_of_word_keeps_other_branches(self):
+        auto_complete = AutoCompleteTopDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete._find('toyota a', max_cost=2, size=4)
+        auto_complete._find('bmw', max_cost=2, size=4)
+        bmw_keys = [key for key in auto_complete._top_descendants if key[0] == get_node(auto_complete, 'bmw')]
+        auto_complete.update_count_of_word(word='toyota aygo', count=10000)
+        print_results(locals())
+        assert bmw_keys
+        assert all(key in auto_complete._top_descendants for key in bmw_keys)
+        assert (get_node(auto_complete, 'toyota a'), True) not in auto_complete._top_descendants
+
+    @pytest.mark.parametrize("memo_size", [1, 3])
+    def test_memo_size(self, memo_size):
+
+        class AutoCompleteSmallMemo(AutoCompleteTopDescendants):
+            TOP_DESCENDANTS_MEMO_SIZE = memo_size
+
+        auto_complete = AutoCompleteSmallMemo(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        expected_auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        for word in ['toyota a', 'bmw', 'al', 'toyota a', 'tr', 'vi']:
+            results = auto_complete.search(word, max_cost=2, size=4)
+            assert expected_auto_complete.search(word, max_cost=2, size=4) == results
+            assert len(auto_complete._top_descendants) <= memo_size
+
+
+SEARCH_MANY_WORDS = [case['word'] for case in SEARCH_CASES] + [
+    'DOYOTA', 'doyota', 'beener', 'alpha romeo', 'in los angeles', 'toyota a', 'toyota a', 'bmw 1', 'vios', 'aurix']
+
+
+class TestSearchMany:
+
+    @pytest.mark.parametrize("max_cost, size", [(3, 3), (2, 5), (1, 1)])
+    @pytest.mark.parametrize("module", [AutoComplete, AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy, AutoCompleteBestFirstFuzzy, AutoCompleteTopDescendants])
+    def test_search_many_matches_search(self, module, max_cost, size):
+        auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results = auto_complete.search_many(SEARCH_MANY_WORDS, max_cost=max_cost, size=size)
+        expected_results = [module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS).search(word, max_cost=max_cost, size=size)
+                            for word in SEARCH_MANY_WORDS]
+        print_results(locals())
+        assert expected_results == results
+
+    def test_search_many_uses_the_cache(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        result = auto_complete.search('doyota', max_cost=3, size=3)
+        results = auto_complete.search_many(['doyota', 'toyota a', 'doyota'], max_cost=3, size=3)
+        assert result is results[0] is results[2]
+        assert results[1] is auto_complete.search('toyota a', max_cost=3, size=3)
+
+    def test_search_many_with_full_stop_words(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        words = ['bmw', 'al', 'alfa romeo 4', 'bmw 1', 'beemer 1']
+        results = auto_complete.search_many(words, max_cost=3, size=3)
+        expected_results = [
+            AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo']).search(word, max_cost=3, size=3)
+            for word in words]
+        print_results(locals())
+        assert [['bmw']] == results[0]
+        assert expected_results == results
+
+    def test_get_many_fuzzy_matches(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        new_words = ['doyota', 'beener', 'alpha', 'in los']
+        results = auto_complete._get_many_fuzzy_matches(new_words, max_cost=3, size=3)
+        expected_results = {new_word: auto_complete._get_fuzzy_matches(new_word, max_cost=3, size=3) for new_word in new_words}
+        assert expected_results == results
+
+
+class AutoCompleteBestFirstDescendants(AutoComplete):
+    BEST_FIRST_DESCENDANTS = True
+
+
+def get_node_from(node, prefix):
+    for char in prefix:
+        node = node[char]
+    return node
+
+
+def get_node(auto_complete, prefix):
+    return get_node_from(auto_complete._dwg, prefix)
+
+
+class TestBestFirstDescendants:
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results", SEARCH_CASES_PARAMS)
+    def test_find(self, word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results):
+        auto_complete = AutoCompleteBestFirstDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results, find_steps = auto_complete._find(word, max_cost, size)
+        results = dict(results)
+        print_results(locals())
+        assert expected_find_results == results
+        assert expected_steps == find_steps
+
+    @pytest.mark.parametrize("prefix", ['', 'a', 'toyota', 'bmw ', 'tr', 'truck'])
+    def test_get_descendants_nodes_by_count(self, prefix):
+        auto_complete = AutoCompleteBestFirstDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        node = get_node(auto_complete, prefix)
+        results = [_node.value for _node in node.get_descendants_nodes_by_count()]
+        expected_results = list(dict.fromkeys(
+            _node.value for _node in sorted(node.get_descendants_nodes(size=10 ** 6), key=lambda x: -x.count)))
+        print_results(locals())
+        assert expected_results == results
+
+    @pytest.mark.parametrize("updates, expected_results", [
+        ([], [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+        ([{'word': 'toyota aygo', 'count': 10000}], [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']]),
+        ([{'word': 'toyota aurion', 'offset': -6000}], [['toyota'], ['toyota avalon'], ['toyota auris'], ['toyota aygo']]),
+        ([{'word': 'toyota aygo', 'count': 10000}, {'word': 'toyota aygo', 'count': 1}],
+         [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+    ])
+    def test_update_count_of_word(self, updates, expected_results):
+        auto_complete = AutoCompleteBestFirstDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        for update in updates:
+            auto_complete.update_count_of_word(**update)
+        results = list(auto_complete._find_and_sort('toyota a', max_cost=2, size=4))
+        root = auto_complete._dwg
+        print_results(locals())
+        assert expected_results == results
+        assert root.max_count == max(_node.count for _node in root.get_descendants_nodes(size=10 ** 6))
+
+    @pytest.mark.parametrize("words, synonyms, updates, word, size, expected_results", [
+        (WIKIPEDIA_WORDS, SYNONYMS, [{'word': 'alfa romeo alfetta', 'count': 100000}], 'alfa', 3,
+         [['alfa romeo'], ['alfa romeo 2300'], ['alfa romeo montreal']]),
+        ({'vw golf': {'count': 5}, 'vw polo': {'count': 4}, 'audi': {'count': 50}, 'volvo': {'count': 60},
+          'volkswagen': {'count': 100}}, {'volkswagen': ['vw']}, [], 'v', 2,
+         [['volvo'], ['vw golf']]),
+    ])
+    def test_values_on_several_nodes(self, words, synonyms, updates, word, size, expected_results):
+        """
+        The values that are on several nodes are ranked by their first node in the breadth first order,
+        the same as without BEST_FIRST_DESCENDANTS.
+        """
+        auto_complete = AutoCompleteBestFirstDescendants(words=words, synonyms=synonyms)
+        auto_complete_without_best_first = AutoComplete(words=words, synonyms=synonyms)
+        for update in updates:
+            auto_complete.update_count_of_word(**update)
+            auto_complete_without_best_first.update_count_of_word(**update)
+        results = auto_complete.search(word, size=size)
+        results_without_best_first = auto_complete_without_best_first.search(word, size=size)
+        print_results(locals())
+        assert expected_results == results
+        assert results_without_best_first == results
+
+    def test_get_ancestor_nodes_through_synonyms(self):
+        auto_complete = AutoCompleteBestFirstDescendants(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        ancestors = auto_complete._get_ancestor_nodes(get_node(auto_complete, 'bmw'))
+        # The branches of the beemer and bimmer synonyms are merged into the bmw branch.
+        assert get_node(auto_complete, 'bm') in ancestors
+        assert get_node(auto_complete, 'beeme') in ancestors
+        assert get_node(auto_complete, 'bimme') in ancestors
+        assert get_node(auto_complete, 'bmw') in ancestors
+        assert get_node(auto_complete, 'bmw 1') not in ancestors
+
+
+class AutoCompleteLockFreeReads(AutoComplete):
+    LOCK_FREE_READS = True
+
+
+class AutoCompleteLockFreeReadsBestFirst(AutoCompleteLockFreeReads):
+    BEST_FIRST_DESCENDANTS = True
+    TOP_DESCENDANTS_SIZE = 10
+
+
+class TestLockFreeReads:
+
+    @pytest.mark.parametrize("module", [AutoCompleteLockFreeReads, AutoCompleteLockFreeReadsBestFirst])
+    @pytest.mark.parametrize("updates, expected_results", [
+        ([], [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+        ([{'word': 'toyota aygo', 'count': 10000}], [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']]),
+        ([{'word': 'toyota aurion', 'offset': -6000}], [['toyota'], ['toyota avalon'], ['toyota auris'], ['toyota aygo']]),
+        ([{'word': 'toyota aygo', 'count': 10000}, {'word': 'toyota aygo', 'count': 1}],
+         [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+        # bmw is reached via the beemer and bimmer synonym branches too
+        ([{'word': 'bmw', 'count': 10 ** 9}], [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']]),
+        # toyota ay is not a word so the whole dwg is copied
+        ([{'word': 'toyota ay', 'count': 10 ** 9}, {'word': 'toyota aygo', 'count': 10000}],
+         [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']]),
+    ])
+    def test_update_count_of_word(self, module, updates, expected_results):
+        auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete._find('toyota a', max_cost=2, size=4)
+        old_root = auto_complete._dwg
+        for update in updates:
+            auto_complete.update_count_of_word(**update)
+        results = list(auto_complete._find_and_sort('toyota a', max_cost=2, size=4))
+        print_results(locals())
+        assert expected_results == results
+        # The old nodes do not change
+        assert 2115 == get_node_from(old_root, 'toyota aygo').count
+        assert 6094 == get_node_from(old_root, 'toyota aurion').count
+        for update in updates:
+            assert auto_complete.get_count_of_word(update['word']) == get_node(auto_complete, update['word']).count
+
+    def test_synonym_branches_see_the_new_count(self):
+        auto_complete = AutoCompleteLockFreeReadsBestFirst(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete.update_count_of_word(word='bmw', count=10 ** 9)
+        for synonym in ('bmw', 'beemer', 'bimmer'):
+            assert 10 ** 9 == get_node(auto_complete, synonym).count
+        assert 10 ** 9 == auto_complete._dwg.max_count
+
+    def test_each_thread_has_its_own_cache(self):
+        auto_complete = AutoCompleteLockFreeReads(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        results = auto_complete.search('toyota a')
+        thread_results = []
+        thread = threading.Thread(target=lambda: thread_results.append(auto_complete.search('toyota a')))
+        thread.start()
+        thread.join()
+        assert results == thread_results[0]
+        assert results is not thread_results[0]
+        assert results is auto_complete.search('toyota a')
+
+    def test_searches_while_counts_change(self):
+        auto_complete = AutoCompleteLockFreeReadsBestFirst(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        words = ['toyota a', 'bmw', 'beemer', 'doyota', 'alfa romeo 4', 'in los', 'tr']
+        errors = []
+        is_done = threading.Event()
+
+        def search():
+            try:
+                while not is_done.is_set():
+                    for word in words:
+                        auto_complete._find(word, max_cost=3, size=3)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(200):
+            auto_complete.update_count_of_word(word='toyota aygo', count=i * 100 + 1)
+            auto_complete.update_count_of_word(word='bmw', offset=1)
+        is_done.set()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert 19901 == auto_complete.get_count_of_word('toyota aygo')
+        expected_results = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        expected_results.update_count_of_word(word='toyota aygo', count=19901)
+        expected_results.update_count_of_word(word='bmw', offset=200)
+        for word in words:
+            assert dict(expected_results._find(word, max_cost=3, size=3)[0]) == dict(auto_complete._find(word, max_cost=3, size=3)[0])
+
+
+MUTATION_QUERIES = [
+    'toyota a', 'toyota', 'bmw', 'bmw x', 'beemer', 'bimmer 3', 'alfa', 'alfa romeo 4', 'alfa 4',
+    'truck', 'trucks', 'doyota', 'tesla', 'tesla cybertr', 'teslo', 'kia', 'kia e', 'vw', 'volkswagen g']
+
+
+def get_original_words():
+    """
+    The constructor adds the words of the partial synonyms to the words dictionary that is passed to it.
+    """
+    return {key: value for key, value in WIKIPEDIA_WORDS.items() if 'original_key' not in value}
+
+
+def get_dwg_values(auto_complete):
+    return sorted((node.value, node.count) for node in auto_complete._dwg.get_all_nodes() if node.value)
+
+
+class TestLiveMutation:
+
+    MODULES = [AutoComplete, AutoCompleteLockFreeReadsBestFirst, AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy, AutoCompleteTopDescendants]
+
+    def assert_same_as_new(self, auto_complete, words, synonyms):
+        expected = type(auto_complete)(words=words, synonyms=synonyms)
+        assert expected.words == auto_complete.words
+        assert get_dwg_values(expected) == get_dwg_values(auto_complete)
+        for word in MUTATION_QUERIES:
+            assert expected.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4), word
+        if auto_complete.BEST_FIRST_DESCENDANTS:
+            for node in auto_complete._dwg.get_all_nodes():
+                assert node.max_count == max(_node.count for _node in node.get_all_nodes())
+
+    @pytest.mark.parametrize("module", MODULES)
+    def test_add_word(self, module):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        for word in MUTATION_QUERIES:
+            auto_complete.search(word, max_cost=3, size=4)
+        auto_complete.add_word('tesla cybertruck', {}, count=50000)
+        auto_complete.add_word('tesla', {'make': 'tesla'}, count=100)
+        auto_complete.add_word('kia ev6', count=20)
+        words = get_original_words()
+        words['tesla cybertruck'] = {'count': 50000}
+        words['tesla'] = {'make': 'tesla', 'count': 100}
+        words['kia ev6'] = {'count': 20}
+        self.assert_same_as_new(auto_complete, words, SYNONYMS)
+
+    @pytest.mark.parametrize("module", MODULES)
+    def test_add_word_that_exists(self, module):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.add_word('toyota aygo', {'model': 'aygo'}, count=10000)
+        words = get_original_words()
+        words['toyota aygo'] = {'model': 'aygo', 'count': 10000}
+        self.assert_same_as_new(auto_complete, words, SYNONYMS)
+        assert [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']] == auto_complete.search('toyota a', max_cost=2, size=4)
+
+    @pytest.mark.parametrize("module", MODULES)
+    @pytest.mark.parametrize("removed_words", [
+        ['toyota aygo'],
+        ['bmw'],
+        ['truck'],
+        ['alfa romeo 4c', 'alfa romeo'],
+        ['volkswagen golf', 'volkswagen'],
+    ])
+    def test_remove_word(self, module, removed_words):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        for word in MUTATION_QUERIES:
+            auto_complete.search(word, max_cost=3, size=4)
+        for word in removed_words:
+            auto_complete.remove_word(word)
+        words = {key: value for key, value in get_original_words().items() if key not in removed_words}
+        self.assert_same_as_new(auto_complete, words, SYNONYMS)
+
+    @pytest.mark.parametrize("module", MODULES)
+    def test_remove_and_add_word_again(self, module):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        value = WIKIPEDIA_WORDS['bmw']
+        auto_complete.remove_word('bmw')
+        assert [] == auto_complete.search('beemer', max_cost=0, size=4)
+        auto_complete.add_word('bmw', value)
+        words = get_original_words()
+        del words['bmw']
+        words['bmw'] = value
+        self.assert_same_as_new(auto_complete, words, SYNONYMS)
+
+    @pytest.mark.parametrize("module", MODULES)
+    @pytest.mark.parametrize("key, synonym", [
+        ('toyota', 'yota'),
+        ('volkswagen', 'vdub'),
+        ('alfa romeo', 'alfa r'),
+        ('kia', 'kia motors'),
+    ])
+    def test_add_synonym(self, module, key, synonym):
+        auto_complete = module(words=get_original_words(), synonyms={key: value.copy() for key, value in SYNONYMS.items()})
+        for word in MUTATION_QUERIES:
+            auto_complete.search(word, max_cost=3, size=4)
+        auto_complete.add_synonym(key, synonym)
+        synonyms = {key: value.copy() for key, value in SYNONYMS.items()}
+        synonyms.setdefault(key, []).append(synonym)
+        self.assert_same_as_new(auto_complete, get_original_words(), synonyms)
+
+    @pytest.mark.parametrize("module", MODULES)
+    def test_add_word_and_synonym_without_branches(self, module):
+        auto_complete = module(words=get_original_words(), synonyms={key: value.copy() for key, value in SYNONYMS.items()})
+        # It has no valid characters.
+        auto_complete.add_word('!!!')
+        # No word starts with tesla, so the partial synonym makes no words.
+        auto_complete.add_synonym('tesla', 'tes')
+        words = get_original_words()
+        words['!!!'] = {}
+        synonyms = {key: value.copy() for key, value in SYNONYMS.items()}
+        synonyms['tesla'] = ['tes']
+        self.assert_same_as_new(auto_complete, words, synonyms)
+
+    @pytest.mark.parametrize("module", MODULES)
+    @pytest.mark.parametrize("seed", [3, 5, 7])
+    def test_cached_results_after_random_changes(self, module, seed):
+        rand = random.Random(seed)
+        words = get_original_words()
+        auto_complete = module(words=dict(words), synonyms=SYNONYMS)
+        # zz and x match nothing, so their prefix walk ends on the root.
+        queries = MUTATION_QUERIES + ['zz', 'x', 'a', 'au', 'audx'] + [word[:rand.randint(1, 8)] for word in rand.sample(list(words), 20)]
+        for _ in range(5):
+            for word in queries:
+                for size in (2, 4):
+                    auto_complete.search(word, max_cost=3, size=size)
+            if rand.random() < 0.5:
+                removed_word = rand.choice(list(words))
+                auto_complete.remove_word(removed_word)
+                del words[removed_word]
+            else:
+                new_word = ''.join(rand.choices('abtxz ', k=rand.randint(2, 6))).strip() or 'zq'
+                value = {'count': rand.randint(0, 1000)}
+                auto_complete.add_word(new_word, value)
+                words.setdefault(new_word, {}).update(value)
+            expected = module(words=dict(words), synonyms=SYNONYMS)
+            for word in queries:
+                for size in (2, 4):
+                    assert expected.search(word, max_cost=3, size=size) == auto_complete.search(word, max_cost=3, size=size), word
+
+    @pytest.mark.parametrize("change", ['remove', 'add'])
+    def test_cached_results_of_the_root(self, change):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        words = get_original_words()
+        results = auto_complete.search('zz', size=2)
+        if change == 'remove':
+            removed_word = results[0][0]
+            auto_complete.remove_word(removed_word)
+            del words[removed_word]
+        else:
+            auto_complete.add_word('zebra', count=10 ** 9)
+            words['zebra'] = {'count': 10 ** 9}
+        print_results(locals())
+        assert AutoComplete(words=words, synonyms=SYNONYMS).search('zz', size=2) == auto_complete.search('zz', size=2)
+
+    def test_remove_word_that_does_not_exist(self):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        with pytest.raises(NodeNotFound):
+            auto_complete.remove_word('toyota cybertruck')
+
+    def test_only_the_affected_cached_results_are_deleted(self):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        bmw_results = auto_complete.search('bmw', max_cost=3, size=4)
+        toyota_results = auto_complete.search('toyota a', max_cost=3, size=4)
+        auto_complete.add_word('toyota aygo x', count=10 ** 6)
+        assert bmw_results is auto_complete.search('bmw', max_cost=3, size=4)
+        assert toyota_results is not auto_complete.search('toyota a', max_cost=3, size=4)
+        assert ['toyota aygo x'] in auto_complete.search('toyota a', max_cost=3, size=4)
+
+    @pytest.mark.parametrize("word, max_cost, branch, expected", [
+        ('toyota a', 3, 'toyota aygo x', True),
+        ('toyota a', 3, 'bmw', False),
+        ('bmw 3', 3, 'bmw', True),
+        ('2018 toyota', 3, 'toyota aygo x', True),
+        ('doyota', 3, 'toyota aygo x', True),
+        ('doyota', 1, 'toyota aygo x', False),
+        ('bmwx', 2, 'bmw x5', True),
+    ])
+    def test_might_reach_branch(self, word, max_cost, branch, expected):
+        assert expected is AutoComplete._might_reach_branch(word, max_cost, branch)
+
+    def test_session_after_removing_a_word(self):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        session = auto_complete.session().type('toyota ay')
+        auto_complete.remove_word('toyota aygo')
+        assert AutoComplete(words={key: value for key, value in get_original_words().items() if key != 'toyota aygo'},
+                            synonyms=SYNONYMS).search('toyota ay') == session.results()
+
+    def test_frozen_dwg_can_not_change(self):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.freeze()
+        with pytest.raises(FrozenDawgError):
+            auto_complete.add_word('tesla')
+        with pytest.raises(FrozenDawgError):
+            auto_complete.remove_word('bmw')
+        with pytest.raises(FrozenDawgError):
+            auto_complete.add_synonym('bmw', 'bmer')
+
+
+class AutoCompleteTrackCacheDependencies(AutoComplete):
+    TRACK_CACHE_DEPENDENCIES = True
+
+
+class AutoCompleteTrackCacheDependenciesLockFree(AutoCompleteLockFreeReadsBestFirst):
+    TRACK_CACHE_DEPENDENCIES = True
+
+
+class AutoCompleteTrackCacheDependenciesBestFirstFuzzy(AutoCompleteBestFirstFuzzy):
+    TRACK_CACHE_DEPENDENCIES = True
+
+
+class AutoCompleteTrackCacheDependenciesTopDescendants(AutoCompleteTopDescendants):
+    TRACK_CACHE_DEPENDENCIES = True
+
+
+class TestCacheDependencies:
+
+    MODULES = [AutoCompleteTrackCacheDependencies, AutoCompleteTrackCacheDependenciesLockFree,
+               AutoCompleteTrackCacheDependenciesBestFirstFuzzy, AutoCompleteTrackCacheDependenciesTopDescendants]
+
+    @pytest.mark.parametrize("module", MODULES)
+    @pytest.mark.parametrize("updates", [
+        [{'word': 'toyota aygo', 'count': 10 ** 6}],
+        [{'word': 'toyota aurion', 'offset': -6000}],
+        # bmw is reached via the beemer and bimmer synonym branches too
+        [{'word': 'bmw m1', 'count': 10 ** 6}],
+        [{'word': 'alfa romeo 4c', 'count': 10 ** 6}, {'word': 'truck', 'count': 1}],
+        # toyota ay is not a word
+        [{'word': 'toyota ay', 'count': 10 ** 9}],
+    ])
+    def test_update_count_of_word(self, module, updates):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.search_many(MUTATION_QUERIES, max_cost=3, size=4)
+        for update in updates:
+            auto_complete.update_count_of_word(**update)
+        expected = module(words=get_original_words(), synonyms=SYNONYMS)
+        for update in updates:
+            expected.update_count_of_word(**update)
+        for word in MUTATION_QUERIES:
+            assert expected.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4), word
+
+    @pytest.mark.parametrize("module", MODULES)
+    def test_only_the_dependent_cached_results_are_deleted(self, module):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        toyota_results = auto_complete.search('toyota a', max_cost=3, size=4)
+        beemer_results = auto_complete.search('beemer', max_cost=3, size=4)
+        kia_results = auto_complete.search('kia', max_cost=3, size=4)
+        auto_complete.update_count_of_word('bmw m1', count=10 ** 6)
+        assert toyota_results is auto_complete.search('toyota a', max_cost=3, size=4)
+        assert kia_results is auto_complete.search('kia', max_cost=3, size=4)
+        results = auto_complete.search('beemer', max_cost=3, size=4)
+        assert beemer_results != results
+        assert ['bmw m1'] == results[1]
+
+    def test_best_first_fuzzy_results_depend_on_close_words(self):
+        auto_complete = AutoCompleteTrackCacheDependenciesBestFirstFuzzy(words=get_original_words(), synonyms=SYNONYMS)
+        results = auto_complete.search('doyota', max_cost=3, size=4)
+        kia_results = auto_complete.search('kia', max_cost=3, size=4)
+        auto_complete.update_count_of_word('toyota', count=10 ** 6)
+        assert results is not auto_complete.search('doyota', max_cost=3, size=4)
+        assert kia_results is auto_complete.search('kia', max_cost=3, size=4)
+
+    def test_evicted_results_are_forgotten(self):
+        auto_complete = AutoCompleteTrackCacheDependencies(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete._lfu_cache.capacity = 5
+        auto_complete.search_many(MUTATION_QUERIES, max_cost=3, size=4)
+        assert 5 == len(auto_complete._cache_dependencies)
+        assert set(auto_complete._lfu_cache.keys()) == set(auto_complete._cache_dependencies._dependencies)
+
+    def test_results_found_during_an_update_are_not_cached(self):
+        auto_complete = AutoCompleteTrackCacheDependencies(words=get_original_words(), synonyms=SYNONYMS)
+        version = auto_complete._cache_dependencies.version
+        auto_complete.update_count_of_word('toyota aygo', count=10 ** 6)
+        auto_complete._cache_dependencies.set(auto_complete._lfu_cache, 'toyota a-3-4', [], version, set(), set())
+        assert [] == auto_complete._lfu_cache.keys()
+
+    def test_freeze_deletes_the_tracked_results(self):
+        auto_complete = AutoCompleteTrackCacheDependencies(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.search('toyota a', max_cost=3, size=4)
+        auto_complete.freeze()
+        assert [] == auto_complete._lfu_cache.keys()
+        auto_complete.search('toyota a', max_cost=3, size=4)
+        auto_complete.update_count_of_word('toyota aygo', count=10 ** 6)
+        assert ['toyota aygo'] == auto_complete.search('toyota a', max_cost=3, size=4)[1]
+
+    @pytest.mark.parametrize("module", [AutoComplete, AutoCompleteTrackCacheDependencies])
+    def test_adding_a_word_under_a_synonym(self, module):
+        auto_complete = module(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.search('beemer', max_cost=3, size=4)
+        auto_complete.add_word('bmw x7', count=10 ** 6)
+        assert ['bmw x7'] in auto_complete.search('beemer', max_cost=3, size=4)
+
+
+class TestPartialSynonyms:
+
+    @pytest.mark.parametrize("word, expected_prefixes", [
+        ('alfa romeo 4c', ['alfa romeo', 'alfa']),
+        ('alfa', ['alfa']),
+        ('alf', []),
+        ('toyota camry', ['toyota', 'toyota camry']),
+        ('', []),
+    ])
+    def test_prefix_index(self, word, expected_prefixes):
+        index = _PrefixIndex(['alfa romeo', 'toyota', 'alfa', 'toyota camry', 'bmw x'])
+        prefixes = index.get_prefixes(word)
+        print_results(locals())
+        assert expected_prefixes == prefixes
+
+    def test_partial_synonym_words_are_the_same_as_checking_every_key(self):
+        synonyms = dict(SYNONYMS, **{
+            'toyota': ['toy'], 'toyota camry': ['toyota cam', 'camry'], 'alfa romeo 4': ['alfa romeo'], 'kia e': ['kia'],
+        })
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=synonyms)
+        expected_words = get_original_words()
+        for key, value in get_original_words().items():
+            for syn_key, syns in auto_complete._partial_synonyms.items():
+                if key.startswith(syn_key):
+                    for syn in syns:
+                        expected_words[key.replace(syn_key, syn)] = dict(value, original_key=key)
+        assert expected_words == auto_complete.words
+        assert list(expected_words) == list(auto_complete.words)
+
+    def test_words_of_one_key_share_the_value(self):
+        words = {'alfa romeo 4c': {'count': 10}, 'bmw': {'count': 5}}
+        auto_complete = AutoComplete(words=words, synonyms={'alfa romeo': ['alfa', 'alf']})
+        assert {'count': 10, 'original_key': 'alfa romeo 4c'} == auto_complete.words['alfa 4c']
+        assert auto_complete.words['alfa 4c'] is auto_complete.words['alf 4c']
+        assert {'count': 5} == auto_complete.words['bmw']
+
+    def test_add_synonym_updates_the_prefix_index(self):
+        auto_complete = AutoComplete(words=get_original_words(), synonyms=SYNONYMS)
+        auto_complete.add_synonym('toyota', 'toy')
+        auto_complete.add_word('toyota supra')
+        assert 'toyota supra' == auto_complete.words['toy supra']['original_key']
+        assert [['toyota'], ['toyota supra']] == auto_complete.search('toy sup', max_cost=0)
+
+
 class TestOther:
 
     @pytest.mark.parametrize("word, expected_results", [
@@ -0,0 +1,72 @@
+import csv
+import os
+
+import pytest
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.builder import BuildError, build_autocomplete
+from fast_autocomplete.misc import read_csv_gen
+from test_autocomplete import (
+    AutoCompleteBestFirstDescendants, AutoCompleteNgramFuzzy, AutoCompleteTrieFuzzy, MUTATION_QUERIES,
+    SYNONYMS, current_dir, get_original_words, print_results,
+)
+
+
+def get_csv_rows():
+    for row in read_csv_gen(os.path.join(current_dir, 'fixtures/makes_models_short.csv'), csv_func=csv.DictReader):
+        yield f"{row['make']} {row['model']}".lower(), row
+
+
+def get_flat_nodes(root):
+    nodes = root.get_all_nodes()
+    indexes = {node: i for i, node in enumerate(nodes)}
+    return [
+        (node.word, node.original_key, node.count, [(char, indexes[child]) for char, child in node.children.items()])
+        for node in nodes
+    ]
+
+
+class TestBuilder:
+
+    def assert_same_as_constructor(self, auto_complete, words, synonyms):
+        expected = type(auto_complete)(words=words, synonyms=synonyms)
+        assert expected.words == auto_complete.words
+        assert list(expected.words) == list(auto_complete.words)
+        assert get_flat_nodes(expected._dwg) == get_flat_nodes(auto_complete._dwg)
+        for word in MUTATION_QUERIES:
+            assert expected.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4), word
+        if auto_complete.BEST_FIRST_DESCENDANTS:
+            assert [node.max_count for node in expected._dwg.get_all_nodes()] == [node.max_count for node in auto_complete._dwg.get_all_nodes()]
+
+    @pytest.mark.parametrize("module", [AutoComplete, AutoCompleteTrieFuzzy, AutoCompleteNgramFuzzy, AutoCompleteBestFirstDescendants])
+    @pytest.mark.parametrize("chunk_size", [1, 100])
+    def test_build_autocomplete(self, module, chunk_size):
+        rows = iter(get_original_words().items())
+        auto_complete = build_autocomplete(rows, module=module, synonyms=SYNONYMS, chunk_size=chunk_size)
+        self.assert_same_as_constructor(auto_complete, get_original_words(), SYNONYMS)
+
+    def test_from_rows_of_csv(self):
+        auto_complete = AutoComplete.from_rows(get_csv_rows(), synonyms=SYNONYMS)
+        self.assert_same_as_constructor(auto_complete, dict(get_csv_rows()), SYNONYMS)
+
+    def test_repeated_word_uses_the_last_value(self):
+        rows = [('bmw', {'count': 1}), ('toyota', {'count': 2}), ('bmw', {'count': 3})]
+        auto_complete = build_autocomplete(rows, chunk_size=2)
+        results = auto_complete.search('bmw', size=2)
+        print_results(locals())
+        assert {'bmw': {'count': 3}, 'toyota': {'count': 2}} == auto_complete.words
+        assert 3 == auto_complete._dwg['b']['m']['w'].count
+
+    def test_clean_synonym_of_another_first_character(self):
+        rows = [('mercedes-benz', {'count': 10}), ('bmw', {'count': 5})]
+        auto_complete = build_autocomplete(rows, synonyms={'mercedes-benz': ['benz'], 'bmw': ['beemer']})
+        assert [['mercedes-benz']] == auto_complete.search('benz')
+        assert auto_complete._dwg['b']['e']['n']['z'] is auto_complete._dwg['m']['e']['r']['c']['e']['d']['e']['s'][' ']['b']['e']['n']['z']
+
+    def test_no_rows(self):
+        auto_complete = build_autocomplete([])
+        assert {} == auto_complete.words
+        assert [] == auto_complete.search('bmw')
+
+    def test_bad_chunk_size(self):
+        with pytest.raises(BuildError):
+            build_autocomplete([], chunk_size=0)
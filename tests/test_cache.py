@@ -0,0 +1,199 @@
+import random
+import threading
+
+import pytest
+import concurrent.futures
+
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.cache import ByteBudgetCache, FrequencySketch, LRUCache, TinyLFUCache, get_result_size
+from fast_autocomplete.lfucache import FastLFUCache, LFUCache, ThreadLocalLFUCache
+from test_autocomplete import AutoCompleteLockFreeReads, SEARCH_MANY_WORDS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+CACHE_CLASSES = [LFUCache, FastLFUCache, LRUCache, TinyLFUCache]
+
+
+class TestCaches:
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_get_set_delete(self, cache_class):
+        cache = cache_class(10)
+        assert -1 == cache.get('a')
+        cache.set('a', 'a_cached')
+        cache.set('b', [])
+        assert 'a_cached' == cache.get('a')
+        assert [] == cache.get('b')
+        assert {'a', 'b'} == set(cache.keys())
+        assert cache.delete('a')
+        assert not cache.delete('a')
+        assert -1 == cache.get('a')
+        assert {'hits': 2, 'misses': 2, 'evictions': 0, 'size': 1} == cache.get_stats()
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_capacity_and_on_evict(self, cache_class):
+        evicted = []
+        cache = cache_class(5, on_evict=evicted.append)
+        for i in range(20):
+            cache.set(i, i)
+        keys = cache.keys()
+        print_results(locals())
+        assert 5 == len(keys)
+        assert 15 == len(evicted) == cache.get_stats()['evictions']
+        assert set(range(20)) == set(keys) | set(evicted)
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_zero_capacity(self, cache_class):
+        cache = cache_class(0)
+        cache.set('a', 'a_cached')
+        assert -1 == cache.get('a')
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_multithreading(self, cache_class):
+        cache = cache_class(20)
+
+        def _random_func(key):
+            if random.random() < 0.3:
+                cache.set(key, key)
+            elif random.random() < 0.1:
+                cache.delete(key)
+            else:
+                value = cache.get(key)
+                assert value == -1 or value == key
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(_random_func, random.randrange(50)) for _ in range(20000)]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        assert len(cache.keys()) <= 20
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_get_sorted_cache_keys(self, cache_class):
+        cache = cache_class(10)
+        for key in 'abc':
+            cache.set(key, key)
+        for _ in range(3):
+            cache.get('b')
+        results = cache.get_sorted_cache_keys()
+        print_results(locals())
+        assert {'a', 'b', 'c'} == {key for key, _ in results}
+        assert 'b' == results[0][0]
+
+    @pytest.mark.parametrize("cache_class", CACHE_CLASSES)
+    def test_thread_local_get_sorted_cache_keys(self, cache_class):
+        cache = ThreadLocalLFUCache(10, cache_class=cache_class)
+        cache.set('a', 'a')
+        assert ['a'] == [key for key, _ in cache.get_sorted_cache_keys()]
+
+    def test_lru_order(self):
+        cache = LRUCache(3)
+        for key in 'abc':
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        assert ['c', 'a', 'd'] == cache.keys()
+
+    def test_byte_budget(self):
+        value = [['toyota'], ['toyota avalon']]
+        size = get_result_size(value)
+        evicted = []
+        cache = ByteBudgetCache(size * 3, on_evict=evicted.append)
+        for key in 'abcd':
+            cache.set(key, value)
+        assert ['b', 'c', 'd'] == cache.keys()
+        assert ['a'] == evicted
+        assert size * 3 == cache.get_stats()['bytes']
+        cache.set('big', value * 10)
+        assert -1 == cache.get('big')
+        cache.delete('b')
+        assert size * 2 == cache.total_size
+        cache.set('c', value * 10)
+        assert -1 == cache.get('c')
+        assert ['d'] == cache.keys()
+        assert size == cache.total_size
+
+    def test_frequency_sketch(self):
+        sketch = FrequencySketch(100)
+        for _ in range(5):
+            sketch.increment('toyota')
+        sketch.increment('bmw')
+        assert 5 == sketch.frequency('toyota')
+        assert 1 == sketch.frequency('bmw')
+        assert 0 == sketch.frequency('kia')
+        for i in range(sketch.sample_size):
+            sketch.increment(i)
+        assert sketch.frequency('toyota') <= 3
+
+    def test_tiny_lfu_keeps_the_popular_items_during_a_scan(self):
+        cache = TinyLFUCache(100)
+        for _ in range(3):
+            for i in range(50):
+                if cache.get(i) == -1:
+                    cache.set(i, i)
+        for i in range(1000, 2000):
+            if cache.get(i) == -1:
+                cache.set(i, i)
+        # The last popular item was still in the window when it was used again, so it was never
+        # protected and it competes with the scan on its frequency alone.
+        assert set(range(49)) <= set(cache.keys())
+
+    @pytest.mark.parametrize("cache_class, expected_hits", [
+        (LFUCache, 0),
+        (TinyLFUCache, 7),
+    ])
+    def test_a_new_trending_item_gets_in(self, cache_class, expected_hits):
+        cache = cache_class(100)
+        for i in range(100):
+            for _ in range(3):
+                if cache.get(i) == -1:
+                    cache.set(i, i)
+        # The new item is searched over and over but there is always another new item between the searches.
+        hits = 0
+        for i in range(100, 110):
+            for new_item in [i, 'trending']:
+                if cache.get(new_item) == -1:
+                    cache.set(new_item, new_item)
+                elif new_item == 'trending':
+                    hits += 1
+        assert expected_hits == hits
+
+
+class TestAutoCompleteCacheClass:
+
+    @pytest.mark.parametrize("cache_class", [LFUCache, LRUCache, TinyLFUCache, ByteBudgetCache])
+    @pytest.mark.parametrize("lock_free_reads", [False, True])
+    def test_search(self, cache_class, lock_free_reads):
+        module = type('AutoCompleteCache', (AutoCompleteLockFreeReads if lock_free_reads else AutoComplete,), {
+            'CACHE_CLASS': cache_class,
+            'CACHE_SIZE': 10000 if cache_class is ByteBudgetCache else 10,
+        })
+        auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        expected = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        for _ in range(2):
+            for word in SEARCH_MANY_WORDS:
+                assert expected.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4), word
+        stats = auto_complete.get_cache_stats()
+        print_results(locals())
+        searched_words = [word for word in SEARCH_MANY_WORDS if auto_complete.normalizer.normalize_node_name(word)]
+        assert 2 * len(searched_words) == stats['hits'] + stats['misses']
+        assert stats['evictions']
+
+    def test_stats_of_all_threads(self):
+        auto_complete = AutoCompleteLockFreeReads(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete.search('toyota a')
+        is_searched = threading.Event()
+        is_done = threading.Event()
+
+        def search():
+            auto_complete.search('toyota a')
+            is_searched.set()
+            is_done.wait()
+
+        # The cache of a thread goes away with the thread, so it is kept running.
+        thread = threading.Thread(target=search)
+        thread.start()
+        is_searched.wait()
+        auto_complete.search('toyota a')
+        stats = auto_complete.get_cache_stats()
+        is_done.set()
+        thread.join()
+        assert 1 == stats['hits']
+        assert 2 == stats['misses']
@@ -0,0 +1,102 @@
+import pytest
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.frozen import FrozenDawg, FrozenDawgError
+from test_autocomplete import AutoCompleteTrieFuzzy, SEARCH_CASES_PARAMS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+
+def _get_frozen(module=AutoComplete, minimize=False, **kwargs):
+    auto_complete = module(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, **kwargs)
+    auto_complete.freeze(minimize=minimize)
+    return auto_complete
+
+
+class TestFrozenDawg:
+
+    @pytest.mark.parametrize("minimize", [False, True])
+    def test_from_node(self, minimize):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        frozen = FrozenDawg.from_node(auto_complete._dwg, minimize=minimize)
+        assert len(frozen.labels) == len(frozen.targets) == frozen.first_edges[-1]
+        assert len(frozen) == len(frozen.first_edges) - 1
+        assert list(auto_complete._dwg.children.keys()) == list(frozen.root.children.keys())
+        assert auto_complete._dwg['b']['m']['w'].word == frozen.root['b']['m']['w'].word == 'bmw'
+        # beemer is merged into the same node as bmw
+        beemer = frozen.root
+        for letter in 'beemer':
+            beemer = beemer[letter]
+        assert frozen.root['b']['m']['w'] == beemer
+        # trucks is merged into truck which makes a loop
+        truck = frozen.root['t']['r']['u']['c']['k']
+        assert truck == truck['s'] == truck['s']['s']
+
+    def test_minimize(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        frozen = FrozenDawg.from_node(auto_complete._dwg)
+        minimized = FrozenDawg.from_node(auto_complete._dwg, minimize=True)
+        assert len(minimized) < len(frozen) / 2
+        assert frozen.word_ids == minimized.word_ids
+        assert frozen.counts == minimized.counts
+        # words that end the same way share their last states
+        camry = minimized.root
+        for letter in 'toyota camry':
+            camry = camry[letter]
+        other_camry = minimized.root
+        for letter in 'camry':
+            other_camry = other_camry[letter]
+        assert camry._state == other_camry._state
+        assert camry != other_camry
+        assert 'toyota camry' == camry.word
+        assert 'camry' == other_camry.word
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results", SEARCH_CASES_PARAMS)
+    @pytest.mark.parametrize("module, minimize", [
+        (AutoComplete, False),
+        (AutoComplete, True),
+        (AutoCompleteTrieFuzzy, True),
+    ])
+    def test_find(self, module, minimize, word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results):
+        auto_complete = _get_frozen(module, minimize=minimize)
+        results, find_steps = auto_complete._find(word, max_cost, size)
+        results = dict(results)
+        search_results = auto_complete.search(word, max_cost, size)
+        print_results(locals())
+        assert expected_find_results == results
+        assert expected_steps == find_steps
+        if word.strip():
+            assert expected_find_and_sort_results == search_results
+
+    @pytest.mark.parametrize("prefix", ['', 'b', 'bmw', 'toyota ', 'truck'])
+    @pytest.mark.parametrize("minimize", [False, True])
+    @pytest.mark.parametrize("size, should_traverse, full_stop_words, insert_count", [
+        (5, True, None, True),
+        (5, True, None, False),
+        (3, False, None, True),
+        (10, True, {'bmw', 'alfa romeo'}, True),
+    ])
+    def test_get_descendants(self, prefix, minimize, size, should_traverse, full_stop_words, insert_count):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        node = auto_complete._dwg
+        frozen_node = FrozenDawg.from_node(node, minimize=minimize).root
+        for letter in prefix:
+            node = node[letter]
+            frozen_node = frozen_node[letter]
+        kwargs = dict(size=size, should_traverse=should_traverse, full_stop_words=full_stop_words, insert_count=insert_count)
+        expected_results = list(node.get_descendants_words(**kwargs))
+        results = list(frozen_node.get_descendants_words(**kwargs))
+        print_results(locals())
+        assert expected_results == results
+        expected_nodes = [(_node.word, _node.count) for _node in node.get_descendants_nodes(**kwargs)]
+        assert expected_nodes == [(_node.word, _node.count) for _node in frozen_node.get_descendants_nodes(**kwargs)]
+
+    @pytest.mark.parametrize("minimize", [False, True])
+    def test_update_count_of_word(self, minimize):
+        auto_complete = _get_frozen(minimize=minimize, full_stop_words=['bmw', 'alfa romeo'])
+        assert 10000 == auto_complete.update_count_of_word(word='toyota aygo', count=10000)
+        assert 10000 == auto_complete.get_count_of_word('toyota aygo')
+        results = auto_complete.search('toyota a', max_cost=2, size=4)
+        assert [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']] == results
+
+    def test_insert_into_frozen(self):
+        auto_complete = _get_frozen()
+        with pytest.raises(FrozenDawgError):
+            auto_complete.insert_word_branch('new word')
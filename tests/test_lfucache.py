@@ -2,7 +2,9 @@ import random
 import pytest
 import concurrent.futures
 from deepdiff import DeepDiff
-from fast_autocomplete.lfucache import LFUCache
+from fast_autocomplete.lfucache import FastLFUCache, LFUCache
+
+LFU_CLASSES = [LFUCache, FastLFUCache]
 
 
 class TestLFUcache:
@@ -12,17 +14,28 @@ class TestLFUcache:
         (['a', 'a', 'b', 'a', 'c', 'b', 'd', 'e', 'c', 'b'], 3, [('a', 2), ('b', 2), ('c', 0)]),
         (['a', 'a', 'b', 'a', 'c', 'b', 'd', 'e', 'c', 'b', 'b', 'c', 'd', 'b'], 3, [('b', 4), ('a', 2), ('d', 0)]),
     ])
-    def test_autocomplete(self, items, size, expected_results):
-        lfucache = LFUCache(size)
+    @pytest.mark.parametrize("cache_class", LFU_CLASSES)
+    def test_autocomplete(self, cache_class, items, size, expected_results):
+        lfucache = cache_class(size)
         for item in items:
             lfucache.set(item, f'{item}_cached')
         results = lfucache.get_sorted_cache_keys()
         diff = DeepDiff(expected_results, results)
         assert not diff
 
-    def test_get_multithreading(self):
+    @pytest.mark.parametrize("cache_class", LFU_CLASSES)
+    def test_on_evict(self, cache_class):
+        evicted = []
+        lfucache = cache_class(2, on_evict=evicted.append)
+        for item in ['a', 'a', 'b', 'c', 'd']:
+            lfucache.set(item, f'{item}_cached')
+        lfucache.delete('a')
+        assert ['b', 'c'] == evicted
+
+    @pytest.mark.parametrize("cache_class", LFU_CLASSES)
+    def test_get_multithreading(self, cache_class):
         keys = 'aaaaaaaaaaaaaaaaaaaaaaaaaaabbc'
-        lfucache = LFUCache(2)
+        lfucache = cache_class(2)
 
         def _do_set(cache, key):
             cache.set(key, f'{key}_cached')
@@ -43,3 +56,22 @@ class TestLFUcache:
             futures = (executor.submit(_random_func, lfucache, key) for key in _key_gen())
             for future in concurrent.futures.as_completed(futures):
                 future.result()
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_fast_lfu_cache_evicts_the_same_keys(self, seed):
+        rand = random.Random(seed)
+        evicted = []
+        fast_evicted = []
+        lfucache = LFUCache(20, on_evict=evicted.append)
+        fast_lfucache = FastLFUCache(20, on_evict=fast_evicted.append)
+        for _ in range(5000):
+            key = int(rand.paretovariate(1)) if rand.random() < 0.8 else rand.randrange(1000)
+            action = rand.random()
+            for cache in (lfucache, fast_lfucache):
+                if action < 0.05:
+                    cache.delete(key)
+                elif cache.get(key) == -1:
+                    cache.set(key, key)
+        assert evicted == fast_evicted
+        assert lfucache.get_sorted_cache_keys() == fast_lfucache.get_sorted_cache_keys()
+        assert lfucache.get_stats() == fast_lfucache.get_stats()
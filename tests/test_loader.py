@@ -1,7 +1,20 @@
+import csv
+import gzip
+import io
+import json
+import logging
 import os
+import pickle
 import pytest
 from fast_autocomplete import autocomplete_factory, AutoComplete
-from fast_autocomplete.loader import WordValue
+from fast_autocomplete import loader
+from fast_autocomplete.dwg import _DawgNode
+from fast_autocomplete.loader import (
+    REDIS_CHUNK_SIZE, REDIS_INDEX_NAME, THREADED_GZIPPED_CONTENT_SIZE, ContentFileError, RedisIndexError, WordStore,
+    WordValue, get_all_content, get_data, load_redis_index, populate_redis, populate_redis_index, read_words_gen,
+)
+from fast_autocomplete.misc import FileNotFound
+from test_autocomplete import AutoCompleteLockFreeReads, print_results
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 fixture_dir = os.path.join(current_dir, 'fixtures')
@@ -38,3 +51,338 @@ class TestLoader:
         assert 'Acura' == autocomplete.words['acura'].display
         result = autocomplete_ignore_count.search(word=word, size=3)
         assert expected_unsorted_result == result
+
+
+def get_word_values():
+    data = get_data(content_files['words']['filepath'])
+    return {word: WordValue(context=context, display=display, count=count) for word, (context, display, count) in data.items()}
+
+
+class TestWordStore:
+
+    def test_get_data_with_compress(self):
+        words = get_data(content_files['words']['filepath'], compress=True)
+        assert isinstance(words, WordStore)
+        assert get_word_values() == words
+        assert list(get_word_values()) == list(words)
+        assert 130123 == words['acura'].get('count')
+        assert 'Acura RLX' == words['rlx'].display
+        assert words['rlx'].display is words['acura rlx'].display
+
+    @pytest.mark.parametrize('contexts', [
+        # hash(-1) == hash(-2)
+        [{'year': -1}, {'year': -2}],
+        [{'doors': 1}, {'doors': True}, {'doors': 1.0}],
+        [{'make': 'acura', 'model': 'rlx'}, {'model': 'rlx', 'make': 'acura'}, {'make': 'acura'}, None],
+        # -0.0 == 0.0 and (True, 2) == (1, 2)
+        [{'x': 0.0}, {'x': -0.0}],
+        [{'x': (1, 2)}, {'x': (True, 2)}],
+    ])
+    def test_different_values_are_not_merged(self, contexts):
+        words = WordStore((str(i), WordValue(context=context, display=None)) for i, context in enumerate(contexts))
+        results = [words[str(i)].context for i in range(len(contexts))]
+        print_results(locals())
+        assert contexts == results
+        assert [repr(context) for context in contexts] == [repr(context) for context in results]
+        assert [type(context[key]) for context in contexts if context for key in context] == \
+            [type(context[key]) for context in results if context for key in context]
+        assert [list(context) for context in contexts if context] == [list(context) for context in results if context]
+
+    def test_change_and_delete(self):
+        words = WordStore()
+        words['acura'] = WordValue(context={'make': 'acura'}, display='Acura', count=10)
+        words['alfa'] = WordValue(context={'make': 'alfa romeo'}, display='Alfa Romeo', count=5, original_key='alfa romeo')
+        words['bmw'] = {'make': 'bmw'}
+        words['kia'] = WordValue(context={'colors': ['red']}, display='Kia')
+        words['acura'] = WordValue(context={'make': 'acura', 'model': 'rlx'}, display='Acura', count=20)
+        assert WordValue(context={'make': 'acura', 'model': 'rlx'}, display='Acura', count=20) == words['acura']
+        assert 'alfa romeo' == words['alfa'].get('original_key')
+        assert {'make': 'bmw'} == words['bmw']
+        assert WordValue(context={'colors': ['red']}, display='Kia') == words['kia']
+        words['alfa'] = WordValue(context=None, display='Alfa', count=1)
+        assert words['alfa'].original_key is None
+        del words['bmw']
+        assert 'bmw' not in words
+        assert ['acura', 'alfa', 'kia'] == list(words)
+        with pytest.raises(KeyError):
+            words['bmw']
+
+    def test_copy_and_pickle(self):
+        words = WordStore(get_word_values())
+        copied = words.copy()
+        copied['acura'] = WordValue(context={'make': 'acura'}, display='Acura', count=1)
+        copied['tesla'] = WordValue(context={'make': 'tesla'}, display='Tesla')
+        del copied['rlx']
+        assert get_word_values() == words
+        assert get_word_values() == pickle.loads(pickle.dumps(words))
+        assert 1 == copied['acura'].count
+
+    @pytest.mark.parametrize('module', [AutoComplete, AutoCompleteLockFreeReads])
+    def test_autocomplete_with_word_store(self, module):
+        auto_complete = module(words=WordStore(get_word_values()))
+        expected = module(words=get_word_values())
+        auto_complete.add_word('acura zdx', WordValue(context={'make': 'acura', 'model': 'zdx'}, display='Acura ZDX', count=500000))
+        expected.add_word('acura zdx', WordValue(context={'make': 'acura', 'model': 'zdx'}, display='Acura ZDX', count=500000))
+        auto_complete.remove_word('rlx')
+        expected.remove_word('rlx')
+        assert isinstance(auto_complete.words, WordStore)
+        assert expected.words == auto_complete.words
+        for word in ['acu', 'acura z', 'rl', 'acura rl', 'acoura']:
+            assert expected.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4)
+        assert 'Acura ZDX' == auto_complete.get_word_context('acura zdx').display
+
+
+def write_words_file(tmpdir, file_format):
+    """
+    Writes the words of sample_words.json to a JSON lines or CSV file, gzipped if the format ends with .gz.
+    """
+    path = os.path.join(str(tmpdir), f'sample_words{file_format}')
+    data = get_data(content_files['words']['filepath'])
+    text = io.StringIO()
+    if file_format.startswith('.csv'):
+        writer = csv.writer(text)
+        writer.writerow(['word', 'display', 'count', 'make', 'model'])
+        for word, (context, display, count) in data.items():
+            writer.writerow([word, display, count, context['make'], context.get('model', '')])
+    else:
+        for word, value in data.items():
+            text.write(json.dumps({word: value}) + '\n')
+            # empty lines are skipped
+            text.write('\n')
+    content = text.getvalue().encode('utf-8')
+    with open(path, 'wb') as the_file:
+        the_file.write(gzip.compress(content) if file_format.endswith('.gz') else content)
+    return path
+
+
+STREAMING_FORMATS = ['.jsonl', '.jsonl.gz', '.csv', '.csv.gz']
+
+
+class TestStreamingLoaders:
+
+    @pytest.mark.parametrize('file_format', STREAMING_FORMATS)
+    def test_read_words_gen(self, tmpdir, file_format):
+        path = write_words_file(tmpdir, file_format)
+        rows = read_words_gen(path, compress=True)
+        assert not isinstance(rows, (list, dict))
+        words = dict(rows)
+        expected_words = get_word_values()
+        if file_format.startswith('.csv'):
+            # All the columns of the CSV file are in the contexts and they are strings.
+            for word, value in expected_words.items():
+                expected_words[word] = value._replace(context={'make': value.context['make'], 'model': value.context.get('model', '')})
+        assert expected_words == words
+        assert list(expected_words) == list(words)
+
+    @pytest.mark.parametrize('file_format', STREAMING_FORMATS)
+    def test_get_data(self, tmpdir, file_format):
+        path = write_words_file(tmpdir, file_format)
+        words = get_data(path, compress=True)
+        assert isinstance(words, WordStore)
+        assert list(get_word_values()) == list(words)
+        assert [[{'make': 'acura'} if file_format.startswith('.json') else {'make': 'acura', 'model': ''}, 'Acura', 130123]] == \
+            [list(get_data(path)['acura'])]
+
+    @pytest.mark.parametrize('file_format', STREAMING_FORMATS)
+    def test_autocomplete_factory(self, tmpdir, file_format):
+        path = write_words_file(tmpdir, file_format)
+        streaming_content_files = {'words': {'filepath': path, 'compress': True}}
+        auto_complete = autocomplete_factory(content_files=streaming_content_files)
+        assert isinstance(auto_complete.words, WordStore)
+        for word in ['acu', 'acura r', 'rl', 'acoura', 'x']:
+            assert autocomplete.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4)
+        assert 'Acura' == auto_complete.words['acura'].display
+
+    def test_csv_without_word_column(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'words.csv')
+        with open(path, 'w') as the_file:
+            the_file.write('make,count\nacura,10\n')
+        with pytest.raises(ContentFileError):
+            list(read_words_gen(path))
+
+    def test_file_not_found(self, tmpdir):
+        with pytest.raises(FileNotFound):
+            list(read_words_gen(os.path.join(str(tmpdir), 'words.jsonl')))
+
+    def test_not_a_streaming_file(self):
+        with pytest.raises(ContentFileError):
+            list(read_words_gen(content_files['words']['filepath']))
+
+
+class FakeRedis:
+    """
+    Keeps the values in a dictionary like Redis would.
+    """
+
+    def __init__(self, max_value_size=512 * 1024 * 1024):
+        self.data = {}
+        self.max_value_size = max_value_size
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(('get', key))
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.calls.append(('mget', keys))
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value):
+        if len(value) > self.max_value_size:
+            raise ValueError('The value is too big.')
+        self.data[key] = bytes(value)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+
+REDIS_KEY_PREFIX = 'autocomplete:{}'
+HMAC_KEY = b'secret'
+
+
+def get_index_chunk_keys(redis_client):
+    return sorted(key for key in redis_client.data if key.startswith(REDIS_KEY_PREFIX.format(REDIS_INDEX_NAME) + ':'))
+
+
+class TestRedis:
+
+    def test_autocomplete_factory_loads_the_files_from_redis(self, tmpdir):
+        redis_client = FakeRedis()
+        populate_redis(content_files, redis_client, REDIS_KEY_PREFIX)
+        assert ['autocomplete:sample_words.json'] == list(redis_client.data)
+        # The local file does not exist, so the words can only come from Redis.
+        missing_content_files = {'words': {'filepath': os.path.join(str(tmpdir), 'sample_words.json'), 'compress': True}}
+        auto_complete = autocomplete_factory(missing_content_files, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX)
+        assert autocomplete.words == auto_complete.words
+
+    @pytest.mark.parametrize('chunk_size, expected_chunks', [
+        # The index is 3752 bytes.
+        (1000, 4),
+        (REDIS_CHUNK_SIZE, 1),
+    ])
+    def test_prebuilt_index(self, chunk_size, expected_chunks):
+        redis_client = FakeRedis(max_value_size=min(chunk_size, 10000))
+        populate_redis(content_files, redis_client, REDIS_KEY_PREFIX, module=AutoComplete, chunk_size=chunk_size, hmac_key=HMAC_KEY)
+        chunk_keys = get_index_chunk_keys(redis_client)
+        print_results(locals())
+        assert expected_chunks == len(chunk_keys)
+        auto_complete = autocomplete_factory(
+            content_files, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX, hmac_key=HMAC_KEY)
+        assert not isinstance(auto_complete._dwg, _DawgNode)
+        assert autocomplete.words == auto_complete.words
+        for word in ['acu', 'acura r', 'rl', 'acoura', 'x']:
+            assert autocomplete.search(word, max_cost=3, size=4) == auto_complete.search(word, max_cost=3, size=4)
+        assert 10 == auto_complete.update_count_of_word(word='acura rlx', count=10)
+
+    def test_populate_again_deletes_the_old_chunks(self):
+        redis_client = FakeRedis()
+        populate_redis(content_files, redis_client, REDIS_KEY_PREFIX, module=AutoComplete, chunk_size=1000, hmac_key=HMAC_KEY)
+        old_chunk_keys = get_index_chunk_keys(redis_client)
+        populate_redis_index(autocomplete_ignore_count, redis_client, REDIS_KEY_PREFIX, HMAC_KEY, chunk_size=2000)
+        chunk_keys = get_index_chunk_keys(redis_client)
+        assert not set(old_chunk_keys) & set(chunk_keys)
+        assert 2 == len(chunk_keys)
+        auto_complete = load_redis_index(redis_client, REDIS_KEY_PREFIX, HMAC_KEY, module=AutoCompleteIgnoreCount)
+        assert autocomplete_ignore_count.search('acu', size=3) == auto_complete.search('acu', size=3)
+
+    @pytest.mark.parametrize('change, expected_log', [
+        ('version', 'has the version 0 and the format version'),
+        ('format_version', 'and the format version 0 but'),
+        ('chunk', 'The signature of the prebuilt index in Redis does not match.'),
+        ('missing_chunk', 'Unable to load the prebuilt index from Redis.'),
+        ('manifest', 'Unable to load the prebuilt index from Redis.'),
+        ('hmac_key', 'The signature of the prebuilt index in Redis does not match.'),
+        ('unsigned', 'The signature of the prebuilt index in Redis does not match.'),
+    ])
+    def test_falls_back_to_the_files(self, caplog, change, expected_log):
+        redis_client = FakeRedis()
+        populate_redis(content_files, redis_client, REDIS_KEY_PREFIX, module=AutoComplete, chunk_size=1000, hmac_key=HMAC_KEY)
+        key = REDIS_KEY_PREFIX.format(REDIS_INDEX_NAME)
+        manifest = json.loads(redis_client.data[key])
+        chunk_key = get_index_chunk_keys(redis_client)[0]
+        if change in ('version', 'format_version'):
+            manifest[change] = 0
+            redis_client.data[key] = json.dumps(manifest).encode('utf-8')
+        elif change == 'chunk':
+            redis_client.data[chunk_key] = redis_client.data[chunk_key][:-1] + b'\1'
+        elif change == 'missing_chunk':
+            del redis_client.data[chunk_key]
+        elif change == 'unsigned':
+            del manifest['hmac']
+            redis_client.data[key] = json.dumps(manifest).encode('utf-8')
+        elif change == 'manifest':
+            redis_client.data[key] = b'not json'
+        auto_complete = autocomplete_factory(
+            content_files, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX, logger=logging.getLogger(__name__),
+            hmac_key=b'other secret' if change == 'hmac_key' else HMAC_KEY)
+        assert expected_log in caplog.text
+        assert isinstance(auto_complete._dwg, _DawgNode)
+        assert autocomplete.search('acu', size=3) == auto_complete.search('acu', size=3)
+
+    def test_no_prebuilt_index(self):
+        redis_client = FakeRedis()
+        assert load_redis_index(redis_client, REDIS_KEY_PREFIX, HMAC_KEY) is None
+
+    def test_prebuilt_index_is_not_loaded_without_hmac_key(self):
+        redis_client = FakeRedis()
+        populate_redis(content_files, redis_client, REDIS_KEY_PREFIX, module=AutoComplete, hmac_key=HMAC_KEY)
+        redis_client.calls.clear()
+        auto_complete = autocomplete_factory(content_files, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX)
+        assert isinstance(auto_complete._dwg, _DawgNode)
+        assert ('get', REDIS_KEY_PREFIX.format(REDIS_INDEX_NAME)) not in redis_client.calls
+
+    def test_prebuilt_index_needs_hmac_key(self):
+        with pytest.raises(RedisIndexError):
+            populate_redis(content_files, FakeRedis(), REDIS_KEY_PREFIX, module=AutoComplete)
+
+
+ALL_CONTENT_FILES = {
+    'words': content_files['words'],
+    'synonyms': {'filepath': os.path.join(fixture_dir, 'synonyms.json'), 'compress': False},
+}
+
+
+class BrokenRedis(FakeRedis):
+
+    def mget(self, keys):
+        raise ConnectionError('Redis is down.')
+
+
+class TestGetAllContent:
+
+    @pytest.mark.parametrize('file_format', ['.json', '.jsonl.gz'])
+    def test_one_round_trip(self, tmpdir, file_format):
+        all_content_files = dict(ALL_CONTENT_FILES)
+        if file_format != '.json':
+            all_content_files['words'] = {'filepath': write_words_file(tmpdir, file_format), 'compress': True}
+        redis_client = FakeRedis()
+        populate_redis(all_content_files, redis_client, REDIS_KEY_PREFIX)
+        auto_complete = autocomplete_factory(all_content_files, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX)
+        calls = redis_client.calls
+        print_results(locals())
+        assert [
+            ('mget', [REDIS_KEY_PREFIX.format(f'sample_words{file_format}'), REDIS_KEY_PREFIX.format('synonyms.json')]),
+        ] == calls
+        expected = autocomplete_factory(all_content_files)
+        assert expected.words == auto_complete.words
+        assert expected._clean_synonyms == auto_complete._clean_synonyms
+        assert expected.search('acu', size=3) == auto_complete.search('acu', size=3)
+
+    # With 0, the words are parsed on their own thread.
+    @pytest.mark.parametrize('threaded_gzipped_content_size', [0, THREADED_GZIPPED_CONTENT_SIZE])
+    def test_get_all_content(self, monkeypatch, threaded_gzipped_content_size):
+        monkeypatch.setattr(loader, 'THREADED_GZIPPED_CONTENT_SIZE', threaded_gzipped_content_size)
+        redis_client = FakeRedis()
+        populate_redis(ALL_CONTENT_FILES, redis_client, REDIS_KEY_PREFIX)
+        # Only the words are in Redis.
+        del redis_client.data[REDIS_KEY_PREFIX.format('synonyms.json')]
+        logger = logging.getLogger(__name__)
+        content = get_all_content(ALL_CONTENT_FILES, redis_client=redis_client, redis_key_prefix=REDIS_KEY_PREFIX, logger=logger)
+        expected_content = {key: get_data(info['filepath'], compress=info['compress']) for key, info in ALL_CONTENT_FILES.items()}
+        assert dict(expected_content, logger=logger) == content
+        assert 1 == len(redis_client.calls)
+
+    def test_redis_is_down(self, caplog):
+        content = get_all_content(ALL_CONTENT_FILES, redis_client=BrokenRedis(), redis_key_prefix=REDIS_KEY_PREFIX, logger=logging.getLogger(__name__))
+        assert 'Unable to get the search graph words from Redis.' in caplog.text
+        assert get_data(ALL_CONTENT_FILES['synonyms']['filepath']) == content['synonyms']
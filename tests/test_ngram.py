@@ -0,0 +1,35 @@
+import random
+import pytest
+from Levenshtein import distance as levenshtein_distance
+from fast_autocomplete.ngram import NgramIndex
+
+
+def _random_word(rnd):
+    return ''.join(rnd.choice('abcde ') for _ in range(rnd.randint(0, 9))).strip()
+
+
+class TestNgramIndex:
+
+    @pytest.mark.parametrize("word, max_distance, expected_results", [
+        ('toyota', 1, ['toyota', 'toyoda']),
+        ('toyota', 2, ['toyota', 'toyoda']),
+        ('tsla', 1, ['tesla']),
+        ('bmw', 0, []),
+        ('kia', 1, ['kia', 'toy']),
+    ])
+    def test_get_candidates(self, word, max_distance, expected_results):
+        index = NgramIndex(['toyota', 'toyoda', 'tesla', 'kia', 'toy', 'honda civic'])
+        results = index.get_candidates(word, max_distance)
+        assert expected_results == results
+
+    @pytest.mark.parametrize("n", [1, 2, 3])
+    def test_get_candidates_never_drops_a_match(self, n):
+        rnd = random.Random(n)
+        words = list({_random_word(rnd) for _ in range(300)})
+        index = NgramIndex(words, n=n)
+        for _ in range(100):
+            word = _random_word(rnd)
+            max_distance = rnd.randint(0, 3)
+            expected_results = [i for i in words if levenshtein_distance(word, i) <= max_distance]
+            results = index.get_candidates(word, max_distance)
+            assert expected_results == [i for i in results if levenshtein_distance(word, i) <= max_distance]
@@ -1,5 +1,7 @@
+import random
+import threading
 import pytest
-from fast_autocomplete.normalize import Normalizer
+from fast_autocomplete.normalize import MAX_WORD_LENGTH, Normalizer
 
 normalizer = Normalizer()
 normalizer_unicode = Normalizer(
@@ -38,3 +40,66 @@ class TestNormalizer:
     def test_normalize_unicode_node_name(self, name, extra_chars, expected_result):
         result = normalizer_unicode.normalize_node_name(name, extra_chars=extra_chars)
         assert expected_result == result
+
+    def test_each_normalizer_has_its_own_cache(self):
+        normalizer_with_colon = Normalizer()
+        normalizer_without_colon = Normalizer(valid_chars_for_node_name=set('abcdefghijklmnopqrstuvwxyz '))
+        assert 'mercedes:benz' == normalizer_with_colon.normalize_node_name('Mercedes:Benz')
+        assert 'mercedesbenz' == normalizer_without_colon.normalize_node_name('Mercedes:Benz')
+        assert {'hits': 0, 'misses': 1, 'evictions': 0, 'size': 1} == normalizer_without_colon.get_cache_stats()
+
+    @pytest.mark.parametrize("names, cache_size, expected_stats", [
+        (['toyota camry', 'toyota camry', 'bmw', 'a', 'bmw'], 10, {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}),
+        (['toyota camry', 'toyota corolla', 'toyota camry'], 1, {'hits': 0, 'misses': 3, 'evictions': 2, 'size': 1}),
+        (['رپب', 'رپب'], 10, {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}),
+        (['toyota camry', 'toyota camry'], 0, {'hits': 0, 'misses': 2, 'evictions': 0, 'size': 0}),
+    ])
+    def test_cache_stats(self, names, cache_size, expected_stats):
+        normalizer = Normalizer(cache_size=cache_size)
+        for name in names:
+            assert normalizer._get_normalized_node_name(name) == normalizer.normalize_node_name(name)
+        assert expected_stats == normalizer.get_cache_stats()
+
+    @pytest.mark.parametrize("thread_local_cache, expected_thread_stats", [
+        (False, {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}),
+        # The stats are summed over the caches of both threads.
+        (True, {'hits': 0, 'misses': 2, 'evictions': 0, 'size': 2}),
+    ])
+    def test_thread_local_cache(self, thread_local_cache, expected_thread_stats):
+        normalizer = Normalizer(thread_local_cache=thread_local_cache)
+        normalizer.normalize_node_name('toyota camry')
+        thread_stats = []
+
+        def normalize():
+            normalizer.normalize_node_name('toyota camry')
+            thread_stats.append(normalizer.get_cache_stats())
+
+        thread = threading.Thread(target=normalize)
+        thread.start()
+        thread.join()
+        assert expected_thread_stats == thread_stats[0]
+
+    @pytest.mark.parametrize("normalizer_kwargs", [
+        {},
+        {'valid_chars_for_string': 'زرتپبا'},
+        {'valid_chars_for_node_name': set('abcdefghijklmnopqrstuvwxyz0123456789 ')},
+        {'valid_chars_for_integer': '0123456789٠١٢'},
+        # The space is a letter, so the names are normalized one character at a time
+        {'valid_chars_for_string': 'abc '},
+    ])
+    @pytest.mark.parametrize("seed", range(3))
+    def test_translate_gives_the_same_results_as_going_char_by_char(self, normalizer_kwargs, seed):
+        rand = random.Random(seed)
+        chars = 'aAbBcxyzZ019 -_:!#./زرتپبا٠١٢ÄäßİŞé\t'
+        normalizer = Normalizer(**normalizer_kwargs)
+        names = [''.join(rand.choice(chars) for _ in range(rand.randrange(15))) for _ in range(2000)]
+        for name in names:
+            expected = normalizer._get_normalized_node_name_per_char(name)
+            assert expected == normalizer._get_normalized_node_name(name), repr(name)
+        assert [normalizer.normalize_node_name(name) for name in names] == normalizer.normalize_many(names)
+
+    def test_normalize_many(self):
+        assert ['type r', 'bmw 1', '', ''] == normalizer.normalize_many(['Type-R', 'bmw? #1', None, '!!'])
+        assert [normalizer.normalize_node_name('a' * 50)] == normalizer.normalize_many(['a' * 50])
+        assert MAX_WORD_LENGTH == len(normalizer.normalize_many(['a' * 50])[0])
+
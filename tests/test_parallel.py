@@ -0,0 +1,64 @@
+import os
+import pytest
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.parallel import CHUNKS_AHEAD_PER_WORKER, ParallelSearchError, _create_pool, _search_chunk
+from test_autocomplete import SEARCH_MANY_WORDS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+
+class TestParallel:
+
+    @pytest.mark.parametrize("workers, chunk_size, use_index", [
+        (2, 3, False),
+        (3, 100, False),
+        (2, 4, True),
+    ])
+    def test_search_many_parallel(self, tmpdir, workers, chunk_size, use_index):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        index_path = None
+        if use_index:
+            index_path = os.path.join(str(tmpdir), 'index.bin')
+            auto_complete.save_index(index_path)
+        results = list(auto_complete.search_many_parallel(
+            iter(SEARCH_MANY_WORDS), max_cost=3, size=3, workers=workers, chunk_size=chunk_size, index_path=index_path))
+        expected_results = [auto_complete.search(word, max_cost=3, size=3) for word in SEARCH_MANY_WORDS]
+        print_results(locals())
+        assert expected_results == results
+
+    def test_search_many_parallel_sees_the_counts_at_the_time_of_the_fork(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete.update_count_of_word(word='toyota aygo', count=10000)
+        results = list(auto_complete.search_many_parallel(['toyota a'], max_cost=2, size=4, workers=1))
+        assert [[['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']]] == results
+
+    def test_search_many_parallel_reads_the_words_in_bounded_chunks(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        read_words = []
+
+        def words():
+            # Never ends, so reading all the words up front would never finish.
+            while True:
+                read_words.append('bmw')
+                yield 'bmw'
+
+        results = auto_complete.search_many_parallel(words(), max_cost=3, size=3, workers=1, chunk_size=2)
+        assert auto_complete.search('bmw', max_cost=3, size=3) == next(results)
+        results.close()
+        assert CHUNKS_AHEAD_PER_WORKER * 2 == len(read_words)
+
+    def test_search_many_parallel_restarted_worker(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        expected_results = auto_complete.search_many(['bmw'], max_cost=3, size=3)
+        with _create_pool(auto_complete, workers=1, index_path=None) as pool:
+            assert expected_results == pool.apply(_search_chunk, ((['bmw'], 3, 3),))
+            # The worker exits while running this task and the pool starts a new worker.
+            pool.apply_async(os._exit, (1,))
+            assert expected_results == pool.apply_async(_search_chunk, ((['bmw'], 3, 3),)).get(timeout=30)
+
+    def test_search_many_parallel_with_no_words(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        assert [] == list(auto_complete.search_many_parallel([], workers=1))
+
+    def test_search_many_parallel_bad_chunk_size(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        with pytest.raises(ParallelSearchError):
+            list(auto_complete.search_many_parallel(['bmw'], chunk_size=0))
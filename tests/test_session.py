@@ -0,0 +1,42 @@
+import pytest
+from fast_autocomplete import AutoComplete
+from test_autocomplete import SEARCH_MANY_WORDS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+
+class TestAutoCompleteSession:
+
+    @pytest.mark.parametrize("word", SEARCH_MANY_WORDS + ['2018 alpha romeo 4d', 'bmw-x5', 'Toyota  Camry', 'in los angeles ', 'truck s'])
+    def test_type_one_char_at_a_time(self, word):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        expected_auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        session = auto_complete.session(max_cost=3, size=3)
+        for i in range(len(word)):
+            results = session.type(word[i]).results()
+            expected_results = expected_auto_complete.search(word[:i + 1], max_cost=3, size=3)
+            assert expected_results == results, word[:i + 1]
+        for i in reversed(range(len(word))):
+            results = session.backspace().results(size=4, max_cost=2)
+            expected_results = expected_auto_complete.search(word[:i], max_cost=2, size=4)
+            assert expected_results == results, word[:i]
+        assert '' == session.text
+
+    @pytest.mark.parametrize("texts", [
+        ['bmw', 'bmw x', 'bmw', 'beemer 3', 'beemer 3 s'],
+        ['toyota', 'toyota ', 'toyota c', 'toyota camry', 'toyota'],
+        ['alfa romeo4', 'alfa romeo 4c', ''],
+    ])
+    def test_set_text(self, texts):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        session = auto_complete.session()
+        for text in texts:
+            results = session.set_text(text).results()
+            expected_results = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS).search(text)
+            print_results(locals())
+            assert expected_results == results
+
+    def test_session_after_freezing(self):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        session = auto_complete.session().type('toyota')
+        auto_complete.freeze()
+        results = session.type(' a').results(size=4)
+        assert [['toyota'], ['toyota avalon'], ['toyota aurion'], ['toyota auris']] == results
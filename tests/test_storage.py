@@ -0,0 +1,88 @@
+import os
+import pytest
+from fast_autocomplete import AutoComplete
+from fast_autocomplete.storage import FORMAT_VERSION, IndexFormatError, dumps_index, loads_index, _HEADER
+from test_autocomplete import SEARCH_CASES_PARAMS, SYNONYMS, WIKIPEDIA_WORDS, print_results
+
+
+class TestStorage:
+
+    @pytest.mark.parametrize("mmap, minimize", [
+        (True, False),
+        (False, False),
+        (True, True),
+    ])
+    def test_save_and_load_index(self, tmpdir, mmap, minimize):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS, full_stop_words=['bmw', 'alfa romeo'])
+        path = os.path.join(str(tmpdir), 'index.bin')
+        auto_complete.save_index(path, minimize=minimize)
+        loaded = AutoComplete.load_index(path, mmap=mmap)
+        assert auto_complete.words == loaded.words
+        assert auto_complete._clean_synonyms == loaded._clean_synonyms
+        assert auto_complete._full_stop_words == loaded._full_stop_words
+        for word in ('toyota a', 'beemer', '2018 alpha romeo 4d', 'al', 'vw bea'):
+            assert auto_complete.search(word, max_cost=3, size=4) == loaded.search(word, max_cost=3, size=4)
+
+        assert 10000 == loaded.update_count_of_word(word='toyota aygo', count=10000)
+        results = loaded.search('toyota a', max_cost=2, size=4)
+        assert [['toyota'], ['toyota aygo'], ['toyota avalon'], ['toyota aurion']] == results
+        # The count update does not change the file
+        assert 2115 == AutoComplete.load_index(path, mmap=mmap).get_count_of_word('toyota aygo')
+
+    @pytest.mark.parametrize("word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results", SEARCH_CASES_PARAMS)
+    def test_find_on_loaded_index(self, word, max_cost, size, expected_find_results, expected_steps, expected_find_and_sort_results):
+        auto_complete = AutoComplete(words=WIKIPEDIA_WORDS, synonyms=SYNONYMS)
+        auto_complete.freeze()
+        loaded = loads_index(bytearray(dumps_index(auto_complete)), module=AutoComplete)
+        results, find_steps = loaded._find(word, max_cost, size)
+        results = dict(results)
+        print_results(locals())
+        assert expected_find_results == results
+        assert expected_steps == find_steps
+
+    def test_unicode_index(self):
+        words = {'بی ام و': {}, 'بی ام و 1 series': {}}
+        valid_chars_for_string = 'اآبپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی'
+        auto_complete = AutoComplete(words=words, valid_chars_for_string=valid_chars_for_string)
+        loaded = loads_index(dumps_index(auto_complete), module=AutoComplete)
+        assert auto_complete.search('بی') == loaded.search('بی')
+        assert [['بی ام و'], ['بی ام و 1 series']] == loaded.search('بی')
+
+    def test_corrupted_index(self):
+        auto_complete = AutoComplete(words={'book': {}, 'burrito': {}})
+        data = bytearray(dumps_index(auto_complete))
+        data[-1] ^= 1
+        with pytest.raises(IndexFormatError, match='checksum'):
+            loads_index(data, module=AutoComplete)
+
+    @pytest.mark.parametrize("mmap, verify, expected_error", [
+        (True, None, False),
+        (True, True, True),
+        (False, None, True),
+        (False, False, False),
+    ])
+    def test_verify_of_index_file(self, tmpdir, mmap, verify, expected_error):
+        auto_complete = AutoComplete(words={'book': {}, 'burrito': {}})
+        data = bytearray(dumps_index(auto_complete))
+        # The last byte of the last section, which is not read while loading.
+        data[-1] ^= 1
+        path = os.path.join(str(tmpdir), 'index.bin')
+        with open(path, 'wb') as the_file:
+            the_file.write(data)
+        if expected_error:
+            with pytest.raises(IndexFormatError, match='checksum'):
+                AutoComplete.load_index(path, mmap=mmap, verify=verify)
+        else:
+            AutoComplete.load_index(path, mmap=mmap, verify=verify)
+
+    def test_index_version_mismatch(self):
+        auto_complete = AutoComplete(words={'book': {}, 'burrito': {}})
+        data = bytearray(dumps_index(auto_complete))
+        magic, version, sections_count, checksum = _HEADER.unpack_from(data)
+        _HEADER.pack_into(data, 0, magic, FORMAT_VERSION + 1, sections_count, checksum)
+        with pytest.raises(IndexFormatError, match='version'):
+            loads_index(data, module=AutoComplete)
+
+    def test_not_an_index(self):
+        with pytest.raises(IndexFormatError):
+            loads_index(b'{"book": {}}', module=AutoComplete)
@@ -0,0 +1,49 @@
+import random
+import pytest
+from Levenshtein import distance as levenshtein_distance
+from fast_autocomplete.trie import TrieIndex
+
+
+def _random_word(rnd):
+    return ''.join(rnd.choice('abcde 1') for _ in range(rnd.randint(0, 9)))
+
+
+class TestTrieIndex:
+
+    @pytest.mark.parametrize("word, max_distance, expected_results", [
+        ('toyota', 1, [('toyota', 0), ('toyoda', 1)]),
+        ('tsla', 1, [('tesla', 1)]),
+        ('bmw i3', 0, [('bmw i3', 0)]),
+        ('bmw i 3', 1, [('bmw i3', 1)]),
+        ('bmw', 0, []),
+        ('', 3, [('kia', 3), ('toy', 3)]),
+    ])
+    def test_get_candidates(self, word, max_distance, expected_results):
+        index = TrieIndex(['toyota', 'toyoda', 'tesla', 'kia', 'toy', 'bmw i3'])
+        results = index.get_candidates(word, max_distance)
+        assert expected_results == results
+
+    @pytest.mark.parametrize("copy_on_write", [False, True])
+    def test_add_and_remove(self, copy_on_write):
+        index = TrieIndex(['toyota', 'toy', 'kia'], copy_on_write=copy_on_write)
+        root = index._root
+        index.remove('toyota')
+        index.remove('bmw')
+        assert [('toy', 1)] == index.get_candidates('toyo', 2)
+        index.add('toyota')
+        assert [('toy', 2), ('toyota', 1)] == index.get_candidates('toyot', 2)
+        index.remove('toy')
+        index.remove('toyota')
+        assert {'k'} == set(index._root)
+        assert (root is index._root) is not copy_on_write
+
+    def test_get_candidates_finds_every_match(self):
+        rnd = random.Random(0)
+        words = list(dict.fromkeys(_random_word(rnd) for _ in range(300)))
+        index = TrieIndex(words)
+        for _ in range(100):
+            word = _random_word(rnd)
+            max_distance = rnd.randint(0, 3)
+            expected_results = [(i, levenshtein_distance(word, i)) for i in words if levenshtein_distance(word, i) <= max_distance]
+            results = index.get_candidates(word, max_distance)
+            assert expected_results == results